@@ -1,10 +1,18 @@
-import streamlit as st
-import numpy as np
-import json
-import cv2
 import os
-from PIL import Image
-from tensorflow.keras.models import load_model
+import tempfile
+
+import streamlit as st
+
+from brahmilens import DEFAULT_SEGMENTATION, ResultCache, SegmentationParams
+from brahmilens.batching import InferenceExecutor, core_budget
+from brahmilens.config import CACHE_PATH, MODEL_REGISTRY, PREDICT_BATCH_SIZE, WORD_GAP
+from brahmilens.ingest import load_preview
+from brahmilens.live import LiveReader, iter_frames
+from brahmilens.metrics import METRICS
+from brahmilens.pipeline import IncrementalPipeline
+from brahmilens.registry import HotSwapEngine, ModelRegistry
+from brahmilens.transliterate import transliterate
+from brahmilens.startup import BackgroundLoader, load_engine
 
 # --------------------------------------------------
 # PAGE CONFIG
@@ -79,52 +87,38 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --------------------------------------------------
-# OCR CORE
-# --------------------------------------------------
-def segment_characters(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY_INV, 15, 8
-    )
-    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2, 2))
-    thresh = cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
-    contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-    boxes = []
-    for c in contours:
-        x, y, w, h = cv2.boundingRect(c)
-        if h > 15 and w > 8:
-            boxes.append((x, y, w, h))
-
-    boxes = sorted(boxes, key=lambda b: b[0])
-    return boxes, thresh
-
-# --------------------------------------------------
-# LOAD MODEL & LABELS (FIXED FOR STREAMLIT CLOUD)
+# LOAD OCR ENGINE IN THE BACKGROUND
 # --------------------------------------------------
+# TensorFlow is imported on the loader thread, so the page renders straight
+# away and the weights are usually warm by the time the first file arrives.
+# With a model registry configured, new versions are picked up and swapped in
+# while the app keeps serving.
+#
+# All sessions share one inference executor: crops from concurrent scans are
+# merged into common batches on a single thread that owns every core, rather
+# than each session's thread running its own TensorFlow predict.
 @st.cache_resource
-def load_resources():
-    try:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+def inference_executor():
+    return InferenceExecutor(max_batch_size=PREDICT_BATCH_SIZE)
 
-        MODEL_PATH = os.path.join(BASE_DIR, "brahmi_char_369_v1.h5")
-        LABEL_PATH = os.path.join(BASE_DIR, "index_to_label_v1.json")
-
-        model = load_model(MODEL_PATH)
-
-        with open(LABEL_PATH, encoding="utf-8") as f:
-            labels = json.load(f)
-            labels = {int(k): v for k, v in labels.items()}
+@st.cache_resource
+def engine_loader():
+    engine_kwargs = dict(cache=ResultCache(CACHE_PATH), executor=inference_executor(), threads=core_budget())
+    if MODEL_REGISTRY:
+        registry = ModelRegistry(MODEL_REGISTRY)
+        return BackgroundLoader(lambda: HotSwapEngine(registry, **engine_kwargs).start())
+    return BackgroundLoader(lambda: load_engine(**engine_kwargs))
 
-        return model, labels
+loader = engine_loader()
 
+def get_engine():
+    try:
+        with st.spinner("Loading neural weights..."):
+            return loader.result()
     except Exception as e:
         st.error(f"🚨 Model loading error: {e}")
-        return None, None
-
-model, index_to_label = load_resources()
-IMG_SIZE = 64
+        st.error("🚨 System Failure: Neural Weights Missing. Check 'brahmi_char_369_v1.h5'.")
+        st.stop()
 
 # --------------------------------------------------
 # HEADER
@@ -136,53 +130,114 @@ st.markdown(
 )
 
 # --------------------------------------------------
-# MAIN WORKSPACE
+# PARAMETER TUNING
 # --------------------------------------------------
-if model is None:
-    st.error("🚨 System Failure: Neural Weights Missing. Check 'brahmi_char_369_v1.h5'.")
-    st.stop()
+# Tuned scans go through a per-session incremental pipeline, so a slider move
+# reruns only the stages downstream of it (and classifies only new boxes).
+tuning = st.sidebar.toggle("🎛 Tune segmentation")
+if tuning:
+    d = DEFAULT_SEGMENTATION
+    params = SegmentationParams(
+        block_size=st.sidebar.slider("Threshold block size", 3, 51, d.block_size, step=2),
+        c=st.sidebar.slider("Threshold C", 0, 20, d.c),
+        kernel_size=st.sidebar.slider("Opening kernel", 1, 5, d.kernel_size),
+        min_height=st.sidebar.slider("Min glyph height (px)", 0, 60, d.min_height),
+        min_width=st.sidebar.slider("Min glyph width (px)", 0, 60, d.min_width),
+    )
+    word_gap = st.sidebar.slider("Word gap (px)", 0, 120, WORD_GAP)
 
+# --------------------------------------------------
+# MAIN WORKSPACE
+# --------------------------------------------------
 col1, col2 = st.columns([1, 1.3], gap="large")
 
+def render(result):
+    st.markdown(
+        f'<span class="status-badge">Neural Scan: {len(result.boxes)} Glyphs Found</span>',
+        unsafe_allow_html=True
+    )
+    if result.model_version:
+        st.caption(f"Model version {result.model_version}")
+    if result.crop_cache_hits:
+        st.caption(f"{result.crop_cache_hit_rate:.0%} of glyphs matched an earlier crop and skipped the classifier")
+
+    st.markdown('<div class="glass-card">', unsafe_allow_html=True)
+    st.markdown("### 📝 Neural Decryption")
+    st.session_state.last_sentence = result.sentence
+    scripts = {"Devanagari": None, "Brahmi": "brahmi", "IAST": "iast", "ISO 15919": "iso15919"}
+    for tab, scheme in zip(st.tabs(list(scripts)), scripts.values()):
+        lines = result.text_lines if scheme is None else [transliterate(line, scheme) for line in result.text_lines]
+        tab.markdown(f'<div class="result-text">{"<br>".join(lines)}</div>', unsafe_allow_html=True)
+    st.markdown('</div>', unsafe_allow_html=True)
+
+def live_reader(engine):
+    # Camera captures reuse the labels of glyphs already read in this session.
+    if "live" not in st.session_state:
+        st.session_state.live = LiveReader(engine)
+    return st.session_state.live
+
 with col1:
     st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-    file = st.file_uploader("Drop your Brahmi manuscript here", type=["png", "jpg", "jpeg"])
-    if file:
-        pil_image = Image.open(file).convert("RGB")
-        st.image(pil_image, use_container_width=True)
+    source = st.radio("Source", ["📄 Image", "📷 Camera", "🎞 Video"], horizontal=True)
+    camera = source == "📷 Camera"
+    video = None
+    if camera:
+        file = st.camera_input("Point the camera at the inscription")
+    elif source == "🎞 Video":
+        file = None
+        video = st.file_uploader("Recorded walkthrough", type=["mp4", "mov", "avi"])
+    else:
+        file = st.file_uploader("Drop your Brahmi manuscript here", type=["png", "jpg", "jpeg"])
+        if file:
+            # A reduced decode is plenty for the on-screen preview.
+            st.image(load_preview(file), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 with col2:
     if file:
-        img = np.array(pil_image)
-        boxes, thresh = segment_characters(img)
-
-        st.markdown(
-            f'<span class="status-badge">Neural Scan: {len(boxes)} Glyphs Found</span>',
-            unsafe_allow_html=True
-        )
+        engine = get_engine()
+        with METRICS.request() as trace:
+            if camera:
+                live = live_reader(engine)
+                result = live.process(file)
+            elif tuning:
+                if "pipeline" not in st.session_state:
+                    st.session_state.pipeline = IncrementalPipeline(engine)
+                pipeline = st.session_state.pipeline
+                pipeline.set_source(file)
+                result = pipeline.run(params, word_gap)
+            else:
+                result = engine.read(file)
 
-        sentence = ""
-        prev_end = None
+        if camera:
+            st.caption(f"{live.fps:.1f} FPS · {live.report()['reused']:.0%} of glyphs reused from earlier frames")
+        elif tuning:
+            st.sidebar.caption(
+                f"Re-ran: {', '.join(pipeline.last_run) or 'nothing'} "
+                f"({sum(pipeline.last_run.values()) * 1e3:.0f} ms, {pipeline.last_classified} glyphs classified)"
+            )
 
-        for (x, y, w, h) in boxes:
-            if prev_end is not None and x - prev_end > 25:
-                sentence += " "
+        render(result)
 
-            char_img = thresh[y:y+h, x:x+w]
-            char_img = cv2.resize(char_img, (IMG_SIZE, IMG_SIZE))
-            char_img = char_img.astype("float32") / 255.0
-            char_img = char_img.reshape(1, IMG_SIZE, IMG_SIZE, 1)
-
-            pred = model.predict(char_img, verbose=0)
-            label = index_to_label[int(np.argmax(pred))]
-            sentence += label
-            prev_end = x + w
-
-        st.markdown('<div class="glass-card">', unsafe_allow_html=True)
-        st.markdown("### 📝 Neural Decryption")
-        st.markdown(f'<div class="result-text">{sentence}</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+    elif video:
+        engine = get_engine()
+        live = LiveReader(engine)
+        status, slot = st.empty(), st.empty()
+        suffix = os.path.splitext(video.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix) as tmp:
+            # OpenCV reads video from a path, not from a buffer.
+            tmp.write(video.getvalue())
+            tmp.flush()
+            for n, frame in enumerate(iter_frames(tmp.name, every=2)):
+                result = live.process(frame)
+                status.caption(f"Frame {n} · {live.fps:.1f} FPS")
+                with slot.container():
+                    render(result)
+        report = live.report()
+        status.caption(
+            f"{report['frames']} frames at {report['fps']:.1f} FPS · "
+            f"{report['reused']:.0%} of glyphs reused from earlier frames"
+        )
 
     else:
         st.markdown(
@@ -191,3 +246,33 @@ with col2:
             '</div>',
             unsafe_allow_html=True
         )
+
+# --------------------------------------------------
+# DIAGNOSTICS
+# --------------------------------------------------
+if st.sidebar.toggle("🩺 Diagnostics", value=METRICS.enabled):
+    METRICS.enable()
+    st.sidebar.caption("Collection is process-wide and stays on until restart.")
+    if file:
+        st.sidebar.markdown("**This scan (ms)**")
+        st.sidebar.table({k: round(v * 1e3, 2) for k, v in trace.stages.items()})
+        st.sidebar.json(trace.counters)
+    st.sidebar.markdown("**All requests (mean ms)**")
+    st.sidebar.table({k: round(v["mean_s"] * 1e3, 2) for k, v in METRICS.summary().items()})
+    if file and getattr(engine, "crop_cache", None) is not None:
+        st.sidebar.markdown("**Crop cache**")
+        st.sidebar.json({**engine.crop_cache.stats, "entries": len(engine.crop_cache),
+                         "hit_rate": round(engine.crop_cache.hit_rate(), 3)})
+    st.sidebar.markdown("**Inference queue**")
+    st.sidebar.json(inference_executor().report())
+    st.sidebar.download_button("Prometheus metrics", METRICS.render_prometheus(), "brahmilens.prom")
+
+# --------------------------------------------------
+# STARTUP REPORT
+# --------------------------------------------------
+if loader.ready():
+    with st.sidebar.expander("⏱ Startup report"):
+        try:
+            st.code(loader.result().startup_report.format())
+        except Exception as e:
+            st.caption(f"Engine unavailable: {e}")
@@ -0,0 +1,43 @@
+"""Headless BrahmiLens OCR engine, usable without Streamlit.
+
+Names are imported on first access, so light modules such as
+``brahmilens.transliterate`` can be used without loading the engine.
+"""
+import importlib
+
+_EXPORTS = {
+    "CropCache": "cache",
+    "DEFAULT_NOISE_FILTER": "noise",
+    "DEFAULT_SEGMENTATION": "segmentation",
+    "GlyphIndex": "similarity",
+    "GridIndex": "layout",
+    "HotSwapEngine": "registry",
+    "ModelRegistry": "registry",
+    "NoiseFilter": "noise",
+    "OCREngine": "engine",
+    "OCRResult": "engine",
+    "ResultCache": "cache",
+    "SegmentationParams": "segmentation",
+    "group_lines": "layout",
+    "load_labels": "resources",
+    "load_resources": "resources",
+    "reading_order": "layout",
+    "segment_characters": "segmentation",
+    "segment_components": "components",
+    "segment_tiled": "tiling",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
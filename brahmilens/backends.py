@@ -0,0 +1,277 @@
+import importlib
+import importlib.util
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+from .config import (
+    BACKEND, EMBED_DIM, IMG_SIZE, INFERENCE_THREADS, KERAS_BUCKETS, KERAS_XLA, MODEL_PATH, NPZ_MODEL_PATH,
+    NUMPY_DTYPE, ONNX_MODEL_PATH, TFLITE_MODEL_PATH,
+)
+
+
+# --------------------------------------------------
+# BACKENDS
+# --------------------------------------------------
+# Every backend maps a float32 (N, 64, 64, 1) batch to (N, classes) softmax
+# probabilities. ``predict_embeddings`` also returns the (N, 64) activations
+# of the dense bottleneck. Heavy runtimes are imported on construction only.
+
+def embedding_model(model):
+    """Keras model with outputs ``[probabilities, bottleneck]`` sharing ``model``'s weights."""
+    import tensorflow as tf
+
+    for layer in reversed(model.layers[:-1]):
+        if isinstance(layer, tf.keras.layers.Dense) and layer.output.shape[-1] == EMBED_DIM:
+            return tf.keras.Model(model.inputs, [model.output, layer.output])
+    raise ValueError(f"model has no {EMBED_DIM}-unit dense bottleneck")
+
+
+def _no_embeddings(path):
+    return ValueError(f"{path} has no embedding output; re-export it with `python -m brahmilens.convert export`")
+
+
+class KerasBackend:
+    name = "keras"
+    default_path = MODEL_PATH
+    runtime = "tensorflow"
+
+    def __init__(self, model_path=MODEL_PATH, threads=INFERENCE_THREADS, buckets=KERAS_BUCKETS, xla=KERAS_XLA):
+        import tensorflow as tf
+
+        if threads:
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(threads)
+                tf.config.threading.set_inter_op_parallelism_threads(1)
+            except RuntimeError:
+                # Fixed once the runtime is initialised, e.g. by an earlier model in a hot swap.
+                pass
+        self.model_path = model_path
+        if os.path.isdir(model_path):
+            # Registry version: graph from JSON, one .npy file per weight tensor,
+            # mapped rather than read so set_weights copies from the page cache.
+            with open(os.path.join(model_path, "architecture.json"), encoding="utf-8") as f:
+                self.model = tf.keras.models.model_from_json(f.read())
+            weights_dir = os.path.join(model_path, "weights")
+            self.model.set_weights([np.load(os.path.join(weights_dir, name), mmap_mode="r")
+                                    for name in sorted(os.listdir(weights_dir))])
+        else:
+            self.model = tf.keras.models.load_model(model_path)
+        self.buckets = tuple(sorted(buckets or ()))
+        self.xla = xla
+        self._embedder = None
+        # model.predict builds a data adapter and callbacks on every call, and
+        # a plain tf.function would retrace for every new glyph count; instead
+        # each bucket is traced (and run once, which is when XLA compiles) now.
+        self._forward = self._compile(self.model) if self.buckets else None
+        self._embed_forward = None
+
+    def _compile(self, model):
+        import tensorflow as tf
+
+        forward = tf.function(lambda x: model(x, training=False), jit_compile=self.xla, reduce_retracing=False)
+        graphs = {}
+        for n in self.buckets:
+            graph = forward.get_concrete_function(tf.TensorSpec((n, IMG_SIZE, IMG_SIZE, 1), tf.float32))
+            graph(tf.zeros((n, IMG_SIZE, IMG_SIZE, 1), tf.float32))
+            graphs[n] = graph
+        return graphs
+
+    def _run(self, graphs, batch):
+        # Zero-pad each chunk up to the next bucket; returns a list of output arrays.
+        import tensorflow as tf
+
+        largest = self.buckets[-1]
+        parts = []
+        for start in range(0, len(batch), largest):
+            chunk = np.asarray(batch[start:start + largest], dtype=np.float32)
+            n = len(chunk)
+            bucket = self.buckets[bisect_left(self.buckets, n)]
+            if bucket != n:
+                padded = np.zeros((bucket,) + chunk.shape[1:], dtype=np.float32)
+                padded[:n] = chunk
+                chunk = padded
+            outputs = tf.nest.flatten(graphs[bucket](tf.constant(chunk)))
+            parts.append([out.numpy()[:n] for out in outputs])
+        return [np.concatenate(outs) for outs in zip(*parts)]
+
+    def predict(self, batch):
+        if self._forward is None or len(batch) == 0:
+            return self.model.predict(batch, verbose=0)
+        return self._run(self._forward, batch)[0]
+
+    def predict_embeddings(self, batch):
+        if self._embedder is None:
+            self._embedder = embedding_model(self.model)
+        if self._forward is None or len(batch) == 0:
+            probs, embeddings = self._embedder.predict(batch, verbose=0)
+            return probs, embeddings
+        if self._embed_forward is None:
+            self._embed_forward = self._compile(self._embedder)
+        probs, embeddings = self._run(self._embed_forward, batch)
+        return probs, embeddings
+
+
+class OnnxBackend:
+    name = "onnx"
+    default_path = ONNX_MODEL_PATH
+    runtime = "onnxruntime"
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, threads=INFERENCE_THREADS):
+        import onnxruntime as ort
+
+        self.model_path = model_path
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        outputs = self.session.get_outputs()
+        self.output_name = outputs[0].name
+        # Exported by brahmilens.convert, the bottleneck is a second graph output.
+        self.embedding_name = next((o.name for o in outputs[1:] if o.shape[-1] == EMBED_DIM), None)
+
+    def predict(self, batch):
+        feed = {self.input_name: np.ascontiguousarray(batch, dtype="float32")}
+        return self.session.run([self.output_name], feed)[0]
+
+    def predict_embeddings(self, batch):
+        if self.embedding_name is None:
+            raise _no_embeddings(self.model_path)
+        feed = {self.input_name: np.ascontiguousarray(batch, dtype="float32")}
+        probs, embeddings = self.session.run([self.output_name, self.embedding_name], feed)
+        return probs, embeddings
+
+
+class TFLiteBackend:
+    name = "tflite"
+    default_path = TFLITE_MODEL_PATH
+    runtime = ("tflite_runtime.interpreter", "tensorflow")
+
+    def __init__(self, model_path=TFLITE_MODEL_PATH, threads=INFERENCE_THREADS):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=threads)
+        self.input = self.interpreter.get_input_details()[0]
+        # The converter does not keep output order, so tell them apart by width.
+        outputs = self.interpreter.get_output_details()
+        self.embedding = next((o for o in outputs if o["shape"][-1] == EMBED_DIM), None) if len(outputs) > 1 else None
+        self.output = next(o for o in outputs if o is not self.embedding)
+        self._batch_size = None
+
+    def _resize(self, n):
+        if n != self._batch_size:
+            shape = [n] + list(self.input["shape"][1:])
+            self.interpreter.resize_tensor_input(self.input["index"], shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = n
+
+    def _invoke(self, batch):
+        self._resize(len(batch))
+        scale, zero_point = self.input["quantization"]
+        if self.input["dtype"] != np.float32 and scale:
+            batch = np.round(batch / scale + zero_point).astype(self.input["dtype"])
+        self.interpreter.set_tensor(self.input["index"], np.ascontiguousarray(batch))
+        self.interpreter.invoke()
+
+    def _output(self, detail):
+        out = self.interpreter.get_tensor(detail["index"])
+        scale, zero_point = detail["quantization"]
+        if detail["dtype"] != np.float32 and scale:
+            out = (out.astype("float32") - zero_point) * scale
+        return out
+
+    def predict(self, batch):
+        self._invoke(batch)
+        return self._output(self.output)
+
+    def predict_embeddings(self, batch):
+        if self.embedding is None:
+            raise _no_embeddings(self.model_path)
+        self._invoke(batch)
+        return self._output(self.output), self._output(self.embedding)
+
+
+class NumpyBackend:
+    """Pure-NumPy forward pass (see npcnn.py); needs no deep-learning runtime."""
+
+    name = "numpy"
+    default_path = NPZ_MODEL_PATH
+    runtime = "numpy"
+
+    def __init__(self, model_path=NPZ_MODEL_PATH, threads=INFERENCE_THREADS, dtype=NUMPY_DTYPE):
+        from .npcnn import NumpyCNN
+
+        # GEMMs run on NumPy's BLAS, whose thread count is fixed at import
+        # (OPENBLAS_NUM_THREADS / OMP_NUM_THREADS), so ``threads`` is not applied.
+        self.model_path = model_path
+        self.net = NumpyCNN(model_path, dtype)
+
+    def predict(self, batch):
+        return self.net.predict(batch)
+
+    def predict_embeddings(self, batch):
+        if not self.net.has_embedding:
+            raise _no_embeddings(self.model_path)
+        return self.net.predict_embeddings(batch)
+
+
+BACKENDS = {
+    KerasBackend.name: KerasBackend,
+    OnnxBackend.name: OnnxBackend,
+    TFLiteBackend.name: TFLiteBackend,
+    NumpyBackend.name: NumpyBackend,
+}
+
+
+def backend_class(name=None):
+    name = name or BACKEND
+    try:
+        return BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"unknown inference backend {name!r}; choose from {sorted(BACKENDS)}") from None
+
+
+def import_runtime(name=None):
+    """Import the runtime behind backend ``name`` without loading any weights."""
+    runtime = backend_class(name).runtime
+    candidates = (runtime,) if isinstance(runtime, str) else runtime
+    for module in candidates[:-1]:
+        try:
+            return importlib.import_module(module)
+        except ImportError:
+            pass
+    return importlib.import_module(candidates[-1])
+
+
+def unavailable_reason(name, model_path=None):
+    """Why backend ``name`` cannot run here (missing model or runtime), or None if it can."""
+    cls = backend_class(name)
+    path = model_path or cls.default_path
+    if not os.path.exists(path):
+        return f"no model at {path}"
+    candidates = (cls.runtime,) if isinstance(cls.runtime, str) else cls.runtime
+    # find_spec("a.b") imports the parent package, which may itself be missing.
+    for module in candidates:
+        try:
+            if importlib.util.find_spec(module) is not None:
+                return None
+        except ImportError:
+            pass
+    return f"{' or '.join(candidates)} is not installed"
+
+
+def load_backend(name=None, model_path=None, **kwargs):
+    """Instantiate the backend ``name`` (default: BRAHMILENS_BACKEND)."""
+    cls = backend_class(name)
+    return cls(model_path or cls.default_path, **kwargs)
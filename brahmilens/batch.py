@@ -0,0 +1,249 @@
+"""Parallel corpus OCR with ordered JSONL output and checkpoint/resume.
+
+    python -m brahmilens.batch archive/ --recursive --out corpus.jsonl --workers 8
+
+The parent loads the model once and forks the workers afterwards, so the
+weights are shared copy-on-write. Pass ``--start-method spawn`` to load a
+model per worker instead; use it with the Keras backend if TensorFlow's
+thread pools misbehave after fork. Work and result queues are bounded. Results
+are written in input order. Every ``--checkpoint-every`` files the output is
+fsynced and its byte offset is recorded, so a killed job resumes from the last
+checkpoint without redoing finished files. An existing output without a
+checkpoint is left alone unless ``--resume`` (keep its complete records) or
+``--overwrite`` (start over) is given. ``--retry-errors`` drops the records of
+files that failed and runs them again.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+
+from .cli import iter_images
+
+_ENGINE = None
+
+
+def _worker(tasks, results, engine_kwargs):
+    global _ENGINE
+    if _ENGINE is None:  # spawn start method, or nothing loaded before fork
+        from .engine import OCREngine
+
+        _ENGINE = OCREngine(**engine_kwargs)
+    while True:
+        item = tasks.get()
+        if item is None:
+            return
+        seq, path = item
+        try:
+            payload = {"path": path, **_ENGINE.read(path).to_dict()}
+        except Exception as e:
+            payload = {"path": path, "error": f"{type(e).__name__}: {e}"}
+        results.put((seq, payload))
+
+
+class BatchRunner:
+    def __init__(self, out_path, workers=None, engine_kwargs=None, start_method="fork",
+                 checkpoint_every=50, window=None, progress=sys.stderr,
+                 overwrite=False, resume=False, retry_errors=False):
+        self.out_path = out_path
+        self.checkpoint_path = out_path + ".checkpoint"
+        self.workers = workers or os.cpu_count()
+        self.engine_kwargs = engine_kwargs or {}
+        self.start_method = start_method
+        self.checkpoint_every = checkpoint_every
+        self.window = window or 4 * self.workers
+        self.progress = progress
+        self.overwrite = overwrite
+        self.resume = resume
+        self.retry_errors = retry_errors
+
+    # ---------------- checkpointing ----------------
+    def _resume(self):
+        """Cut the output back to its last complete record; return the paths already done.
+
+        Raises ``FileExistsError`` rather than touch an output that has no
+        checkpoint, unless ``resume`` or ``overwrite`` was asked for.
+        """
+        if self.overwrite:
+            for path in (self.out_path, self.checkpoint_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return set()
+        if not os.path.exists(self.out_path):
+            return set()
+        size = os.path.getsize(self.out_path)
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                offset = json.load(f)["bytes"]
+            if offset > size:
+                raise FileExistsError(f"{self.out_path} is shorter than its checkpoint; pass --overwrite to start over")
+        elif self.resume:
+            offset = size
+        else:
+            raise FileExistsError(
+                f"{self.out_path} exists but has no checkpoint; pass --resume to keep its records "
+                "or --overwrite to replace it"
+            )
+
+        with open(self.out_path, "rb") as f:
+            data = f.read(offset)
+        data = data[:data.rfind(b"\n") + 1]     # a record cut off mid-write is redone
+        records = [json.loads(line) for line in data.splitlines()]
+        if self.retry_errors and any("error" in r for r in records):
+            records = [r for r in records if "error" not in r]
+            tmp = self.out_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.out_path)
+            with open(self.out_path, "rb") as f:
+                self._write_checkpoint(len(records), os.fstat(f.fileno()).st_size)
+        else:
+            with open(self.out_path, "r+b") as f:
+                f.truncate(len(data))
+        return {r["path"] for r in records}
+
+    def _write_checkpoint(self, written, offset):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"files": written, "bytes": offset}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _checkpoint(self, out, written):
+        out.flush()
+        os.fsync(out.fileno())
+        self._write_checkpoint(written, out.tell())
+
+    # ---------------- execution ----------------
+    def _start_workers(self, ctx, tasks, results):
+        global _ENGINE
+        if self.start_method == "fork" and _ENGINE is None:
+            from .engine import OCREngine
+
+            _ENGINE = OCREngine(**self.engine_kwargs)
+        procs = [
+            ctx.Process(target=_worker, args=(tasks, results, self.engine_kwargs), daemon=True)
+            for _ in range(self.workers)
+        ]
+        for p in procs:
+            p.start()
+        return procs
+
+    def run(self, paths):
+        """OCR ``paths``; returns ``{"files", "glyphs", "errors", "skipped", "seconds"}``."""
+        done = self._resume()
+        todo = (p for p in paths if p not in done)
+
+        ctx = multiprocessing.get_context(self.start_method)
+        tasks = ctx.Queue(maxsize=self.window)
+        results = ctx.Queue(maxsize=self.window)
+        procs = self._start_workers(ctx, tasks, results)
+
+        stats = {"files": 0, "glyphs": 0, "errors": 0, "skipped": len(done)}
+        start = last_report = time.perf_counter()
+        pending, next_seq, sent, exhausted = {}, 0, 0, False
+        try:
+            with open(self.out_path, "a", encoding="utf-8") as out:
+                while True:
+                    while not exhausted and sent - next_seq < self.window:
+                        path = next(todo, None)
+                        if path is None:
+                            exhausted = True
+                            break
+                        tasks.put((sent, path))
+                        sent += 1
+                    if exhausted and next_seq == sent:
+                        break
+
+                    try:
+                        seq, payload = results.get(timeout=1.0)
+                    except queue.Empty:
+                        if not all(p.is_alive() for p in procs):
+                            raise RuntimeError("a worker died; rerun to resume from the last checkpoint")
+                        continue
+                    pending[seq] = payload
+
+                    # Emit strictly in input order.
+                    while next_seq in pending:
+                        payload = pending.pop(next_seq)
+                        out.write(json.dumps(payload, ensure_ascii=False) + "\n")
+                        next_seq += 1
+                        stats["files"] += 1
+                        stats["glyphs"] += len(payload.get("boxes", ()))
+                        stats["errors"] += "error" in payload
+                        if stats["files"] % self.checkpoint_every == 0:
+                            self._checkpoint(out, stats["skipped"] + stats["files"])
+
+                    now = time.perf_counter()
+                    if self.progress and now - last_report >= 1.0:
+                        self._report(stats, now - start)
+                        last_report = now
+                self._checkpoint(out, stats["skipped"] + stats["files"])
+        finally:
+            for _ in procs:
+                try:
+                    tasks.put(None, timeout=1.0)
+                except queue.Full:
+                    break
+            for p in procs:
+                p.join(timeout=5)
+                if p.is_alive():
+                    p.terminate()
+
+        stats["seconds"] = time.perf_counter() - start
+        if self.progress:
+            self._report(stats, stats["seconds"])
+        return stats
+
+    def _report(self, stats, elapsed):
+        elapsed = max(elapsed, 1e-9)
+        print(
+            f"brahmilens.batch: {stats['files']} files ({stats['skipped']} resumed, {stats['errors']} errors) | "
+            f"{stats['files'] / elapsed:.1f} files/s | {stats['glyphs'] / elapsed:.0f} glyphs/s",
+            file=self.progress,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.batch")
+    parser.add_argument("paths", nargs="*", help="image files or directories")
+    parser.add_argument("--list", help="text file with one image path per line")
+    parser.add_argument("-r", "--recursive", action="store_true")
+    parser.add_argument("--out", required=True, help="JSONL output (appended to on resume)")
+    existing = parser.add_mutually_exclusive_group()
+    existing.add_argument("--resume", action="store_true",
+                          help="continue an output that has no checkpoint, keeping its complete records")
+    existing.add_argument("--overwrite", action="store_true", help="discard an existing output and checkpoint")
+    parser.add_argument("--retry-errors", action="store_true", help="run files whose earlier attempt failed again")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--start-method", choices=["fork", "spawn", "forkserver"], default="fork")
+    parser.add_argument("--checkpoint-every", type=int, default=50)
+    parser.add_argument("--backend")
+    parser.add_argument("--model")
+    args = parser.parse_args(argv)
+
+    def inputs():
+        yield from iter_images(args.paths, args.recursive)
+        if args.list:
+            with open(args.list, encoding="utf-8") as f:
+                yield from (line.strip() for line in f if line.strip())
+
+    runner = BatchRunner(
+        args.out, args.workers, {"model_path": args.model, "backend": args.backend},
+        args.start_method, args.checkpoint_every,
+        overwrite=args.overwrite, resume=args.resume, retry_errors=args.retry_errors,
+    )
+    try:
+        stats = runner.run(inputs())
+    except FileExistsError as e:
+        parser.error(str(e))
+    return 1 if stats["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
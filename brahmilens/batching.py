@@ -0,0 +1,308 @@
+"""Dynamic micro-batching of glyph crops across concurrent requests.
+
+``MicroBatcher`` serves asyncio callers (the HTTP server); ``InferenceExecutor``
+serves threads (Streamlit sessions).
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from .metrics import METRICS
+
+
+class QueueFull(Exception):
+    """Raised when accepting more crops would exceed the queue-depth limit."""
+
+
+class _Job:
+    __slots__ = ("crops", "offset", "parts", "future", "enqueued", "started", "inference")
+
+    def __init__(self, crops, future):
+        self.crops = crops
+        self.offset = 0
+        self.parts = []
+        self.future = future
+        self.enqueued = time.perf_counter()
+        self.started = None
+        self.inference = 0.0
+
+
+class MicroBatcher:
+    """Coalesce crop batches from many requests into shared inference calls.
+
+    A batch is dispatched once ``max_batch_size`` crops are pending or the
+    oldest pending request has waited ``max_wait_ms``. Large requests are split
+    across batches and reassembled. Inference runs on a single dedicated thread
+    so the event loop stays responsive.
+    """
+
+    def __init__(self, predict, max_batch_size=128, max_wait_ms=5.0, max_queue=4096):
+        self.predict = predict
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue = max_queue
+        self.pending = deque()
+        self.depth = 0
+        self.stats = {"batches": 0, "glyphs": 0, "rejected": 0}
+        self._wakeup = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="brahmilens-infer")
+
+    def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+    async def submit(self, crops):
+        """Return ``(probs, queue_seconds, inference_seconds)`` for ``crops``."""
+        if len(crops) == 0:
+            return np.empty((0, 0), dtype="float32"), 0.0, 0.0
+        # An idle server admits any request, so one larger than max_queue is
+        # served alone instead of being told to retry forever.
+        if self.depth and self.depth + len(crops) > self.max_queue:
+            self.stats["rejected"] += 1
+            raise QueueFull(f"{self.depth} glyphs already queued")
+        job = _Job(crops, asyncio.get_running_loop().create_future())
+        self.pending.append(job)
+        self.depth += len(crops)
+        self._wakeup.set()
+        return await job.future
+
+    def _take_batch(self):
+        taken, size = [], 0
+        while self.pending and size < self.max_batch_size:
+            job = self.pending[0]
+            n = min(len(job.crops) - job.offset, self.max_batch_size - size)
+            taken.append((job, job.offset, job.offset + n))
+            job.offset += n
+            size += n
+            if job.offset == len(job.crops):
+                self.pending.popleft()
+        self.depth -= size
+        return taken, size
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self.pending:
+                deadline = self.pending[0].enqueued + self.max_wait
+                while self.depth < self.max_batch_size and time.perf_counter() < deadline:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), deadline - time.perf_counter())
+                    except asyncio.TimeoutError:
+                        break
+
+                taken, size = self._take_batch()
+                started = time.perf_counter()
+                try:
+                    # Inside the try: a malformed batch fails its own requests, not the loop.
+                    batch = np.concatenate([job.crops[lo:hi] for job, lo, hi in taken])
+                    probs = await loop.run_in_executor(self._executor, self.predict, batch)
+                except Exception as e:
+                    for job, _, _ in taken:
+                        if not job.future.done():
+                            job.future.set_exception(e)
+                    continue
+                elapsed = time.perf_counter() - started
+                if METRICS.enabled:
+                    METRICS.record_stage("inference", elapsed)
+                    METRICS.observe("batch_size", size)
+                self.stats["batches"] += 1
+                self.stats["glyphs"] += size
+
+                start = 0
+                for job, lo, hi in taken:
+                    job.parts.append(probs[start:start + hi - lo])
+                    start += hi - lo
+                    job.inference += elapsed
+                    if job.started is None:
+                        job.started = started
+                    if hi == len(job.crops) and not job.future.done():
+                        queued = job.started - job.enqueued
+                        job.future.set_result((np.concatenate(job.parts), queued, job.inference))
+
+
+def core_budget():
+    """CPU cores this process may run on (respects taskset / cgroup affinity)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class _Request:
+    __slots__ = ("model", "embeddings", "crops", "offset", "parts", "future", "enqueued", "started")
+
+    def __init__(self, model, embeddings, crops):
+        self.model = model
+        self.embeddings = embeddings
+        self.crops = crops
+        self.offset = 0
+        self.parts = []
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+        self.started = None
+
+
+class InferenceExecutor:
+    """Process-wide, thread-based counterpart of ``MicroBatcher`` for in-process callers.
+
+    Every Streamlit session runs in its own thread; letting each of them call
+    ``model.predict`` makes TensorFlow's thread pools fight over the cores.
+    Instead, sessions ``submit`` crops and wait on the returned future, and a
+    single dispatcher thread runs all inference. Pending work is merged into
+    shared batches, filled round-robin across clients ``quantum`` crops at a
+    time, so a page with thousands of glyphs cannot hold up a small one.
+    Requests for different models (e.g. during a hot swap) or for embeddings
+    are batched separately.
+    """
+
+    def __init__(self, max_batch_size=128, max_wait_ms=2.0, quantum=32, max_queue=1 << 16, window=1024):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.quantum = quantum
+        self.max_queue = max_queue
+        self.depth = 0
+        self._queues = OrderedDict()      # client -> deque of _Request
+        self._cond = threading.Condition()
+        self._waits = deque(maxlen=window)
+        self._inference = deque(maxlen=window)
+        self.stats = {"batches": 0, "glyphs": 0, "requests": 0, "rejected": 0}
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="brahmilens-executor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def submit(self, model, crops, embeddings=False, client=None):
+        """Future for ``model.predict(crops)`` (or ``predict_embeddings``); ``client`` defaults to the thread."""
+        request = _Request(model, embeddings, crops)
+        with self._cond:
+            if self.depth + len(crops) > self.max_queue:
+                self.stats["rejected"] += 1
+                raise QueueFull(f"{self.depth} glyphs already queued")
+            key = threading.get_ident() if client is None else client
+            self._queues.setdefault(key, deque()).append(request)
+            self.depth += len(crops)
+            self.stats["requests"] += 1
+            self._cond.notify()
+        return request.future
+
+    def _ready(self):
+        # Dispatch on a full batch or once the oldest request has waited max_wait.
+        if self.depth >= self.max_batch_size:
+            return 0.0
+        oldest = min(queue[0].enqueued for queue in self._queues.values())
+        return max(0.0, oldest + self.max_wait - time.perf_counter())
+
+    def _take_batch(self):
+        group = None
+        taken, size = [], 0
+        progress = True
+        while progress and size < self.max_batch_size:
+            progress = False
+            for client in list(self._queues):
+                queue = self._queues[client]
+                request = queue[0]
+                if group is None:
+                    group = (request.model, request.embeddings)
+                elif (request.model, request.embeddings) != group:
+                    continue
+                n = min(len(request.crops) - request.offset, self.quantum, self.max_batch_size - size)
+                taken.append((request, request.offset, request.offset + n))
+                request.offset += n
+                size += n
+                progress = True
+                if request.offset == len(request.crops):
+                    queue.popleft()
+                if queue:
+                    # Served clients queue up behind the ones still waiting.
+                    self._queues.move_to_end(client)
+                else:
+                    del self._queues[client]
+                if size == self.max_batch_size:
+                    break
+        self.depth -= size
+        return group, taken, size
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._queues or self._ready() > 0):
+                    self._cond.wait(self._ready() if self._queues else None)
+                if self._stopped:
+                    return
+                (model, embeddings), taken, size = self._take_batch()
+            started = time.perf_counter()
+            try:
+                batch = np.concatenate([request.crops[lo:hi] for request, lo, hi in taken])
+                out = model.predict_embeddings(batch) if embeddings else model.predict(batch)
+            except Exception as e:
+                for request, _, _ in taken:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+                continue
+            elapsed = time.perf_counter() - started
+            self._inference.append(elapsed)
+            # This thread has no request trace: callers time their own wait as
+            # "inference", and the process-wide histograms get the batch view.
+            if METRICS.enabled:
+                METRICS.record_stage("executor_batch", elapsed)
+                METRICS.observe("batch_size", size)
+            self.stats["batches"] += 1
+            self.stats["glyphs"] += size
+
+            start = 0
+            for request, lo, hi in taken:
+                part = tuple(o[start:start + hi - lo] for o in out) if embeddings else out[start:start + hi - lo]
+                request.parts.append(part)
+                start += hi - lo
+                if request.started is None:
+                    request.started = started
+                    wait = started - request.enqueued
+                    self._waits.append(wait)
+                    if METRICS.enabled:
+                        METRICS.record_stage("executor_queue_wait", wait)
+                if hi == len(request.crops) and not request.future.done():
+                    if embeddings:
+                        result = tuple(np.concatenate(p) for p in zip(*request.parts))
+                    else:
+                        result = np.concatenate(request.parts)
+                    request.future.set_result(result)
+
+    def report(self):
+        """Queue depth, throughput counters and recent wait / inference percentiles (ms)."""
+        with self._cond:
+            waits = np.array(self._waits) * 1e3
+            inference = np.array(self._inference) * 1e3
+            report = {
+                **self.stats,
+                "queue_depth": self.depth,
+                "queued_requests": sum(len(q) for q in self._queues.values()),
+                "clients": len(self._queues),
+            }
+        report["mean_batch"] = report["glyphs"] / report["batches"] if report["batches"] else 0.0
+        for name, values in (("wait_ms", waits), ("inference_ms", inference)):
+            if len(values):
+                p50, p95, p99 = np.percentile(values, [50, 95, 99]).tolist()
+                report[name] = {"p50": p50, "p95": p95, "p99": p99, "max": float(values.max())}
+        return report
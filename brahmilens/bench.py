@@ -0,0 +1,296 @@
+"""Reproducible per-stage performance benchmarks on synthetic pages.
+
+    python -m brahmilens.bench run --out bench.json
+    python -m brahmilens.bench run --out new.json --compare bench.json
+    python -m brahmilens.bench inference --xla
+
+Every stage of the OCR path is timed separately (decode, threshold,
+contours, crop/resize, inference, assembly) over a grid of page scales and
+glyph densities. Pages are generated offline from fixed seeds. ``--compare``
+flags stages whose median regressed past ``--threshold`` against a stored
+baseline and exits non-zero when any did.
+
+``inference`` compares the Keras backend's pre-traced bucket graphs with
+plain ``model.predict``: latency and throughput per bucket size, and whole
+pages through the engine's batching loop.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+from dataclasses import replace
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .config import IMG_SIZE, KERAS_BUCKETS, PREDICT_BATCH_SIZE
+from .ingest import load_image
+from .layout import reading_order
+from .recognition import assemble_lines, build_label_table, predict_batched, prepare_crops
+from .resources import load_labels
+from .segmentation import DEFAULT_SEGMENTATION, binarize, find_boxes
+from .synth import PageSpec, render_page, spec_dict
+
+STAGES = ("decode", "threshold", "contours", "crop_resize", "inference", "assembly")
+
+DEFAULT_SCALES = (1.0, 2.0, 4.0)
+DEFAULT_GLYPHS = (20, 100, 400)
+
+
+def _timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def run_page(spec, model, index_to_label, repeats=5, image_format="PNG"):
+    """Time every stage on one synthetic page; returns per-stage medians / p95 in ms."""
+    page, truth = render_page(spec, index_to_label)
+    buf = io.BytesIO()
+    Image.fromarray(page).save(buf, format=image_format)
+    encoded = buf.getvalue()
+    label_table = build_label_table(index_to_label)
+
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(repeats):
+        image, dt = _timed(load_image, io.BytesIO(encoded))
+        samples["decode"].append(dt)
+        thresh, dt = _timed(binarize, image, DEFAULT_SEGMENTATION)
+        samples["threshold"].append(dt)
+        boxes, dt = _timed(find_boxes, thresh, DEFAULT_SEGMENTATION)
+        samples["contours"].append(dt)
+        crops, dt = _timed(prepare_crops, boxes, thresh)
+        samples["crop_resize"].append(dt)
+        if model is not None and len(crops):
+            probs, dt = _timed(predict_batched, model, crops, PREDICT_BATCH_SIZE)
+            samples["inference"].append(dt)
+            labels = label_table[probs.argmax(axis=1)].tolist()
+        else:
+            labels = ["?"] * len(boxes)
+
+        def assemble():
+            order, lines = reading_order(boxes)
+            ordered = [boxes[i] for i in order]
+            return assemble_lines(ordered, [labels[i] for i in order], lines)
+
+        _, dt = _timed(assemble)
+        samples["assembly"].append(dt)
+
+    stages = {}
+    for stage, values in samples.items():
+        if values:
+            ms = np.asarray(values) * 1e3
+            stages[stage] = {"median_ms": float(np.median(ms)), "p95_ms": float(np.percentile(ms, 95))}
+    return {
+        "page": spec_dict(spec),
+        "pixels": int(page.shape[0] * page.shape[1]),
+        "glyphs_truth": len(truth),
+        "glyphs_found": len(boxes),
+        "stages": stages,
+    }
+
+
+def run_suite(model, scales=DEFAULT_SCALES, glyphs=DEFAULT_GLYPHS, repeats=5, base=PageSpec()):
+    index_to_label = load_labels()
+    results = []
+    for scale in scales:
+        for count in glyphs:
+            spec = replace(base, scale=scale, glyphs=count, glyph_height=base.glyph_height)
+            results.append(run_page(spec, model, index_to_label, repeats))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "inference": model is not None,
+        },
+        "results": results,
+    }
+
+
+def _case_key(result):
+    page = result["page"]
+    return f"scale={page['scale']} glyphs={page['glyphs']}"
+
+
+def compare(current, baseline, threshold=0.10, min_ms=0.5):
+    """Return regressions: stages slower than baseline by more than ``threshold``."""
+    base = {_case_key(r): r["stages"] for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        key = _case_key(result)
+        for stage, stats in result["stages"].items():
+            old = base.get(key, {}).get(stage)
+            if old is None:
+                continue
+            new_ms, old_ms = stats["median_ms"], old["median_ms"]
+            if new_ms - old_ms > min_ms and new_ms > old_ms * (1 + threshold):
+                regressions.append({
+                    "case": key, "stage": stage,
+                    "baseline_ms": old_ms, "current_ms": new_ms,
+                    "change": new_ms / old_ms - 1,
+                })
+    return regressions
+
+
+def format_results(report):
+    header = f"{'case':<24}" + "".join(f"{s:>13}" for s in STAGES)
+    lines = [header]
+    for result in report["results"]:
+        cells = "".join(
+            f"{result['stages'][s]['median_ms']:>13.2f}" if s in result["stages"] else f"{'-':>13}"
+            for s in STAGES
+        )
+        lines.append(f"{_case_key(result):<24}{cells}")
+    return "\n".join(lines)
+
+
+class _KerasPredict:
+    """``model.predict`` as the app called it before the bucketed graphs."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def predict(self, batch):
+        return self.model.predict(batch, verbose=0)
+
+
+def _median_ms(fn, batch, repeats):
+    fn(batch)
+    samples = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        fn(batch)
+        samples.append(time.perf_counter() - t)
+    return float(np.median(samples)) * 1e3
+
+
+def run_inference(model_path=None, buckets=KERAS_BUCKETS, xla=False, repeats=20, pages=DEFAULT_GLYPHS):
+    """Per-call latency and throughput of bucketed graphs vs ``model.predict``."""
+    from .backends import KerasBackend
+
+    t = time.perf_counter()
+    backend = KerasBackend(model_path or KerasBackend.default_path, buckets=buckets, xla=xla)
+    load_s = time.perf_counter() - t
+    baseline = _KerasPredict(backend.model)
+    rng = np.random.default_rng(0)
+
+    rows = []
+    for n in backend.buckets:
+        batch = rng.random((n, IMG_SIZE, IMG_SIZE, 1), dtype=np.float32)
+        predict_ms = _median_ms(baseline.predict, batch, repeats)
+        compiled_ms = _median_ms(backend.predict, batch, repeats)
+        rows.append({
+            "case": f"bucket {n}", "glyphs": n,
+            "predict_ms": predict_ms, "compiled_ms": compiled_ms,
+            "predict_glyphs_s": n / predict_ms * 1e3, "compiled_glyphs_s": n / compiled_ms * 1e3,
+        })
+    for n in pages:
+        crops = rng.random((n, IMG_SIZE, IMG_SIZE, 1), dtype=np.float32)
+        predict_ms = _median_ms(lambda b: predict_batched(baseline, b, PREDICT_BATCH_SIZE), crops, repeats)
+        compiled_ms = _median_ms(lambda b: predict_batched(backend, b, PREDICT_BATCH_SIZE), crops, repeats)
+        rows.append({
+            "case": f"page {n}", "glyphs": n,
+            "predict_ms": predict_ms, "compiled_ms": compiled_ms,
+            "predict_glyphs_s": n / predict_ms * 1e3, "compiled_glyphs_s": n / compiled_ms * 1e3,
+        })
+    return {
+        "meta": {"buckets": list(backend.buckets), "xla": xla, "load_and_trace_s": load_s,
+                 "cpus": os.cpu_count(), "machine": platform.machine()},
+        "results": rows,
+    }
+
+
+def format_inference(report):
+    lines = [f"{'case':<14}{'predict ms':>12}{'compiled ms':>13}{'speed-up':>10}{'predict g/s':>13}{'compiled g/s':>14}"]
+    for r in report["results"]:
+        lines.append(
+            f"{r['case']:<14}{r['predict_ms']:>12.2f}{r['compiled_ms']:>13.2f}"
+            f"{r['predict_ms'] / r['compiled_ms']:>9.1f}x{r['predict_glyphs_s']:>13.0f}{r['compiled_glyphs_s']:>14.0f}"
+        )
+    return "\n".join(lines)
+
+
+def _load_model(args):
+    if args.no_inference:
+        return None
+    from .backends import load_backend
+
+    try:
+        return load_backend(args.backend, args.model)
+    except Exception as e:
+        print(f"brahmilens.bench: inference stage skipped ({e})", file=sys.stderr)
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.bench")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="run the suite")
+    run.add_argument("--out", help="write the JSON report here")
+    run.add_argument("--scales", type=float, nargs="+", default=DEFAULT_SCALES)
+    run.add_argument("--glyphs", type=int, nargs="+", default=DEFAULT_GLYPHS)
+    run.add_argument("--repeats", type=int, default=5)
+    run.add_argument("--noise", type=float, default=PageSpec.noise)
+    run.add_argument("--blur", type=float, default=PageSpec.blur)
+    run.add_argument("--glyph-height", type=int, default=PageSpec.glyph_height)
+    run.add_argument("--backend")
+    run.add_argument("--model")
+    run.add_argument("--no-inference", action="store_true")
+    run.add_argument("--compare", help="baseline JSON to check for regressions")
+    run.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown")
+
+    cmp_ = sub.add_parser("compare", help="compare two saved reports")
+    cmp_.add_argument("current")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("--threshold", type=float, default=0.10)
+
+    inf = sub.add_parser("inference", help="bucketed Keras graphs vs model.predict")
+    inf.add_argument("--model")
+    inf.add_argument("--buckets", type=int, nargs="+", default=KERAS_BUCKETS)
+    inf.add_argument("--xla", action="store_true")
+    inf.add_argument("--repeats", type=int, default=20)
+    inf.add_argument("--out", help="write the JSON report here")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "inference":
+        report = run_inference(args.model, tuple(args.buckets), args.xla, args.repeats)
+        print(format_inference(report))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        return 0
+    if args.command == "run":
+        base = PageSpec(noise=args.noise, blur=args.blur, glyph_height=args.glyph_height)
+        report = run_suite(_load_model(args), args.scales, args.glyphs, args.repeats, base)
+        print(format_results(report))
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        if not args.compare:
+            return 0
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    else:
+        with open(args.current, encoding="utf-8") as f:
+            report = json.load(f)
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    regressions = compare(report, baseline, args.threshold)
+    for r in regressions:
+        print(f"REGRESSION {r['case']} {r['stage']}: {r['baseline_ms']:.2f} -> {r['current_ms']:.2f} ms "
+              f"(+{r['change']:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import dataclasses
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .config import (
+    CACHE_DISK_BYTES, CACHE_MEMORY_BYTES, CROP_CACHE_LEVELS, CROP_CACHE_SIZE, CROP_CACHE_THRESHOLD,
+)
+from .recognition import signatures
+
+
+def file_sha256(path, chunk_size=2**20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def result_key(image, model_hash, params, *extra):
+    """Content address of an OCR result: decoded pixels + model weights + segmentation params.
+
+    ``extra`` holds any other settings that change the result (e.g. the noise filter).
+    """
+    image = np.ascontiguousarray(image)
+    digest = hashlib.sha256()
+    digest.update(f"{image.shape}|{image.dtype}|".encode())
+    digest.update(memoryview(image).cast("B"))
+    digest.update(model_hash.encode())
+    digest.update(repr(dataclasses.astuple(params)).encode())
+    for item in extra:
+        if item is not None:
+            digest.update(repr(item).encode())
+    return digest.hexdigest()
+
+
+def _pack(boxes, labels, probabilities, topk_ids=None, topk_probs=None, embeddings=None):
+    arrays = {
+        "boxes": np.asarray(boxes, dtype="int32").reshape(-1, 4),
+        "labels": np.asarray(labels, dtype="U"),
+        "probabilities": np.asarray(probabilities, dtype="float32"),
+    }
+    if topk_ids is not None:
+        arrays["topk_ids"] = np.asarray(topk_ids, dtype="int16")
+        arrays["topk_probs"] = np.asarray(topk_probs, dtype="float32")
+    if embeddings is not None:
+        arrays["embeddings"] = np.asarray(embeddings, dtype="float16")
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    return buf.getvalue()
+
+
+def _unpack(blob):
+    with np.load(io.BytesIO(blob), allow_pickle=False) as data:
+        topk = (data["topk_ids"], data["topk_probs"]) if "topk_ids" in data else None
+        return (
+            [tuple(b) for b in data["boxes"].tolist()],
+            data["labels"].tolist(),
+            data["probabilities"].tolist(),
+            topk,
+            data["embeddings"].astype("float32") if "embeddings" in data else None,
+        )
+
+
+def _copy(value):
+    """A copy of a cached value that callers may mutate without touching the cache."""
+    boxes, labels, probabilities, topk, embeddings = value
+    return (
+        list(boxes),
+        list(labels),
+        list(probabilities),
+        None if topk is None else tuple(np.array(a) for a in topk),
+        None if embeddings is None else np.array(embeddings),
+    )
+
+
+class ResultCache:
+    """Two-tier OCR result cache: an in-process LRU in front of a shared SQLite file.
+
+    SQLite serialises writers across processes, so several Streamlit replicas or
+    batch workers can point at the same file. Both tiers evict least recently
+    used entries once their byte budget is exceeded. The disk tier's size is a
+    running total of this process's writes; it is re-read from the file only
+    when it crosses the budget, which also picks up other processes' writes.
+    """
+
+    def __init__(self, path=None, memory_bytes=CACHE_MEMORY_BYTES, disk_bytes=CACHE_DISK_BYTES):
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._db = None
+        self._disk_size = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._disk_size = self._stored_size()
+
+    # ---------------- memory tier ----------------
+    def _remember(self, key, value, size):
+        if key in self._memory:
+            self._memory_size -= self._memory.pop(key)[1]
+        self._memory[key] = (value, size)
+        self._memory_size += size
+        while self._memory_size > self.memory_bytes and len(self._memory) > 1:
+            _, (_, evicted) = self._memory.popitem(last=False)
+            self._memory_size -= evicted
+            self.stats["evictions"] += 1
+
+    # ---------------- disk tier ----------------
+    def _stored_size(self):
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def _evict_disk(self):
+        if self._disk_size <= self.disk_bytes:
+            return
+        total = self._disk_size = self._stored_size()
+        if total <= self.disk_bytes:
+            return
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY accessed"):
+            if total <= self.disk_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self._disk_size = total
+        self.stats["evictions"] += len(doomed)
+
+    # ---------------- public API ----------------
+    def get(self, key):
+        """Return ``(boxes, labels, probabilities, topk, embeddings)`` for ``key`` or None.
+
+        ``topk`` and ``embeddings`` are None when the entry was stored without them.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return _copy(entry[0])
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+                    value = _unpack(row[0])
+                    self._remember(key, value, len(row[0]))
+                    self.stats["disk_hits"] += 1
+                    return _copy(value)
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, boxes, labels, probabilities, topk_ids=None, topk_probs=None, embeddings=None):
+        blob = _pack(boxes, labels, probabilities, topk_ids, topk_probs, embeddings)
+        topk = None if topk_ids is None else (topk_ids, topk_probs)
+        value = _copy(([tuple(b) for b in boxes], labels, probabilities, topk, embeddings))
+        with self._lock:
+            self._remember(key, value, len(blob))
+            if self._db is not None:
+                replaced = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+                self._disk_size += len(blob) - (replaced[0] if replaced else 0)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time()),
+                )
+                self._evict_disk()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+class CropCache:
+    """LRU of class probabilities for repeated glyph crops, checked before inference.
+
+    Inscriptions repeat the same aksharas constantly. By default a crop is
+    keyed by a hash of its normalised 64x64 pixels, so only identical crops
+    share probabilities and the output is unchanged. With ``threshold > 0``
+    matching is approximate: the key is an 8x8 downsample of the crop's 16x16
+    thumbnail quantised to ``levels`` grey levels, and a crop reuses a bucket
+    entry whose thumbnail is within ``threshold`` (mean absolute difference).
+    Repeats within one batch are classified once. Beyond ``capacity`` entries,
+    least recently used buckets are evicted.
+    """
+
+    def __init__(self, capacity=CROP_CACHE_SIZE, threshold=CROP_CACHE_THRESHOLD, levels=CROP_CACHE_LEVELS):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.levels = levels
+        self._buckets = OrderedDict()   # key -> [(thumbnail or None, probabilities), ...]
+        self._size = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def __len__(self):
+        return self._size
+
+    def keys(self, crops, thumbnails=None):
+        if thumbnails is None:
+            crops = np.ascontiguousarray(crops, dtype=np.float32)
+            return [hashlib.blake2b(memoryview(c).cast("B"), digest_size=16).digest() for c in crops]
+        n = len(thumbnails)
+        coarse = thumbnails.reshape(n, 8, 2, 8, 2).mean(axis=(2, 4))
+        quantised = np.rint(coarse * (self.levels - 1)).astype(np.uint8)
+        return [q.tobytes() for q in quantised]
+
+    def _find(self, entries, thumbnail):
+        # Exact keys hold one entry, which matches by construction.
+        for stored, value in entries:
+            if thumbnail is None or np.abs(stored - thumbnail).mean() <= self.threshold:
+                return value
+        return None
+
+    def predict(self, crops, infer):
+        """``(probabilities, hits)`` for a crop batch; only unmatched crops go to ``infer``."""
+        thumbnails = signatures(crops) if self.threshold else [None] * len(crops)
+        keys = self.keys(crops, thumbnails if self.threshold else None)
+        probs = [None] * len(crops)
+        alias = {}                      # crop -> earlier crop of this batch it repeats
+        pending = {}                    # key -> [(thumbnail, crop index)] awaiting inference
+        with self._lock:
+            for i, key in enumerate(keys):
+                entries = self._buckets.get(key)
+                if entries is not None:
+                    probs[i] = self._find(entries, thumbnails[i])
+                    if probs[i] is not None:
+                        self._buckets.move_to_end(key)
+                        continue
+                waiting = pending.setdefault(key, [])
+                j = self._find(waiting, thumbnails[i])
+                if j is None:
+                    waiting.append((thumbnails[i], i))
+                else:
+                    alias[i] = j
+            misses = sorted(i for waiting in pending.values() for _, i in waiting)
+            hits = len(crops) - len(misses)
+            self.stats["hits"] += hits
+            self.stats["misses"] += len(misses)
+
+        if misses:
+            computed = infer(crops[misses])
+            for i, row in zip(misses, computed):
+                probs[i] = row
+            for i, j in alias.items():
+                probs[i] = probs[j]
+            with self._lock:
+                for i in misses:
+                    self._add(keys[i], thumbnails[i], probs[i])
+        return np.stack(probs), hits
+
+    def _add(self, key, thumbnail, probs):
+        entries = self._buckets.get(key)
+        if entries is None:
+            entries = self._buckets[key] = []
+        else:
+            self._buckets.move_to_end(key)
+            # Another thread may have classified the same glyph concurrently.
+            if self._find(entries, thumbnail) is not None:
+                return
+        entries.append((thumbnail, probs.copy()))
+        self._size += 1
+        while self._size > self.capacity:
+            _, evicted = self._buckets.popitem(last=False)
+            self._size -= len(evicted)
+            self.stats["evictions"] += len(evicted)
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._size = 0
@@ -0,0 +1,103 @@
+import argparse
+import json
+import os
+import sys
+
+from .backends import BACKENDS
+from .config import BACKEND, CACHE_PATH, IMAGE_EXTENSIONS, LABEL_PATH, PREDICT_BATCH_SIZE, TILE_SIZE
+
+
+def iter_images(paths, recursive=False):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        if recursive:
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield os.path.join(path, name)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="brahmilens", description="OCR Brahmi inscription images.")
+    parser.add_argument("paths", nargs="+", help="image files or directories")
+    parser.add_argument("-r", "--recursive", action="store_true", help="descend into subdirectories")
+    parser.add_argument("--json", action="store_true", help="emit one JSON object per image")
+    parser.add_argument("-o", "--output", help="write results to this file instead of stdout")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=BACKEND)
+    parser.add_argument("--model", help="model file for the chosen backend")
+    parser.add_argument("--labels", default=LABEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=PREDICT_BATCH_SIZE)
+    parser.add_argument("--segmenter", choices=["contours", "components"], default="contours",
+                        help="'components' merges detached matras and anusvara into their glyph")
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="0 disables tiled segmentation")
+    parser.add_argument("--noise-filter", nargs="?", const="default",
+                        help="drop cracks, lichen and grain before recognition (optional fitted rule set; "
+                             "the built-in one is fitted on synthetic pages)")
+    parser.add_argument("--lexicon", help="word list for beam decoding (one or more words per line)")
+    parser.add_argument("--ngram", help="running text to train a character n-gram for beam decoding")
+    parser.add_argument("--script", choices=["devanagari", "brahmi", "iast", "iso15919"], default="devanagari",
+                        help="write the text in this script")
+    parser.add_argument("--cache", nargs="?", const=CACHE_PATH, help="reuse results from this SQLite cache")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from .cache import ResultCache
+    from .engine import OCREngine
+    from .segmentation import SegmentationParams
+
+    cache = ResultCache(args.cache) if args.cache else None
+    decoder = None
+    if args.lexicon or args.ngram:
+        from .decoding import load_decoder
+        from .resources import load_labels
+
+        decoder = load_decoder(load_labels(args.labels), args.lexicon, args.ngram)
+    noise_filter = None
+    if args.noise_filter:
+        from .noise import DEFAULT_NOISE_FILTER, NoiseFilter
+
+        noise_filter = (DEFAULT_NOISE_FILTER if args.noise_filter == "default"
+                        else NoiseFilter.load(args.noise_filter))
+    engine = OCREngine(
+        args.model, args.labels, batch_size=args.batch_size, backend=args.backend,
+        segmentation=SegmentationParams(method=args.segmenter),
+        cache=cache, tile_size=args.tile_size, decoder=decoder,
+        noise_filter=noise_filter,
+    )
+    script = None
+    if args.script != "devanagari":
+        from .transliterate import transliterator
+
+        script = transliterator(args.script)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    status = 0
+    try:
+        for path in iter_images(args.paths, args.recursive):
+            try:
+                result = engine.read(path)
+            except (OSError, ValueError) as e:
+                print(f"brahmilens: {path}: {e}", file=sys.stderr)
+                status = 1
+                continue
+            if args.json:
+                record = {"path": path, **result.to_dict()}
+                if script is not None:
+                    record[args.script] = script(result.sentence)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            else:
+                sentence = result.sentence if script is None else script(result.sentence)
+                out.write(f"{path}\t{sentence}\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return status
@@ -0,0 +1,76 @@
+"""Connected-components segmentation that keeps matras and anusvara with their glyph.
+
+``findContours`` plus the size filter either drops detached vowel signs and
+dots or sends them to the classifier as glyphs of their own. Here every
+component comes out of one ``connectedComponentsWithStats`` pass; components
+passing the size filter are hosts, smaller ones are fragments, and each
+fragment is joined to the nearest host within reach (looked up through a grid
+index) with a union-find. The classifier then sees one crop per composite
+glyph.
+"""
+import cv2
+import numpy as np
+
+from .layout import GridIndex
+from .metrics import METRICS
+from .segmentation import DEFAULT_SEGMENTATION, binarize
+from .unionfind import union_find
+
+
+def _rect_distance(px, py, boxes):
+    # Distance from point (px, py) to each (x, y, w, h) box; 0 inside.
+    dx = np.maximum(np.maximum(boxes[:, 0] - px, 0), px - (boxes[:, 0] + boxes[:, 2]))
+    dy = np.maximum(np.maximum(boxes[:, 1] - py, 0), py - (boxes[:, 1] + boxes[:, 3]))
+    return np.hypot(dx, dy)
+
+
+def merge_fragments(stats, centroids, params=DEFAULT_SEGMENTATION):
+    """Return composite ``(x, y, w, h)`` boxes from component stats (label 0 excluded)."""
+    boxes = stats[:, :4].astype(np.int64)
+    area = stats[:, cv2.CC_STAT_AREA]
+    host = (boxes[:, 3] > params.min_height) & (boxes[:, 2] > params.min_width)
+    fragment = ~host & (area >= params.min_fragment_area)
+    hosts = np.flatnonzero(host)
+    if not len(hosts):
+        return []
+
+    radius = max(1, int(params.attach_radius * np.median(boxes[hosts, 3])))
+    index = GridIndex(boxes[hosts])
+    a, b = [], []
+    for f in np.flatnonzero(fragment):
+        x, y, w, h = boxes[f].tolist()
+        near = index.query(x - radius, y - radius, x + w + radius, y + h + radius)
+        if not near:
+            continue
+        cand = hosts[near]
+        dist = _rect_distance(centroids[f, 0], centroids[f, 1], boxes[cand])
+        best = int(np.argmin(dist))
+        if dist[best] <= radius:
+            a.append(f)
+            b.append(cand[best])
+
+    root = union_find(len(boxes), a, b)
+    members = np.flatnonzero(host | np.isin(np.arange(len(boxes)), a))
+    groups = root[members]
+
+    x0 = np.full(len(boxes), np.iinfo(np.int64).max)
+    y0 = np.full(len(boxes), np.iinfo(np.int64).max)
+    x1 = np.zeros(len(boxes), dtype=np.int64)
+    y1 = np.zeros(len(boxes), dtype=np.int64)
+    np.minimum.at(x0, groups, boxes[members, 0])
+    np.minimum.at(y0, groups, boxes[members, 1])
+    np.maximum.at(x1, groups, boxes[members, 0] + boxes[members, 2])
+    np.maximum.at(y1, groups, boxes[members, 1] + boxes[members, 3])
+
+    roots = np.unique(groups)
+    out = np.stack([x0[roots], y0[roots], x1[roots] - x0[roots], y1[roots] - y0[roots]], axis=1)
+    out = out[np.argsort(out[:, 0], kind="stable")]
+    return [tuple(map(int, box)) for box in out]
+
+
+def segment_components(image, params=DEFAULT_SEGMENTATION):
+    """Drop-in alternative to ``segment_characters`` with fragment merging."""
+    thresh = binarize(image, params)
+    with METRICS.stage("components"):
+        _, _, stats, centroids = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+        return merge_fragments(stats[1:], centroids[1:], params), thresh
@@ -0,0 +1,72 @@
+import os
+
+# --------------------------------------------------
+# PATHS
+# --------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODEL_PATH = os.path.join(BASE_DIR, "brahmi_char_369_v1.h5")
+LABEL_PATH = os.path.join(BASE_DIR, "index_to_label_v1.json")
+ONNX_MODEL_PATH = os.path.join(BASE_DIR, "brahmi_char_369_v1.onnx")
+TFLITE_MODEL_PATH = os.path.join(BASE_DIR, "brahmi_char_369_v1.tflite")
+NPZ_MODEL_PATH = os.path.join(BASE_DIR, "brahmi_char_369_v1.npz")
+# Written by `python -m brahmilens.evaluate`, rendered on the Model Architecture page.
+EVAL_REPORT_PATH = os.path.join(BASE_DIR, "assets", "eval_report.json")
+# Optional model registry directory (see brahmilens.registry); when set, the
+# app serves its CURRENT version and follows activations without a restart.
+MODEL_REGISTRY = os.environ.get("BRAHMILENS_REGISTRY")
+
+# --------------------------------------------------
+# INFERENCE BACKEND ("keras", "onnx", "tflite" or "numpy")
+# --------------------------------------------------
+BACKEND = os.environ.get("BRAHMILENS_BACKEND", "keras")
+INFERENCE_THREADS = int(os.environ.get("BRAHMILENS_THREADS", "0")) or None
+# Compute precision of the numpy backend ("float32" or "float16").
+NUMPY_DTYPE = os.environ.get("BRAHMILENS_NUMPY_DTYPE", "float32")
+# Keras runs pre-traced fixed-shape graphs, one per batch-size bucket; batches
+# are zero-padded up to the next bucket. BRAHMILENS_BUCKETS="" falls back to
+# model.predict; BRAHMILENS_XLA=1 compiles the buckets with XLA.
+KERAS_BUCKETS = tuple(int(n) for n in os.environ.get("BRAHMILENS_BUCKETS", "1,8,32,128,512").split(",") if n)
+KERAS_XLA = os.environ.get("BRAHMILENS_XLA") == "1"
+
+# --------------------------------------------------
+# PIPELINE DEFAULTS
+# --------------------------------------------------
+IMG_SIZE = 64
+PREDICT_BATCH_SIZE = 128
+WORD_GAP = 25
+TOP_K = 5
+# Width of the dense bottleneck, exposed as the glyph embedding.
+EMBED_DIM = 64
+
+# Photos of at least REDUCED_DECODE_MIN_PIXELS are decoded at 1/2, 1/4 or 1/8
+# size when their glyphs stay at least TARGET_GLYPH_HEIGHT pixels tall;
+# segmentation parameters are scaled with the decode, so boxes match a
+# full-size decode. BRAHMILENS_REDUCED_DECODE=0 always decodes at full size.
+TARGET_GLYPH_HEIGHT = 40
+REDUCED_DECODE_MIN_PIXELS = 4_000_000
+DECODE_GLYPH_HEIGHT = None if os.environ.get("BRAHMILENS_REDUCED_DECODE") == "0" else TARGET_GLYPH_HEIGHT
+
+# Pages at least this large are segmented tile by tile on a thread pool.
+TILE_SIZE = 2048
+TILED_MIN_PIXELS = 48_000_000
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".npy")
+
+# --------------------------------------------------
+# RESULT CACHE
+# --------------------------------------------------
+CACHE_PATH = os.environ.get(
+    "BRAHMILENS_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "brahmilens", "results.sqlite"),
+)
+CACHE_MEMORY_BYTES = 64 * 2**20
+CACHE_DISK_BYTES = 1024 * 2**20
+
+# Repeated glyphs reuse the probabilities of an identical earlier crop (see
+# cache.CropCache); 0 entries disables the crop cache. A threshold above 0
+# opts into near-duplicate matching: crops whose 16x16 thumbnails differ by at
+# most that mean absolute difference share probabilities, which can change output.
+CROP_CACHE_SIZE = int(os.environ.get("BRAHMILENS_CROP_CACHE", "8192"))
+CROP_CACHE_THRESHOLD = float(os.environ.get("BRAHMILENS_CROP_CACHE_THRESHOLD", "0"))
+CROP_CACHE_LEVELS = 4
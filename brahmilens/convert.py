@@ -0,0 +1,241 @@
+"""Export the Keras model to ONNX / TFLite / NumPy and compare backends.
+
+    python -m brahmilens.convert export --onnx --tflite --int8 --calibration samples/
+    python -m brahmilens.convert export --npz --float16
+    python -m brahmilens.convert compare --holdout heldout/ --backends keras onnx tflite
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+
+from .backends import BACKENDS, embedding_model, load_backend, unavailable_reason
+from .config import IMAGE_EXTENSIONS, IMG_SIZE, MODEL_PATH, NPZ_MODEL_PATH, ONNX_MODEL_PATH, TFLITE_MODEL_PATH
+from .ingest import load_image
+from .metrics import rss_bytes
+from .recognition import prepare_crops
+from .segmentation import segment_characters
+
+
+# --------------------------------------------------
+# SAMPLE CROPS
+# --------------------------------------------------
+def load_crops(source, limit=None):
+    """Load glyph crops from a saved .npy batch or by segmenting a directory of pages."""
+    if source.endswith(".npy"):
+        crops = np.load(source).astype("float32")
+        return crops[:limit]
+
+    batches = []
+    total = 0
+    for name in sorted(os.listdir(source)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        boxes, thresh = segment_characters(load_image(os.path.join(source, name)))
+        batches.append(prepare_crops(boxes, thresh))
+        total += len(boxes)
+        if limit and total >= limit:
+            break
+    if not batches:
+        raise ValueError(f"no glyph crops found in {source}")
+    return np.concatenate(batches)[:limit]
+
+
+# --------------------------------------------------
+# EXPORT
+# --------------------------------------------------
+def export_onnx(keras_model, path=ONNX_MODEL_PATH, calibration=None):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None,) + tuple(keras_model.input_shape[1:]), tf.float32, name="input"),)
+    if calibration is None:
+        tf2onnx.convert.from_keras(keras_model, input_signature=spec, output_path=path)
+        return path
+
+    from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_static
+
+    class CropReader(CalibrationDataReader):
+        def __init__(self, crops):
+            self.batches = iter(crops[i:i + 1] for i in range(len(crops)))
+
+        def get_next(self):
+            batch = next(self.batches, None)
+            return None if batch is None else {"input": batch}
+
+    float_path = path + ".fp32"
+    tf2onnx.convert.from_keras(keras_model, input_signature=spec, output_path=float_path)
+    quantize_static(
+        float_path, path, CropReader(calibration),
+        activation_type=QuantType.QInt8, weight_type=QuantType.QInt8,
+    )
+    os.remove(float_path)
+    return path
+
+
+def export_tflite(keras_model, path=TFLITE_MODEL_PATH, calibration=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(keras_model)
+    if calibration is not None:
+        # Full-integer kernels with float32 input/output, so callers feed the
+        # same normalised crops to every backend.
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([calibration[i:i + 1]] for i in range(len(calibration)))
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+    return path
+
+
+# --------------------------------------------------
+# COMPARISON REPORT
+# --------------------------------------------------
+def _benchmark(name, model_path, crops, batch_size, repeats):
+    # Runs in a fresh process so RSS and import time belong to one runtime only.
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    backend = load_backend(name, model_path)
+    backend.predict(crops[:1])
+    load_s = time.perf_counter() - start
+    rss_after = rss_bytes()
+
+    single = []
+    for i in range(min(len(crops), repeats)):
+        t = time.perf_counter()
+        backend.predict(crops[i:i + 1])
+        single.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    probs = np.concatenate([backend.predict(crops[s:s + batch_size]) for s in range(0, len(crops), batch_size)])
+    batch_s = time.perf_counter() - t
+
+    return {
+        "backend": name,
+        "model_path": model_path or BACKENDS[name].default_path,
+        "load_s": load_s,
+        "rss_mb": (rss_after - rss_before) / 2**20,
+        "per_glyph_ms_p50": float(np.median(single) * 1e3),
+        "per_glyph_ms_p95": float(np.percentile(single, 95) * 1e3),
+        "batch_size": batch_size,
+        "batch_glyphs_per_s": len(crops) / batch_s,
+        "probs": probs,
+    }
+
+
+def compare_backends(crops, backends, model_paths=None, reference="keras", batch_size=128, repeats=200):
+    """Benchmark each backend in its own process and report top-1 agreement with ``reference``."""
+    model_paths = model_paths or {}
+    ctx = multiprocessing.get_context("spawn")
+    rows = []
+    for name in backends:
+        with ctx.Pool(1) as pool:
+            rows.append(pool.apply(_benchmark, (name, model_paths.get(name), crops, batch_size, repeats)))
+
+    ref = next((r["probs"] for r in rows if r["backend"] == reference), None)
+    for row in rows:
+        probs = row.pop("probs")
+        row["top1_agreement"] = None if ref is None else float((probs.argmax(axis=1) == ref.argmax(axis=1)).mean())
+        row["max_prob_diff"] = None if ref is None else float(np.abs(probs - ref).max())
+    return {"glyphs": len(crops), "reference": reference, "results": rows}
+
+
+def format_report(report):
+    lines = [
+        f"{report['glyphs']} held-out glyphs, agreement vs {report['reference']}",
+        f"{'backend':<8} {'load s':>7} {'RSS MB':>8} {'p50 ms':>8} {'p95 ms':>8} {'glyph/s':>9} {'top-1':>7}"
+        f" {'max |dp|':>9}",
+    ]
+    for r in report["results"]:
+        agreement = "-" if r["top1_agreement"] is None else f"{r['top1_agreement']:.2%}"
+        diff = "-" if r["max_prob_diff"] is None else f"{r['max_prob_diff']:.1e}"
+        lines.append(
+            f"{r['backend']:<8} {r['load_s']:>7.2f} {r['rss_mb']:>8.1f} {r['per_glyph_ms_p50']:>8.2f} "
+            f"{r['per_glyph_ms_p95']:>8.2f} {r['batch_glyphs_per_s']:>9.0f} {agreement:>7} {diff:>9}"
+        )
+    return "\n".join(lines)
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.convert")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export = sub.add_parser("export", help="convert the Keras model")
+    export.add_argument("--model", default=MODEL_PATH)
+    export.add_argument("--onnx", nargs="?", const=ONNX_MODEL_PATH)
+    export.add_argument("--tflite", nargs="?", const=TFLITE_MODEL_PATH)
+    export.add_argument("--npz", nargs="?", const=NPZ_MODEL_PATH, help="weights for the TensorFlow-free numpy backend")
+    export.add_argument("--float16", action="store_true", help="store the --npz weights as float16")
+    export.add_argument("--int8", action="store_true", help="post-training int8 quantisation")
+    export.add_argument("--calibration", help="directory of sample pages or a .npy crop batch")
+    export.add_argument("--calibration-size", type=int, default=500)
+
+    compare = sub.add_parser("compare", help="latency / memory / agreement report")
+    compare.add_argument("--holdout", required=True, help="directory of held-out pages or a .npy crop batch")
+    compare.add_argument("--backends", nargs="+", choices=sorted(BACKENDS),
+                         help="default: every backend whose model file and runtime are present")
+    compare.add_argument("--onnx-model")
+    compare.add_argument("--tflite-model")
+    compare.add_argument("--npz-model")
+    compare.add_argument("--batch-size", type=int, default=128)
+    compare.add_argument("--report", help="write the JSON report here")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        if args.int8 and not args.calibration:
+            parser.error("--int8 needs --calibration")
+        from tensorflow.keras.models import load_model
+
+        model = load_model(args.model)
+        if args.npz:
+            # Exported from the plain classifier: NumpyCNN finds the bottleneck itself.
+            from .npcnn import NumpyCNN, compare_keras, export_npz
+
+            print(export_npz(model, args.npz, "float16" if args.float16 else "float32"))
+            check = (load_crops(args.calibration, args.calibration_size) if args.calibration
+                     else np.random.default_rng(0).random((256, IMG_SIZE, IMG_SIZE, 1), dtype=np.float32))
+            print(json.dumps(compare_keras(model, NumpyCNN(args.npz), check)))
+        try:
+            # Export the bottleneck as a second output so every backend can embed glyphs.
+            model = embedding_model(model)
+        except ValueError as e:
+            print(f"brahmilens.convert: exporting without embeddings ({e})", file=sys.stderr)
+        calibration = load_crops(args.calibration, args.calibration_size) if args.int8 else None
+        if args.onnx:
+            print(export_onnx(model, args.onnx, calibration))
+        if args.tflite:
+            print(export_tflite(model, args.tflite, calibration))
+        return 0
+
+    paths = {"onnx": args.onnx_model, "tflite": args.tflite_model, "numpy": args.npz_model}
+    backends = args.backends
+    if backends is None:
+        backends = []
+        for name in sorted(BACKENDS):
+            reason = unavailable_reason(name, paths.get(name))
+            if reason is None:
+                backends.append(name)
+            else:
+                print(f"brahmilens.convert: skipping {name}: {reason}", file=sys.stderr)
+        if not backends:
+            parser.error("no backend has both its model file and runtime available")
+    crops = load_crops(args.holdout)
+    reference = "keras" if "keras" in backends else backends[0]
+    report = compare_backends(crops, backends, paths, reference=reference, batch_size=args.batch_size)
+    print(format_report(report))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Top-k glyph candidates and lexicon / n-gram aware beam decoding.
+
+The recogniser keeps the ``k`` best labels per glyph as compact ``(N, k)``
+arrays. ``BeamDecoder`` searches over them one line at a time. Every step
+scores all ``beam x k`` extensions at once with NumPy: visual log-probability,
+a character n-gram term, and a lexicon term. The lexicon term follows a trie
+stored as sorted transition keys, so a whole step's child lookups are one
+``searchsorted``.
+"""
+import numpy as np
+
+
+def top_k(probs, k):
+    """Return ``(ids, probs)`` of the ``k`` most likely labels per row, best first."""
+    k = min(k, probs.shape[1])
+    ids = np.argpartition(-probs, k - 1, axis=1)[:, :k]
+    p = np.take_along_axis(probs, ids, axis=1)
+    order = np.argsort(-p, axis=1, kind="stable")
+    ids = np.take_along_axis(ids, order, axis=1)
+    return ids.astype(np.int16), np.take_along_axis(p, order, axis=1).astype(np.float32)
+
+
+def tokenize(text, label_to_index, max_len=None):
+    """Split ``text`` into label ids by greedy longest match; ``None`` marks a space.
+
+    Characters that no label covers are dropped.
+    """
+    max_len = max_len or max(map(len, label_to_index))
+    out, i = [], 0
+    while i < len(text):
+        if text[i].isspace():
+            if out and out[-1] is not None:
+                out.append(None)
+            i += 1
+            continue
+        for n in range(min(max_len, len(text) - i), 0, -1):
+            label_id = label_to_index.get(text[i:i + n])
+            if label_id is not None:
+                out.append(label_id)
+                i += n
+                break
+        else:
+            i += 1
+    return out
+
+
+def _words(tokens):
+    word = []
+    for t in tokens:
+        if t is None:
+            if word:
+                yield word
+            word = []
+        else:
+            word.append(t)
+    if word:
+        yield word
+
+
+class Lexicon:
+    """Trie over label-id sequences with vectorised child lookup."""
+
+    def __init__(self, words, num_labels):
+        self.num_labels = num_labels
+        children = [{}]
+        terminal = [False]
+        for word in words:
+            node = 0
+            for label_id in word:
+                nxt = children[node].get(label_id)
+                if nxt is None:
+                    nxt = len(children)
+                    children[node][label_id] = nxt
+                    children.append({})
+                    terminal.append(False)
+                node = nxt
+            terminal[node] = True
+
+        keys, targets = [], []
+        for node, edges in enumerate(children):
+            for label_id, child in edges.items():
+                keys.append(node * num_labels + label_id)
+                targets.append(child)
+        order = np.argsort(keys)
+        self.keys = np.asarray(keys, dtype=np.int64)[order]
+        self.targets = np.asarray(targets, dtype=np.int64)[order]
+        self.terminal = np.asarray(terminal, dtype=bool)
+
+    @classmethod
+    def from_file(cls, path, label_to_index):
+        with open(path, encoding="utf-8") as f:
+            words = [w for line in f for w in _words(tokenize(line, label_to_index))]
+        return cls(words, len(label_to_index))
+
+    def __len__(self):
+        return int(self.terminal.sum())
+
+    def step(self, nodes, label_ids):
+        """Children of ``nodes`` along ``label_ids`` (broadcast); -1 where the trie has no edge."""
+        q = nodes.astype(np.int64) * self.num_labels + label_ids
+        if not len(self.keys):
+            return np.full(q.shape, -1, dtype=np.int64)
+        idx = np.minimum(np.searchsorted(self.keys, q), len(self.keys) - 1)
+        found = (self.keys[idx] == q) & (nodes >= 0)
+        return np.where(found, self.targets[idx], -1)
+
+
+class CharNGram:
+    """Add-k smoothed label n-gram model stored as one dense log-probability table.
+
+    Index ``num_labels`` stands for a word boundary, so contexts stay valid at
+    the start of a word.
+    """
+
+    def __init__(self, sequences, num_labels, order=2, smoothing=0.1):
+        self.order = order
+        self.num_labels = num_labels
+        bos = num_labels
+        shape = (num_labels + 1,) * (order - 1) + (num_labels,)
+        counts = np.full(shape, smoothing, dtype=np.float64)
+        for seq in sequences:
+            ctx = [bos] * (order - 1)
+            for label_id in seq:
+                if label_id is None:
+                    ctx = [bos] * (order - 1)
+                    continue
+                counts[tuple(ctx) + (label_id,)] += 1
+                ctx = ctx[1:] + [label_id]
+        self.logp = np.log(counts / counts.sum(axis=-1, keepdims=True)).astype(np.float32)
+
+    @classmethod
+    def from_file(cls, path, label_to_index, order=2):
+        with open(path, encoding="utf-8") as f:
+            seqs = [tokenize(line, label_to_index) for line in f]
+        return cls(seqs, len(label_to_index), order)
+
+    def score(self, contexts, label_ids):
+        """``contexts`` is ``(B, order - 1)``; returns ``(B, k)`` log-probabilities."""
+        idx = tuple(contexts[:, i][:, None] for i in range(self.order - 1)) + (label_ids,)
+        return self.logp[idx]
+
+
+class BeamDecoder:
+    def __init__(self, lexicon=None, ngram=None, beam_width=8, lm_weight=0.5,
+                 oov_penalty=-4.0, word_bonus=1.0):
+        self.lexicon = lexicon
+        self.ngram = ngram
+        self.beam_width = beam_width
+        self.lm_weight = lm_weight
+        self.oov_penalty = oov_penalty
+        self.word_bonus = word_bonus
+
+    def _close_words(self, score, node):
+        # Word boundary: reward beams that end on a lexicon word, then restart at the root.
+        if self.lexicon is not None:
+            score = score + np.where(node >= 0, np.where(self.lexicon.terminal[np.maximum(node, 0)],
+                                                         self.word_bonus, self.oov_penalty), 0.0)
+        return score, np.zeros_like(node)
+
+    def decode(self, ids, probs, breaks=None):
+        """Best label id per glyph for one line.
+
+        ``ids`` / ``probs`` are the ``(N, k)`` top-k arrays; ``breaks[t]`` is True
+        when a word gap follows glyph ``t``.
+        """
+        n = len(ids)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        breaks = np.zeros(n, dtype=bool) if breaks is None else np.asarray(breaks, dtype=bool)
+        logp = np.log(np.maximum(probs, 1e-12)).astype(np.float64)
+        order = self.ngram.order - 1 if self.ngram is not None else 0
+        boundary = self.ngram.num_labels if self.ngram is not None else 0
+
+        score = np.zeros(1)
+        node = np.zeros(1, dtype=np.int64)
+        ctx = np.full((1, order), boundary, dtype=np.int64)
+        parents, choices = [], []
+
+        for t in range(n):
+            cand = ids[t].astype(np.int64)
+            total = score[:, None] + logp[t][None, :]
+            if self.ngram is not None:
+                total = total + self.lm_weight * self.ngram.score(ctx, cand[None, :])
+            if self.lexicon is not None:
+                child = self.lexicon.step(node[:, None], cand[None, :])
+                fell_off = (node[:, None] >= 0) & (child < 0)
+                total = total + np.where(fell_off, self.oov_penalty, 0.0)
+            else:
+                child = np.zeros(total.shape, dtype=np.int64)
+
+            flat = total.ravel()
+            keep = min(self.beam_width, len(flat))
+            best = np.argpartition(-flat, keep - 1)[:keep]
+            beam, col = np.divmod(best, len(cand))
+            score, node = flat[best], child[beam, col]
+            if order:
+                ctx = np.concatenate([ctx[beam, 1:], cand[col][:, None]], axis=1)
+            parents.append(beam)
+            choices.append(cand[col])
+
+            if breaks[t] or t == n - 1:
+                score, node = self._close_words(score, node)
+                if order:
+                    ctx = np.full_like(ctx, boundary)
+
+        out = np.empty(n, dtype=np.int64)
+        b = int(np.argmax(score))
+        for t in range(n - 1, -1, -1):
+            out[t] = choices[t][b]
+            b = parents[t][b]
+        return out
+
+
+def load_decoder(index_to_label, lexicon_path=None, ngram_path=None, ngram_order=2, **kwargs):
+    """Build a ``BeamDecoder`` from a word list and/or a running-text corpus."""
+    label_to_index = {label: i for i, label in index_to_label.items()}
+    lexicon = Lexicon.from_file(lexicon_path, label_to_index) if lexicon_path else None
+    ngram = CharNGram.from_file(ngram_path, label_to_index, ngram_order) if ngram_path else None
+    return BeamDecoder(lexicon, ngram, **kwargs)
@@ -0,0 +1,256 @@
+import os
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .cache import CropCache, file_sha256, result_key
+from .components import segment_components
+from .config import (
+    CROP_CACHE_SIZE, EMBED_DIM, IMG_SIZE, INFERENCE_THREADS, LABEL_PATH, PREDICT_BATCH_SIZE, DECODE_GLYPH_HEIGHT,
+    TILE_SIZE, TILED_MIN_PIXELS, TOP_K, WORD_GAP,
+)
+from .decoding import top_k
+from .ingest import load_gray, scale_boxes
+from .layout import reading_order
+from .metrics import METRICS
+from .noise import reject_noise
+from .recognition import assemble_lines, build_label_table, predict_batched, prepare_crops, word_breaks
+from .registry import manifest_hash
+from .resources import load_resources
+from .segmentation import DEFAULT_SEGMENTATION, scaled_params, segment_characters
+from .tiling import segment_tiled
+
+
+@dataclass
+class OCRResult:
+    boxes: list = field(default_factory=list)
+    labels: list = field(default_factory=list)
+    probabilities: list = field(default_factory=list)
+    sentence: str = ""
+    lines: list = field(default_factory=list)
+    # (N, k) label ids and probabilities of the k best candidates per glyph
+    topk_ids: np.ndarray = None
+    topk_probs: np.ndarray = None
+    # (N, 64) bottleneck activations, when the engine was asked for them
+    embeddings: np.ndarray = None
+    # registry version that produced the result, when served by a HotSwapEngine
+    model_version: str = None
+    # glyphs whose probabilities came from the engine's crop cache
+    crop_cache_hits: int = 0
+
+    @property
+    def crop_cache_hit_rate(self):
+        return self.crop_cache_hits / len(self.boxes) if self.boxes else 0.0
+
+    @property
+    def text_lines(self):
+        return self.sentence.split("\n") if self.sentence else []
+
+    def to_dict(self):
+        return {
+            "boxes": [list(map(int, b)) for b in self.boxes],
+            "labels": list(self.labels),
+            "probabilities": [float(p) for p in self.probabilities],
+            "sentence": self.sentence,
+            "lines": [list(line) for line in self.lines],
+            "topk_ids": None if self.topk_ids is None else self.topk_ids.tolist(),
+            "topk_probs": None if self.topk_probs is None else self.topk_probs.tolist(),
+            **({} if self.embeddings is None else {"embeddings": np.round(self.embeddings, 4).tolist()}),
+            **({} if self.model_version is None else {"model_version": self.model_version}),
+        }
+
+
+class OCREngine:
+    """Streamlit-free OCR core: loads the model once, then segments and reads pages."""
+
+    def __init__(self, model_path=None, label_path=LABEL_PATH,
+                 batch_size=PREDICT_BATCH_SIZE, word_gap=WORD_GAP, backend=None,
+                 segmentation=DEFAULT_SEGMENTATION, cache=None, tile_size=TILE_SIZE,
+                 top_k=TOP_K, decoder=None, noise_filter=None, glyph_height=DECODE_GLYPH_HEIGHT,
+                 embeddings=False, executor=None, threads=INFERENCE_THREADS, crop_cache=CROP_CACHE_SIZE):
+        self.model, self.index_to_label = load_resources(model_path, label_path, backend, threads=threads)
+        self.label_table = build_label_table(self.index_to_label)
+        self.batch_size = batch_size
+        self.word_gap = word_gap
+        self.segmentation = segmentation
+        self.cache = cache
+        self.tile_size = tile_size
+        self.top_k = top_k
+        self.decoder = decoder
+        self.noise_filter = noise_filter
+        # Target glyph height for reduced decodes of encoded images; None decodes at full size.
+        self.glyph_height = glyph_height
+        # Also return bottleneck embeddings from read() (for the similarity index).
+        self.embeddings = embeddings
+        # Shared InferenceExecutor; when set, all inference goes through its dispatcher thread.
+        self.executor = executor
+        # Repeated glyphs within and across pages skip inference; owned per engine,
+        # so a different model never sees another's probabilities.
+        self.crop_cache = CropCache(crop_cache) if crop_cache else None
+        self._model_hash = None
+        self.startup_report = None
+
+    @property
+    def model_hash(self):
+        # Part of every cache key, so swapping the weights file invalidates old entries.
+        if self._model_hash is None:
+            path = self.model.model_path
+            self._model_hash = manifest_hash(path) if os.path.isdir(path) else file_sha256(path)
+        return self._model_hash
+
+    def route(self, key=None):
+        """``(version, engine)`` to serve one request; see ``HotSwapEngine.route``."""
+        return None, self
+
+    def segment(self, image, scale=1.0):
+        """Boxes and binarised page of ``image``, a ``1 / scale`` decode of the original."""
+        params = scaled_params(self.segmentation, scale)
+        if params.method == "components":
+            return segment_components(np.asarray(image), params)
+        # Tiling gives identical boxes, so it is used wherever it bounds memory.
+        h, w = image.shape[:2]
+        if self.tile_size and (isinstance(image, np.memmap) or h * w >= TILED_MIN_PIXELS):
+            with METRICS.stage("tiled_segmentation"):
+                return segment_tiled(image, params, self.tile_size)
+        return segment_characters(image, params)
+
+    def warmup(self, batch_sizes=(1,)):
+        """Run dummy batches so graph tracing happens now, not on the first upload."""
+        for n in batch_sizes:
+            self.model.predict(np.zeros((n, IMG_SIZE, IMG_SIZE, 1), dtype="float32"))
+
+    def prepare(self, image, scale=1.0):
+        """Segment ``image``; return boxes in reading order and their crop batch.
+
+        Boxes are multiplied by ``scale`` to map a reduced decode back to the original.
+        """
+        boxes, thresh = self.segment(image, scale)
+        METRICS.observe("glyphs_per_page", len(boxes))
+        with METRICS.stage("layout"):
+            order, _ = reading_order(boxes)
+            boxes = [boxes[i] for i in order]
+        crops = prepare_crops(boxes, thresh)
+        if self.noise_filter is not None:
+            boxes, crops = reject_noise(boxes, crops, self.noise_filter)
+        return scale_boxes(boxes, scale), crops
+
+    def decode(self, probs):
+        """Map a (N, classes) probability array to labels and top-1 probabilities."""
+        if len(probs) == 0:
+            return [], np.empty(0, dtype="float32")
+        ids = probs.argmax(axis=1)
+        return self.label_table[ids].tolist(), probs[np.arange(len(ids)), ids]
+
+    def recognize(self, crops):
+        """Classify a (N, 64, 64, 1) crop batch; returns labels and top-1 probabilities."""
+        return self.decode(self.predict(crops))
+
+    def predict(self, crops):
+        return self.classify(crops)[0]
+
+    def classify(self, crops):
+        """``(probabilities, crop_cache_hits)`` for a crop batch."""
+        if len(crops) == 0:
+            return np.zeros((0, len(self.label_table)), dtype="float32"), 0
+        if self.crop_cache is None:
+            return self._infer(crops), 0
+        probs, hits = self.crop_cache.predict(crops, self._infer)
+        METRICS.observe("crop_cache_hits", hits)
+        return probs, hits
+
+    def _infer(self, crops):
+        if self.executor is not None:
+            # Timed here, on the request's own thread, so its trace sees the stage.
+            with METRICS.stage("inference"):
+                return self.executor.submit(self.model, crops).result()
+        return predict_batched(self.model, crops, self.batch_size)
+
+    def predict_embeddings(self, crops):
+        """``(probabilities, embeddings)`` for a crop batch."""
+        if len(crops) == 0:
+            return (np.zeros((0, len(self.label_table)), dtype="float32"),
+                    np.zeros((0, EMBED_DIM), dtype="float32"))
+        if self.executor is not None:
+            with METRICS.stage("inference"):
+                return self.executor.submit(self.model, crops, embeddings=True).result()
+        return predict_batched(self.model, crops, self.batch_size, embeddings=True)
+
+    def candidates(self, probs):
+        """Compact ``(ids, probs)`` top-k arrays for a probability batch."""
+        return top_k(probs, self.top_k)
+
+    def _choose(self, boxes, lines, topk, word_gap):
+        ids, probs = topk
+        if self.decoder is None or not len(ids):
+            return ids[:, 0], probs[:, 0]
+        chosen = np.empty(len(ids), dtype=np.int64)
+        breaks = word_breaks(boxes, word_gap)
+        for line in lines:
+            idx = np.asarray(line)
+            line_breaks = breaks[idx]
+            line_breaks[-1] = False
+            chosen[idx] = self.decoder.decode(ids[idx], probs[idx], line_breaks)
+        picked = ids == chosen[:, None]
+        return chosen, np.where(picked, probs, 0).max(axis=1)
+
+    def assemble(self, boxes, labels=None, probabilities=None, topk=None, word_gap=None, embeddings=None):
+        """Build the result; with ``topk`` the labels are chosen (and beam-decoded) here."""
+        word_gap = self.word_gap if word_gap is None else word_gap
+        # Boxes are kept in reading order, so regrouping leaves them in place.
+        with METRICS.stage("assembly"):
+            _, lines = reading_order(boxes)
+            if topk is not None:
+                chosen, chosen_probs = self._choose(boxes, lines, topk, word_gap)
+                labels = self.label_table[chosen].tolist()
+                probabilities = chosen_probs.tolist()
+            return OCRResult(
+                boxes=boxes,
+                labels=labels,
+                probabilities=list(probabilities),
+                sentence="\n".join(assemble_lines(boxes, labels, lines, word_gap)),
+                lines=lines,
+                topk_ids=None if topk is None else topk[0],
+                topk_probs=None if topk is None else topk[1],
+                embeddings=embeddings,
+            )
+
+    def load(self, source):
+        """Decode a path, bytes or file object to ``(gray, scale)`` for ``prepare``."""
+        with METRICS.stage("decode"):
+            return load_gray(source, self.glyph_height)
+
+    def lookup(self, image, scale=1.0):
+        """Return ``(cache_key, cached_result_or_None)``; the key is None without a cache."""
+        if self.cache is None:
+            return None, None
+        with METRICS.stage("cache_lookup"):
+            key = result_key(image, self.model_hash, self.segmentation, self.noise_filter,
+                             None if scale == 1.0 else scale)
+            hit = self.cache.get(key)
+        if hit is None or (self.embeddings and hit[4] is None):
+            return key, None
+        boxes, labels, probabilities, topk, embeddings = hit
+        return key, self.assemble(boxes, labels, probabilities, topk, embeddings=embeddings)
+
+    def store(self, key, result):
+        if key is not None:
+            self.cache.put(key, result.boxes, result.labels, result.probabilities,
+                           result.topk_ids, result.topk_probs, result.embeddings)
+        return result
+
+    def read(self, image):
+        scale = 1.0
+        if not isinstance(image, np.ndarray):
+            image, scale = self.load(image)
+        key, hit = self.lookup(image, scale)
+        if hit is not None:
+            return hit
+        boxes, crops = self.prepare(image, scale)
+        if self.embeddings:
+            probs, embeddings = self.predict_embeddings(crops)
+            result = self.assemble(boxes, topk=self.candidates(probs), embeddings=embeddings)
+        else:
+            probs, hits = self.classify(crops)
+            result = self.assemble(boxes, topk=self.candidates(probs))
+            result.crop_cache_hits = hits
+        return self.store(key, result)
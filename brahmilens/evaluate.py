@@ -0,0 +1,271 @@
+"""Batched evaluation of a model version on labelled glyph crops.
+
+    python -m brahmilens.evaluate heldout/ --out assets/eval_report.json
+    python -m brahmilens.evaluate crops.npz --backend numpy
+    python -m brahmilens.evaluate --synthetic 40 --model models/v2
+
+A dataset is either a directory with one sub-directory per class (named by
+its label or class index) holding crop images as the model sees them (white
+ink on black), an ``.npz`` with ``crops`` (N, 64, 64, 1) and integer
+``labels``, or ``--synthetic N`` pages rendered by ``synth`` and segmented
+like real uploads. Image crops are decoded on a thread pool, a few batches
+ahead of inference. The JSON report holds accuracy, log loss, per-class
+precision / recall / F1, the full confusion matrix and per-glyph latency;
+the Model Architecture page renders it.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from .config import EVAL_REPORT_PATH, IMAGE_EXTENSIONS, IMG_SIZE, LABEL_PATH, PREDICT_BATCH_SIZE
+
+
+# --------------------------------------------------
+# DATASETS: iterables of (crops, label_ids) batches
+# --------------------------------------------------
+def _read_crop(path):
+    gray = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        raise OSError(f"cannot read {path}")
+    if gray.shape != (IMG_SIZE, IMG_SIZE):
+        gray = cv2.resize(gray, (IMG_SIZE, IMG_SIZE), interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def directory_dataset(root, label_to_index, batch_size=PREDICT_BATCH_SIZE, workers=None, prefetch=4):
+    """Batches of a ``root/<label>/*.png`` tree, decoded ``prefetch`` batches ahead on ``workers`` threads."""
+    items = []
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if not os.path.isdir(folder):
+            continue
+        label = label_to_index.get(name, int(name) if name.isdigit() else None)
+        if label is None:
+            raise ValueError(f"{folder}: {name!r} is neither a label nor a class index")
+        items += [(os.path.join(folder, f), label) for f in sorted(os.listdir(folder))
+                  if f.lower().endswith(IMAGE_EXTENSIONS)]
+    if not items:
+        raise ValueError(f"no labelled crops found in {root}")
+
+    def load(chunk):
+        batch = np.empty((len(chunk), IMG_SIZE, IMG_SIZE, 1), dtype=np.float32)
+        for i, (path, _) in enumerate(chunk):
+            batch[i, :, :, 0] = _read_crop(path)
+        batch /= 255.0
+        return batch, np.array([label for _, label in chunk], dtype=np.int64)
+
+    chunks = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        # cv2 releases the GIL while decoding, so threads load batches in parallel.
+        futures = [pool.submit(load, chunk) for chunk in chunks[:prefetch]]
+        for n in range(len(chunks)):
+            if n + prefetch < len(chunks):
+                futures.append(pool.submit(load, chunks[n + prefetch]))
+            yield futures[n].result()
+            futures[n] = None
+
+
+def npz_dataset(path, batch_size=PREDICT_BATCH_SIZE):
+    with np.load(path) as data:
+        crops, labels = data["crops"], data["labels"].astype(np.int64)
+    for start in range(0, len(crops), batch_size):
+        yield crops[start:start + batch_size].astype(np.float32, copy=False), labels[start:start + batch_size]
+
+
+def synthetic_dataset(pages, index_to_label, batch_size=PREDICT_BATCH_SIZE, seed=1000):
+    """Crops segmented from rendered pages, labelled by the glyph cell they fall in."""
+    from .noise import match_truth
+    from .recognition import prepare_crops
+    from .segmentation import segment_characters
+    from .synth import PageSpec, render_page
+
+    label_to_index = {v: k for k, v in index_to_label.items()}
+    crops, labels = [], []
+    for i in range(pages):
+        page, truth = render_page(PageSpec(glyphs=80, seed=seed + i), index_to_label)
+        boxes, thresh = segment_characters(page)
+        keep = match_truth(boxes, [t["box"] for t in truth])
+        boxes = [b for b, k in zip(boxes, keep) if k]
+        if not boxes:
+            continue
+        # Each kept box belongs to the truth cell that covers most of it.
+        cells = np.asarray([t["box"] for t in truth], dtype=np.float32)
+        centres = np.asarray([(x + w / 2, y + h / 2) for x, y, w, h in boxes], dtype=np.float32)
+        inside = ((centres[:, None, 0] >= cells[None, :, 0]) & (centres[:, None, 0] < cells[None, :, 0] + cells[None, :, 2])
+                  & (centres[:, None, 1] >= cells[None, :, 1]) & (centres[:, None, 1] < cells[None, :, 1] + cells[None, :, 3]))
+        owner = inside.argmax(axis=1)
+        crops.append(prepare_crops(boxes, thresh))
+        labels.append(np.array([label_to_index[truth[j]["label"]] for j in owner], dtype=np.int64))
+    if not crops:
+        raise ValueError(f"no glyphs segmented from {pages} synthetic page(s)")
+    crops, labels = np.concatenate(crops), np.concatenate(labels)
+    for start in range(0, len(crops), batch_size):
+        yield crops[start:start + batch_size], labels[start:start + batch_size]
+
+
+# --------------------------------------------------
+# METRICS
+# --------------------------------------------------
+def confusion_matrix(truth, predicted, num_classes):
+    """``m[t, p]`` counts glyphs of class ``t`` predicted as ``p``."""
+    return np.bincount(truth * num_classes + predicted, minlength=num_classes ** 2).reshape(num_classes, num_classes)
+
+
+def class_metrics(confusion):
+    """Per-class precision, recall, F1 and support from a confusion matrix."""
+    tp = np.diag(confusion).astype(np.float64)
+    predicted = confusion.sum(axis=0)
+    support = confusion.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(tp), where=precision + recall > 0)
+    return precision, recall, f1, support
+
+
+def evaluate(model, batches, index_to_label):
+    """Run ``model`` over ``(crops, labels)`` batches; returns the report dict."""
+    k = len(index_to_label)
+    confusion = np.zeros((k, k), dtype=np.int64)
+    nll, glyphs, latencies = 0.0, 0, []
+    wall = time.perf_counter()
+    for crops, labels in batches:
+        start = time.perf_counter()
+        probs = model.predict(crops)
+        latencies.append((time.perf_counter() - start, len(crops)))
+        confusion += confusion_matrix(labels, probs.argmax(axis=1), k)
+        nll -= float(np.log(np.clip(probs[np.arange(len(labels)), labels], 1e-7, None)).sum())
+        glyphs += len(crops)
+    wall = time.perf_counter() - wall
+    if not glyphs:
+        raise ValueError("the dataset is empty")
+
+    precision, recall, f1, support = class_metrics(confusion)
+    present = support > 0
+    weights = support / glyphs
+    seconds = np.array([s for s, _ in latencies])
+    per_glyph = seconds / np.array([n for _, n in latencies])
+    errors = confusion.copy()
+    np.fill_diagonal(errors, 0)
+    worst = np.argsort(errors, axis=None)[::-1][:10]
+    return {
+        "glyphs": glyphs,
+        "classes": k,
+        "classes_present": int(present.sum()),
+        "accuracy": float(np.trace(confusion) / glyphs),
+        "loss": nll / glyphs,
+        "macro": {"precision": float(precision[present].mean()), "recall": float(recall[present].mean()),
+                  "f1": float(f1[present].mean())},
+        "weighted": {"precision": float(weights @ precision), "recall": float(weights @ recall),
+                     "f1": float(weights @ f1)},
+        "per_class": [
+            {"index": i, "label": index_to_label[i], "precision": float(precision[i]),
+             "recall": float(recall[i]), "f1": float(f1[i]), "support": int(support[i])}
+            for i in range(k)
+        ],
+        "top_confusions": [
+            {"true": index_to_label[int(t)], "predicted": index_to_label[int(p)], "count": int(errors[t, p])}
+            for t, p in zip(*np.unravel_index(worst, errors.shape)) if errors[t, p]
+        ],
+        "confusion": confusion.tolist(),
+        "latency": {
+            "per_glyph_ms": float(seconds.sum() / glyphs * 1e3),
+            "per_glyph_ms_p50": float(np.median(per_glyph) * 1e3),
+            "per_glyph_ms_p95": float(np.percentile(per_glyph, 95) * 1e3),
+            "batch_ms_p50": float(np.median(seconds) * 1e3),
+            "glyphs_per_s": glyphs / wall,
+        },
+    }
+
+
+def confusion_image(report, cell=6):
+    """RGB heat map of the report's confusion matrix, rows normalised per true class."""
+    confusion = np.asarray(report["confusion"], dtype=np.float64)
+    rates = confusion / np.maximum(confusion.sum(axis=1, keepdims=True), 1)
+    # sqrt keeps small off-diagonal rates visible next to a strong diagonal.
+    heat = (np.sqrt(rates) * 255).astype(np.uint8)
+    heat = cv2.resize(heat, None, fx=cell, fy=cell, interpolation=cv2.INTER_NEAREST)
+    return cv2.cvtColor(cv2.applyColorMap(heat, cv2.COLORMAP_VIRIDIS), cv2.COLOR_BGR2RGB)
+
+
+def load_report(path=EVAL_REPORT_PATH):
+    """The saved report, or None if no evaluation was run yet."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def format_report(report):
+    lines = [
+        f"{report['model']['backend']} {report['model']['path']}: {report['glyphs']} glyphs, "
+        f"{report['classes_present']}/{report['classes']} classes",
+        f"accuracy {report['accuracy']:.2%}  loss {report['loss']:.4f}  "
+        f"macro F1 {report['macro']['f1']:.3f}  weighted F1 {report['weighted']['f1']:.3f}",
+        f"latency {report['latency']['per_glyph_ms']:.3f} ms/glyph  {report['latency']['glyphs_per_s']:.0f} glyphs/s",
+    ]
+    weakest = sorted((c for c in report["per_class"] if c["support"]), key=lambda c: c["f1"])[:5]
+    lines += [f"  weakest {c['label']}: P {c['precision']:.2f} R {c['recall']:.2f} F1 {c['f1']:.2f} "
+              f"(n={c['support']})" for c in weakest]
+    lines += [f"  {c['true']} -> {c['predicted']}: {c['count']}" for c in report["top_confusions"][:5]]
+    return "\n".join(lines)
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.evaluate")
+    parser.add_argument("dataset", nargs="?", help="class-per-folder crop directory or .npz")
+    parser.add_argument("--synthetic", type=int, metavar="PAGES", help="evaluate on rendered pages instead")
+    parser.add_argument("--backend")
+    parser.add_argument("--model", help="model file or model registry version directory")
+    parser.add_argument("--labels", default=LABEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=PREDICT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, help="crop decoding threads")
+    parser.add_argument("--out", default=EVAL_REPORT_PATH, help="JSON report path")
+    args = parser.parse_args(argv)
+    if (args.dataset is None) == (args.synthetic is None):
+        parser.error("give a dataset or --synthetic, not both")
+
+    from .cache import file_sha256
+    from .resources import load_resources
+
+    model, index_to_label = load_resources(args.model, args.labels, args.backend)
+    if args.synthetic:
+        batches, source = synthetic_dataset(args.synthetic, index_to_label, args.batch_size), f"synthetic:{args.synthetic}"
+    elif args.dataset.endswith(".npz"):
+        batches, source = npz_dataset(args.dataset, args.batch_size), args.dataset
+    else:
+        label_to_index = {v: k for k, v in index_to_label.items()}
+        batches = directory_dataset(args.dataset, label_to_index, args.batch_size, args.workers)
+        source = args.dataset
+
+    report = evaluate(model, batches, index_to_label)
+    path = model.model_path
+    report = {
+        "model": {
+            "backend": getattr(model, "name", args.backend),
+            "path": path,
+            "sha256": file_sha256(os.path.join(path, "manifest.json") if os.path.isdir(path) else path),
+        },
+        "dataset": source,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        **report,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False)
+    print(format_report(report))
+    print(f"report written to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""Image decoding.
+
+``load_gray`` is the fast path used by the engine: it decodes straight to
+grayscale and, for large photos, at a reduced size chosen from the glyph
+height. An 8x-reduced preview is decoded first (JPEG draft mode scales
+during the DCT, so this costs a fraction of a full decode), glyph height is
+estimated from it, and the page is then decoded at the largest 2x/4x/8x
+reduction that still leaves glyphs ``TARGET_GLYPH_HEIGHT`` pixels tall.
+Callers multiply boxes by the returned scale to get back to the original.
+"""
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .config import REDUCED_DECODE_MIN_PIXELS, TARGET_GLYPH_HEIGHT
+
+REDUCTIONS = (1, 2, 4, 8)
+_CV2_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def load_image(source):
+    """Decode a path or file-like object into an RGB uint8 array.
+
+    ``.npy`` scans are memory-mapped instead, for tiled segmentation.
+    """
+    if isinstance(source, str) and source.endswith(".npy"):
+        return np.load(source, mmap_mode="r")
+    with Image.open(source) as image:
+        return np.array(image.convert("RGB"))
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return f.read()
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source.read()
+
+
+def decode_gray(data, reduction=1):
+    """Decode encoded ``data`` to grayscale at ``1/reduction`` size; returns ``(gray, scale)``.
+
+    ``scale`` maps decoded pixel coordinates back to the original image.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        width, height = image.size
+        if image.format == "JPEG":
+            # libjpeg scales by 1/2, 1/4 or 1/8 inside the DCT and skips colour conversion.
+            image.draft("L", (width // reduction, height // reduction))
+            gray = np.asarray(image.convert("L"))
+            return gray, width / gray.shape[1]
+    # OpenCV decodes PNG/TIFF/WebP straight to (optionally reduced) grayscale,
+    # with no full-size RGB copy.
+    gray = cv2.imdecode(np.frombuffer(data, np.uint8), _CV2_FLAGS[reduction] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if gray is None:
+        with Image.open(io.BytesIO(data)) as image:
+            gray = _shrink(np.asarray(image.convert("L")), reduction)
+    return gray, width / gray.shape[1]
+
+
+def _shrink(gray, reduction):
+    h, w = gray.shape
+    return cv2.resize(gray, (-(-w // reduction), -(-h // reduction)), interpolation=cv2.INTER_AREA)
+
+
+def estimate_glyph_height(gray):
+    """Median height in pixels of ink components in ``gray``; None when there are none."""
+    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 15, 8)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(thresh, connectivity=8)
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    # Specks from grain and JPEG noise are not glyphs.
+    heights = heights[(heights >= 4) & (stats[1:, cv2.CC_STAT_AREA] >= 8)]
+    return float(np.median(heights)) if len(heights) else None
+
+
+def choose_reduction(glyph_height, target=TARGET_GLYPH_HEIGHT):
+    """Largest of 1/2/4/8 that keeps ``glyph_height`` at or above ``target`` pixels."""
+    if not glyph_height or not target:
+        return 1
+    return max(r for r in REDUCTIONS if r == 1 or glyph_height / r >= target)
+
+
+def load_gray(source, glyph_height=TARGET_GLYPH_HEIGHT, min_pixels=REDUCED_DECODE_MIN_PIXELS):
+    """Decode ``source`` to a grayscale array at a resolution suited to its glyphs.
+
+    Returns ``(gray, scale)``; ``glyph_height=None`` always decodes at full size.
+    ``.npy`` scans are returned memory-mapped and unscaled.
+    """
+    if isinstance(source, str) and source.endswith(".npy"):
+        return np.load(source, mmap_mode="r"), 1.0
+    data = _read_bytes(source)
+    with Image.open(io.BytesIO(data)) as image:
+        jpeg = image.format == "JPEG"
+        pixels = image.size[0] * image.size[1]
+    if glyph_height is None or pixels < min_pixels:
+        return decode_gray(data)
+    if not jpeg:
+        # No format other than JPEG decodes at reduced size for free, so
+        # decode once and shrink, rather than decoding a preview as well.
+        gray, _ = decode_gray(data)
+        estimate = estimate_glyph_height(_shrink(gray, 8))
+        reduction = choose_reduction(estimate and estimate * 8, glyph_height)
+        small = _shrink(gray, reduction) if reduction > 1 else gray
+        return small, gray.shape[1] / small.shape[1]
+    preview, preview_scale = decode_gray(data, 8)
+    estimate = estimate_glyph_height(preview)
+    reduction = choose_reduction(estimate and estimate * preview_scale, glyph_height)
+    if reduction == 8:
+        return preview, preview_scale
+    return decode_gray(data, reduction)
+
+
+def load_preview(source, max_side=1600):
+    """RGB PIL image no larger than ``max_side``, decoded at reduced size where possible."""
+    with Image.open(io.BytesIO(_read_bytes(source))) as image:
+        image.draft("RGB", (max_side, max_side))
+        image = image.convert("RGB")
+    image.thumbnail((max_side, max_side))
+    return image
+
+
+def scale_boxes(boxes, scale):
+    """Map ``(x, y, w, h)`` boxes from a reduced decode back to original pixels."""
+    if scale == 1.0:
+        return boxes
+    return [tuple(int(round(v * scale)) for v in box) for box in boxes]
@@ -0,0 +1,93 @@
+"""Line detection and reading order for multi-line pages."""
+from collections import defaultdict
+
+import numpy as np
+
+
+class GridIndex:
+    """Uniform-grid spatial index over ``(x, y, w, h)`` boxes.
+
+    Cells default to the median glyph size, so a neighbourhood query touches a
+    constant number of cells and only the boxes registered in them.
+    """
+
+    def __init__(self, boxes, cell_size=None):
+        self.boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if cell_size is None:
+            cell_size = int(np.median(self.boxes[:, 2:])) if len(self.boxes) else 32
+        self.cell_size = max(1, cell_size)
+        self.cells = defaultdict(list)
+
+        x0, y0 = self.boxes[:, 0], self.boxes[:, 1]
+        cx0, cy0 = x0 // self.cell_size, y0 // self.cell_size
+        cx1 = (x0 + self.boxes[:, 2] - 1) // self.cell_size
+        cy1 = (y0 + self.boxes[:, 3] - 1) // self.cell_size
+        for i in range(len(self.boxes)):
+            for cy in range(cy0[i], cy1[i] + 1):
+                for cx in range(cx0[i], cx1[i] + 1):
+                    self.cells[cx, cy].append(i)
+
+    def query(self, x0, y0, x1, y1):
+        """Ids of boxes intersecting the half-open rectangle ``[x0, x1) x [y0, y1)``."""
+        c = self.cell_size
+        found = set()
+        for cy in range(y0 // c, (y1 - 1) // c + 1):
+            for cx in range(x0 // c, (x1 - 1) // c + 1):
+                found.update(self.cells.get((cx, cy), ()))
+        if not found:
+            return []
+        ids = np.fromiter(found, dtype=np.int64)
+        b = self.boxes[ids]
+        hit = (b[:, 0] < x1) & (b[:, 0] + b[:, 2] > x0) & (b[:, 1] < y1) & (b[:, 1] + b[:, 3] > y0)
+        return sorted(ids[hit].tolist())
+
+    def neighbours(self, i, dx, dy=None):
+        """Ids of boxes within ``dx`` / ``dy`` pixels of box ``i`` (excluding ``i``)."""
+        dy = dx if dy is None else dy
+        x, y, w, h = self.boxes[i].tolist()
+        return [j for j in self.query(x - dx, y - dy, x + w + dx, y + h + dy) if j != i]
+
+
+def group_lines(boxes, min_overlap=0.5):
+    """Cluster boxes into text lines by vertical overlap.
+
+    Boxes are swept in order of vertical centre. A box joins the most recent
+    line when it overlaps that line's band (the running mean of member tops and
+    bottoms) by at least ``min_overlap`` of the shorter of the two heights.
+    Returns lists of box indices, top line first, each ordered left to right.
+    """
+    if not len(boxes):
+        return []
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    top, bottom = b[:, 1], b[:, 1] + b[:, 3]
+    order = np.argsort((top + bottom) / 2, kind="stable")
+
+    lines = []
+    band_top = band_bottom = 0.0
+    for i in order:
+        if lines:
+            overlap = min(bottom[i], band_bottom) - max(top[i], band_top)
+            if overlap >= min_overlap * min(b[i, 3], band_bottom - band_top):
+                members = lines[-1]
+                members.append(i)
+                n = len(members)
+                band_top += (top[i] - band_top) / n
+                band_bottom += (bottom[i] - band_bottom) / n
+                continue
+        lines.append([i])
+        band_top, band_bottom = top[i], bottom[i]
+
+    lines.sort(key=lambda m: float(np.mean(top[m] + bottom[m])))
+    return [sorted(m, key=lambda i: (b[i, 0], i)) for m in lines]
+
+
+def reading_order(boxes, min_overlap=0.5):
+    """Return ``(order, lines)``: a permutation of ``boxes`` into reading order and
+    the per-line index lists into the reordered boxes."""
+    lines = group_lines(boxes, min_overlap)
+    order = [i for line in lines for i in line]
+    spans, start = [], 0
+    for line in lines:
+        spans.append(list(range(start, start + len(line))))
+        start += len(line)
+    return order, spans
@@ -0,0 +1,220 @@
+"""Live camera and video reading with temporal glyph tracking.
+
+    python -m brahmilens.live walkthrough.mp4 --every 2
+
+Consecutive frames of an inscription are nearly identical, so classifying
+every glyph on every frame is wasted work. Each frame is segmented as usual,
+then its boxes are matched to the glyphs tracked so far: the global camera
+shift is estimated by phase correlation on a downscaled frame, tracked
+boxes are moved by it, and detections and tracks that are each other's best
+IoU match are paired. A paired glyph keeps its cached top-k candidates
+unless its 16x16 appearance signature drifted past ``change_threshold``;
+only new and changed glyphs reach the classifier.
+"""
+import argparse
+import json
+import sys
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from .recognition import SIGNATURE, signatures
+
+MOTION_SCALE = 4
+
+
+def iou_matrix(a, b):
+    """(len(a), len(b)) IoU of two ``(x, y, w, h)`` box arrays."""
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(b, dtype=np.float32).reshape(1, -1, 4)
+    iw = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    ih = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+class GlyphTracker:
+    """Tracked glyph boxes with their cached candidates and appearance signatures."""
+
+    def __init__(self, iou_threshold=0.5, change_threshold=0.2, max_missed=5):
+        self.iou_threshold = iou_threshold
+        self.change_threshold = change_threshold
+        self.max_missed = max_missed
+        self.reset()
+
+    def reset(self):
+        self.boxes = np.empty((0, 4), dtype=np.float32)
+        self.signatures = np.empty((0, SIGNATURE, SIGNATURE), dtype=np.float32)
+        self.ids = self.probs = None
+        self.missed = np.empty(0, dtype=np.int32)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def match(self, boxes, sigs, shift=(0.0, 0.0)):
+        """Track index per detection (-1 for new) and a mask of detections to classify."""
+        match = np.full(len(boxes), -1, dtype=np.int64)
+        if len(self) and len(boxes):
+            moved = self.boxes + np.array([shift[0], shift[1], 0, 0], dtype=np.float32)
+            iou = iou_matrix(boxes, moved)
+            best_track = iou.argmax(axis=1)
+            best_det = iou.argmax(axis=0)
+            det = np.arange(len(boxes))
+            mutual = (best_det[best_track] == det) & (iou[det, best_track] >= self.iou_threshold)
+            match[mutual] = best_track[mutual]
+        stale = match < 0
+        paired = ~stale
+        if paired.any():
+            drift = np.abs(sigs[paired] - self.signatures[match[paired]]).mean(axis=(1, 2))
+            stale[paired] = drift > self.change_threshold
+        return match, stale
+
+    def update(self, boxes, sigs, ids, probs, match):
+        """Replace matched tracks, add new ones, and age out tracks not seen for a while."""
+        seen = np.zeros(len(self), dtype=bool)
+        seen[match[match >= 0]] = True
+        self.missed = self.missed + 1
+        keep = ~seen & (self.missed <= self.max_missed)
+        old = (self.boxes[keep], self.signatures[keep], self.missed[keep])
+        old_ids = self.ids[keep] if self.ids is not None else ids[:0]
+        old_probs = self.probs[keep] if self.probs is not None else probs[:0]
+        self.boxes = np.concatenate([np.asarray(boxes, dtype=np.float32).reshape(-1, 4), old[0]])
+        self.signatures = np.concatenate([sigs, old[1]])
+        self.ids = np.concatenate([ids, old_ids])
+        self.probs = np.concatenate([probs, old_probs])
+        self.missed = np.concatenate([np.zeros(len(boxes), dtype=np.int32), old[2]])
+
+
+class LiveReader:
+    """Frame-by-frame OCR over an ``OCREngine`` that reuses labels of tracked glyphs."""
+
+    def __init__(self, engine, tracker=None, motion=True, window=30):
+        self.engine = engine
+        self._serving = None    # engine the tracked candidates came from
+        self.tracker = tracker or GlyphTracker()
+        self.motion = motion
+        self._prev = None
+        self._frame_times = deque(maxlen=window)
+        self.stats = {"frames": 0, "glyphs": 0, "classified": 0}
+
+    def reset(self):
+        self.tracker.reset()
+        self._prev = None
+
+    def _shift(self, image):
+        # Global translation since the last frame, in full-frame pixels.
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, None, fx=1 / MOTION_SCALE, fy=1 / MOTION_SCALE,
+                           interpolation=cv2.INTER_AREA).astype(np.float32)
+        prev, self._prev = self._prev, small
+        if prev is None or prev.shape != small.shape:
+            return 0.0, 0.0
+        (dx, dy), _ = cv2.phaseCorrelate(prev, small)
+        return dx * MOTION_SCALE, dy * MOTION_SCALE
+
+    def process(self, frame):
+        """Read one RGB/grayscale frame (or encoded image); returns the ``OCRResult``."""
+        start = time.perf_counter()
+        # One engine per frame, sticky per reader; tracked candidates from
+        # another model version are dropped.
+        version, engine = self.engine.route(id(self))
+        if engine is not self._serving:
+            self._serving = engine
+            self.tracker.reset()
+        scale = 1.0
+        if not isinstance(frame, np.ndarray):
+            frame, scale = engine.load(frame)
+        shift = self._shift(frame) if self.motion else (0.0, 0.0)
+        boxes, crops = engine.prepare(frame, scale)
+        sigs = signatures(crops)
+        match, stale = self.tracker.match(boxes, sigs, (shift[0] * scale, shift[1] * scale))
+
+        k = engine.top_k
+        ids = np.zeros((len(boxes), k), dtype=np.int16)
+        probs = np.zeros((len(boxes), k), dtype=np.float32)
+        reuse = ~stale
+        if reuse.any():
+            ids[reuse] = self.tracker.ids[match[reuse]]
+            probs[reuse] = self.tracker.probs[match[reuse]]
+            # Drift is measured against the appearance the labels came from.
+            sigs[reuse] = self.tracker.signatures[match[reuse]]
+        if stale.any():
+            new_ids, new_probs = engine.candidates(engine.predict(crops[stale]))
+            ids[stale], probs[stale] = new_ids, new_probs
+        self.tracker.update(boxes, sigs, ids, probs, match)
+        result = engine.assemble(boxes, topk=(ids, probs))
+        result.model_version = version
+
+        self._frame_times.append(time.perf_counter() - start)
+        self.stats["frames"] += 1
+        self.stats["glyphs"] += len(boxes)
+        self.stats["classified"] += int(stale.sum())
+        return result
+
+    @property
+    def fps(self):
+        """Frames per second over the recent window."""
+        total = sum(self._frame_times)
+        return len(self._frame_times) / total if total else 0.0
+
+    def report(self):
+        glyphs = self.stats["glyphs"]
+        return {
+            **self.stats,
+            "fps": self.fps,
+            "reused": 1 - self.stats["classified"] / glyphs if glyphs else 0.0,
+        }
+
+
+def iter_frames(path, every=1, max_frames=None):
+    """RGB frames of a video file, keeping one in ``every``."""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise OSError(f"cannot open video {path}")
+    try:
+        index = kept = 0
+        while max_frames is None or kept < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                return
+            if index % every == 0:
+                kept += 1
+                yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            index += 1
+    finally:
+        capture.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.live", description="Read a recorded video offline.")
+    parser.add_argument("video")
+    parser.add_argument("--every", type=int, default=1, help="process one frame in N")
+    parser.add_argument("--max-frames", type=int)
+    parser.add_argument("--no-tracking", action="store_true", help="classify every glyph on every frame")
+    parser.add_argument("--json", action="store_true", help="emit one JSON object per frame")
+    parser.add_argument("--backend")
+    parser.add_argument("--model")
+    args = parser.parse_args(argv)
+
+    from .engine import OCREngine
+
+    reader = LiveReader(OCREngine(args.model, backend=args.backend))
+    if args.no_tracking:
+        reader.tracker.change_threshold = -1.0
+    last = None
+    for n, frame in enumerate(iter_frames(args.video, args.every, args.max_frames)):
+        result = reader.process(frame)
+        if args.json:
+            print(json.dumps({"frame": n, "fps": reader.fps, "sentence": result.sentence}, ensure_ascii=False))
+        elif result.sentence != last:
+            print(f"[{n}] {result.sentence}")
+        last = result.sentence
+    print(json.dumps(reader.report()), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
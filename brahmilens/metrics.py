@@ -0,0 +1,220 @@
+"""Hot-path instrumentation: per-request stage timers, histograms, Prometheus export.
+
+Disabled by default (``BRAHMILENS_METRICS=1`` or ``METRICS.enable()`` turns
+it on). While disabled, ``METRICS.stage()`` hands back one shared no-op
+context manager, so instrumented code costs an attribute check and a call.
+"""
+import os
+import resource
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Null:
+    stages = {}
+    counters = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _Null()
+
+
+def rss_bytes():
+    """Current resident set size, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return None
+
+
+class RequestTrace:
+    """Stage durations and counts for one request (one thread).
+
+    ``counters["rss_delta_bytes"]`` is the change in process RSS over the
+    request; requests running concurrently in other threads show up in it too.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.stages = {}
+        self.counters = {}
+        self._outer = None
+        self._start = None
+        self._rss = None
+
+    def __enter__(self):
+        self._outer = getattr(self.metrics._local, "trace", None)
+        self.metrics._local.trace = self
+        self._rss = rss_bytes()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stages["total"] = time.perf_counter() - self._start
+        if self._rss is not None:
+            self.counters["rss_delta_bytes"] = rss_bytes() - self._rss
+        self.metrics._local.trace = self._outer
+        self.metrics._finish(self)
+        return False
+
+
+class _StageTimer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.record_stage(self.name, elapsed)
+        return False
+
+
+class Metrics:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.stage_seconds = {}
+        self.histograms = {}
+        self.counters = {"requests": 0}
+        self.peak_rss_bytes = 0
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    # ---------------- recording ----------------
+    def request(self):
+        return RequestTrace(self) if self.enabled else _NULL
+
+    def stage(self, name):
+        return _StageTimer(self, name) if self.enabled else _NULL
+
+    def observe(self, name, value):
+        """Record ``value`` in the count histogram ``name`` (glyphs, batch sizes...)."""
+        if not self.enabled:
+            return
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.counters[name] = trace.counters.get(name, 0) + value
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram(COUNT_BUCKETS)
+            hist.observe(value)
+
+    def record_stage(self, name, elapsed):
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.stages[name] = trace.stages.get(name, 0.0) + elapsed
+        with self._lock:
+            hist = self.stage_seconds.get(name)
+            if hist is None:
+                hist = self.stage_seconds[name] = Histogram(SECONDS_BUCKETS)
+            hist.observe(elapsed)
+
+    def _finish(self, trace):
+        # Process-lifetime peak, so only the gauge gets it; ru_maxrss is in KiB on Linux.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        with self._lock:
+            self.counters["requests"] += 1
+            self.peak_rss_bytes = max(self.peak_rss_bytes, peak)
+            hist = self.stage_seconds.get("total")
+            if hist is None:
+                hist = self.stage_seconds["total"] = Histogram(SECONDS_BUCKETS)
+            hist.observe(trace.stages["total"])
+
+    # ---------------- export ----------------
+    def summary(self):
+        """Per-stage count, total and mean seconds, for dashboards."""
+        with self._lock:
+            return {
+                name: {"count": h.count, "sum_s": h.sum, "mean_s": h.sum / h.count if h.count else 0.0}
+                for name, h in sorted(self.stage_seconds.items())
+            }
+
+    def render_prometheus(self):
+        out = []
+
+        def histogram(metric, label, hists):
+            out.append(f"# TYPE {metric} histogram")
+            for key, h in sorted(hists.items()):
+                sel = f'{label}="{key}",' if label else ""
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    out.append(f'{metric}_bucket{{{sel}le="{bound}"}} {cumulative}')
+                out.append(f'{metric}_bucket{{{sel}le="+Inf"}} {h.count}')
+                tag = f"{{{sel[:-1]}}}" if sel else ""
+                out.append(f"{metric}_sum{tag} {h.sum}")
+                out.append(f"{metric}_count{tag} {h.count}")
+
+        with self._lock:
+            out.append("# TYPE brahmilens_requests_total counter")
+            out.append(f"brahmilens_requests_total {self.counters['requests']}")
+            out.append("# TYPE brahmilens_peak_rss_bytes gauge")
+            out.append(f"brahmilens_peak_rss_bytes {self.peak_rss_bytes}")
+            histogram("brahmilens_stage_seconds", "stage", self.stage_seconds)
+            for name, h in sorted(self.histograms.items()):
+                histogram(f"brahmilens_{name}", None, {"": h})
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the exposition text (node_exporter textfile collector style)."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+    def serve(self, port=9464, host="127.0.0.1"):
+        """Serve ``/metrics`` from a daemon thread; returns the HTTP server."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                found = self.path.split("?", 1)[0] == "/metrics"
+                body = metrics.render_prometheus().encode() if found else b""
+                self.send_response(200 if found else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="brahmilens-metrics", daemon=True).start()
+        return server
+
+
+METRICS = Metrics(enabled=os.environ.get("BRAHMILENS_METRICS", "") not in ("", "0"))
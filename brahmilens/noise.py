@@ -0,0 +1,267 @@
+"""Cheap rejection of non-glyph components before they reach the classifier.
+
+Weathered stone yields many contours that are cracks, lichen or grain. Each
+that passes the size filter costs a CNN inference and adds a stray character
+to the sentence. Here every candidate is described by a handful of shape
+features computed for the whole crop batch at once, and a rule set (one
+accepted range per feature, fitted on labelled pages) drops the ones that do
+not look like writing:
+
+- ``fill``: ink fraction of the box; lichen patches are nearly solid.
+- ``aspect``: log(width / height); cracks are long and thin.
+- ``stroke``: mean run length of ink, as a fraction of the box height.
+- ``stroke_cv``: spread of the per-row run lengths; chiselled strokes are even.
+- ``density``: fraction of an 8x8 grid over the crop that holds any ink.
+- ``rel_height``: box height over the page median.
+
+    python -m brahmilens.noise fit --out noise.json --labelled inscriptions/
+    python -m brahmilens.noise evaluate --filter noise.json --labelled heldout/
+
+A labelled directory holds real page images, each next to a JSON file of the
+same name listing its glyph boxes: ``[[x, y, w, h], ...]`` or records with a
+``"box"`` key, as ``synth.render_page`` produces. Without ``--labelled`` the
+pages are synthetic. The built-in ranges were fitted on synthetic pages only,
+so the filter stays opt-in (``OCREngine(noise_filter=...)``, ``brahmilens
+--noise-filter``) until a rule set has been checked on real inscriptions.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from .config import IMAGE_EXTENSIONS, PREDICT_BATCH_SIZE
+from .metrics import METRICS
+
+FEATURES = ("fill", "aspect", "stroke", "stroke_cv", "density", "rel_height")
+GRID = 8
+
+
+def box_features(boxes, crops):
+    """(N, len(FEATURES)) float32 features for boxes and their (N, 64, 64, 1) crops."""
+    n = len(boxes)
+    if n == 0:
+        return np.empty((0, len(FEATURES)), dtype=np.float32)
+    dims = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    w, h = dims[:, 2], dims[:, 3]
+    ink = crops[..., 0] > 0.5
+    size = ink.shape[1]
+
+    pixels = ink.sum(axis=(1, 2)).astype(np.float32)
+    row_starts = (ink[:, :, 1:] & ~ink[:, :, :-1]).sum(axis=2) + ink[:, :, 0]
+    col_starts = (ink[:, 1:, :] & ~ink[:, :-1, :]).sum(axis=1) + ink[:, 0, :]
+    # Mean run length in original pixels along each axis; the thinner one is the stroke.
+    hrun = pixels / np.maximum(row_starts.sum(axis=1), 1) * (w / size)
+    vrun = pixels / np.maximum(col_starts.sum(axis=1), 1) * (h / size)
+
+    row_runs = ink.sum(axis=2) / np.maximum(row_starts, 1)
+    inked = row_starts > 0
+    rows = np.maximum(inked.sum(axis=1), 1)
+    mean = row_runs.sum(axis=1) / rows
+    var = (np.where(inked, row_runs - mean[:, None], 0) ** 2).sum(axis=1) / rows
+
+    cells = ink.reshape(n, GRID, size // GRID, GRID, size // GRID).any(axis=(2, 4))
+
+    return np.stack([
+        pixels / (size * size),
+        np.log(w / h),
+        np.minimum(hrun, vrun) / h,
+        np.sqrt(var) / np.maximum(mean, 1e-6),
+        cells.mean(axis=(1, 2)),
+        h / np.median(h),
+    ], axis=1).astype(np.float32)
+
+
+@dataclass(frozen=True)
+class NoiseFilter:
+    """Accepted ``[low, high]`` range per feature, in ``FEATURES`` order."""
+    # Defaults: ``fit`` on weathered synthetic pages, widened for real stone;
+    # not yet validated on real inscriptions.
+    low: tuple = (0.2, -0.8, 0.08, 0.15, 0.45, 0.25)
+    high: tuple = (0.75, 0.7, 0.45, 1.0, 1.0, 1.8)
+
+    def keep(self, features):
+        return ((features >= np.asarray(self.low)) & (features <= np.asarray(self.high))).all(axis=1)
+
+    @classmethod
+    def fit(cls, features, is_glyph, quantile=0.005, margin=0.1):
+        """Ranges covering all but ``quantile`` of the glyphs at each end, widened by ``margin``."""
+        glyphs = features[is_glyph]
+        low, high = np.quantile(glyphs, [quantile, 1 - quantile], axis=0)
+        pad = (high - low) * margin
+        return cls(tuple(np.round(low - pad, 4).tolist()), tuple(np.round(high + pad, 4).tolist()))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(tuple(data["low"]), tuple(data["high"]))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"features": FEATURES, **asdict(self)}, f, indent=2)
+
+
+DEFAULT_NOISE_FILTER = NoiseFilter()
+
+
+def reject_noise(boxes, crops, noise_filter=DEFAULT_NOISE_FILTER):
+    """Drop boxes (and their crops) the filter classifies as noise."""
+    with METRICS.stage("noise_filter"):
+        keep = noise_filter.keep(box_features(boxes, crops))
+    METRICS.observe("noise_rejected", int(len(keep) - keep.sum()))
+    return [b for b, k in zip(boxes, keep) if k], crops[keep]
+
+
+def match_truth(boxes, truth_boxes, min_cover=0.6):
+    """True for each detected box lying at least ``min_cover`` inside a ground-truth glyph cell."""
+    if not len(boxes) or not len(truth_boxes):
+        return np.zeros(len(boxes), dtype=bool)
+    a = np.asarray(boxes, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(truth_boxes, dtype=np.float32).reshape(1, -1, 4)
+    iw = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    ih = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+    return (inter / (a[..., 2] * a[..., 3])).max(axis=1) >= min_cover
+
+
+def _labelled_pages(pages, clutter, seed, glyph_heights):
+    from .recognition import prepare_crops
+    from .segmentation import segment_characters
+    from .synth import PageSpec, render_page
+
+    for i in range(pages):
+        spec = PageSpec(glyphs=80, clutter=clutter, seed=seed + i,
+                        glyph_height=glyph_heights[i % len(glyph_heights)])
+        page, truth = render_page(spec)
+        boxes, thresh = segment_characters(page)
+        crops = prepare_crops(boxes, thresh)
+        yield boxes, crops, match_truth(boxes, [t["box"] for t in truth])
+
+
+def _read_truth(path):
+    with open(path, encoding="utf-8") as f:
+        truth = json.load(f)
+    return [t["box"] if isinstance(t, dict) else t for t in truth]
+
+
+def _directory_pages(root):
+    """Real pages of a labelled directory (see the module docstring), segmented at full size."""
+    from .ingest import load_gray
+    from .recognition import prepare_crops
+    from .segmentation import segment_characters
+
+    labelled = []
+    for name in sorted(os.listdir(root)):
+        stem, ext = os.path.splitext(name)
+        truth_path = os.path.join(root, stem + ".json")
+        if ext.lower() in IMAGE_EXTENSIONS and os.path.isfile(truth_path):
+            labelled.append((os.path.join(root, name), truth_path))
+    if not labelled:
+        raise ValueError(f"no labelled pages (image + .json glyph boxes) in {root}")
+
+    def pages():
+        for image_path, truth_path in labelled:
+            # Full-size decode, so boxes are in the annotation's pixel coordinates.
+            page, _ = load_gray(image_path, glyph_height=None)
+            boxes, thresh = segment_characters(np.asarray(page))
+            crops = prepare_crops(boxes, thresh)
+            yield boxes, crops, match_truth(boxes, _read_truth(truth_path))
+
+    return pages()
+
+
+def evaluate(noise_filter, pages, model=None, batch_size=PREDICT_BATCH_SIZE):
+    """Rejection rates on labelled pages and, with ``model``, the inference time saved."""
+    totals = {"components": 0, "glyphs": 0, "noise": 0, "glyphs_rejected": 0,
+              "noise_rejected": 0, "filter_s": 0.0, "inference_saved_s": 0.0}
+    for boxes, crops, is_glyph in pages:
+        t = time.perf_counter()
+        keep = noise_filter.keep(box_features(boxes, crops))
+        totals["filter_s"] += time.perf_counter() - t
+        totals["components"] += len(boxes)
+        totals["glyphs"] += int(is_glyph.sum())
+        totals["noise"] += int((~is_glyph).sum())
+        totals["glyphs_rejected"] += int((is_glyph & ~keep).sum())
+        totals["noise_rejected"] += int((~is_glyph & ~keep).sum())
+        if model is not None and (~keep).any():
+            from .recognition import predict_batched
+
+            t = time.perf_counter()
+            predict_batched(model, crops[~keep], batch_size)
+            totals["inference_saved_s"] += time.perf_counter() - t
+    rejected = totals["glyphs_rejected"] + totals["noise_rejected"]
+    totals["rejection_rate"] = rejected / max(totals["components"], 1)
+    totals["noise_recall"] = totals["noise_rejected"] / max(totals["noise"], 1)
+    totals["glyph_loss"] = totals["glyphs_rejected"] / max(totals["glyphs"], 1)
+    return totals
+
+
+def format_report(report):
+    return "\n".join([
+        f"components        {report['components']}  ({report['glyphs']} glyphs, {report['noise']} noise)",
+        f"rejected          {report['rejection_rate']:.1%} of components",
+        f"noise rejected    {report['noise_recall']:.1%}",
+        f"glyphs lost       {report['glyph_loss']:.2%}",
+        f"filter time       {report['filter_s'] * 1e3:.1f} ms",
+        f"inference saved   {report['inference_saved_s'] * 1e3:.1f} ms",
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.noise")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("fit", "evaluate"):
+        p = sub.add_parser(name)
+        p.add_argument("--labelled", metavar="DIR", help="real pages with JSON glyph boxes (default: synthetic)")
+        p.add_argument("--pages", type=int, default=40)
+        p.add_argument("--clutter", type=float, default=6.0, help="weathering marks per 20 glyphs")
+        p.add_argument("--seed", type=int, default=1000 if name == "evaluate" else 0)
+        p.add_argument("--glyph-heights", type=int, nargs="+", default=[32, 48, 72])
+    fit = sub.choices["fit"]
+    fit.add_argument("--out", required=True)
+    fit.add_argument("--quantile", type=float, default=0.005)
+    fit.add_argument("--margin", type=float, default=0.1)
+    ev = sub.choices["evaluate"]
+    ev.add_argument("--filter", help="fitted rule set (default: built-in)")
+    ev.add_argument("--backend")
+    ev.add_argument("--model")
+    ev.add_argument("--no-inference", action="store_true")
+    ev.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.labelled:
+        try:
+            pages = _directory_pages(args.labelled)
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+    else:
+        pages = _labelled_pages(args.pages, args.clutter, args.seed, args.glyph_heights)
+    if args.command == "fit":
+        pages = list(pages)
+        features = np.concatenate([box_features(boxes, crops) for boxes, crops, _ in pages])
+        is_glyph = np.concatenate([labels for _, _, labels in pages])
+        noise_filter = NoiseFilter.fit(features, is_glyph, args.quantile, args.margin)
+        noise_filter.save(args.out)
+        print(format_report(evaluate(noise_filter, pages)))
+        return 0
+
+    noise_filter = NoiseFilter.load(args.filter) if args.filter else DEFAULT_NOISE_FILTER
+    model = None
+    if not args.no_inference:
+        from .backends import load_backend
+
+        try:
+            model = load_backend(args.backend, args.model)
+        except Exception as e:
+            print(f"brahmilens.noise: inference timing skipped ({e})", file=sys.stderr)
+    report = evaluate(noise_filter, pages, model)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
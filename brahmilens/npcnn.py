@@ -0,0 +1,366 @@
+"""TensorFlow-free forward pass of the glyph CNN in vectorised NumPy.
+
+    python -m brahmilens.convert export --npz            # once, with TensorFlow
+    BRAHMILENS_BACKEND=numpy streamlit run app.py        # then without it
+
+``export_npz`` walks the Keras layers once and writes an ``.npz`` holding a
+JSON op list plus the weights. Batch norm is folded into the neighbouring
+conv / dense weights where that is exact (into the layer before it when no
+activation sits in between, otherwise into the next linear layer through
+max-pooling and flatten), and kept as a per-channel affine op only where it
+is not. ``NumpyCNN`` runs convolutions as im2col + GEMM. Activations live
+in per-op buffers, allocated for the largest batch seen so far and reused
+for every later one. Weights are memory-mapped straight from the (uncompressed)
+``.npz`` when stored in the compute dtype, so loading a second model, e.g.
+during a hot swap, does not copy its weights onto the heap.
+"""
+import json
+import os
+import struct
+import threading
+import zipfile
+
+import numpy as np
+
+from .config import EMBED_DIM
+
+ACTIVATIONS = ("linear", "relu", "softmax")
+
+
+# --------------------------------------------------
+# EXPORT (needs TensorFlow, once)
+# --------------------------------------------------
+def _activation(layer):
+    name = getattr(layer, "activation", None)
+    name = "linear" if name is None else name.__name__
+    if name not in ACTIVATIONS:
+        raise ValueError(f"{layer.name}: unsupported activation {name!r}")
+    return name
+
+
+def _bn_affine(layer):
+    # Inference-mode batch norm as a per-channel (scale, shift).
+    weights = [np.asarray(w, dtype=np.float64) for w in layer.get_weights()]
+    channels = weights[-1].shape[0]
+    gamma = weights.pop(0) if layer.scale else np.ones(channels)
+    beta = weights.pop(0) if layer.center else np.zeros(channels)
+    mean, var = weights
+    scale = gamma / np.sqrt(var + layer.epsilon)
+    return scale, beta - mean * scale
+
+
+def export_npz(keras_model, path, dtype="float32"):
+    """Write ``keras_model`` as an op list + weights ``.npz`` for ``NumpyCNN``."""
+    import tensorflow as tf
+
+    L = tf.keras.layers
+    ops, arrays = [], {}
+    pending = None            # (scale, shift) of a batch norm not folded yet
+    embedding_set = False
+
+    def add(array):
+        index = len(arrays)
+        arrays[f"a{index}"] = array
+        return index
+
+    def materialise():
+        nonlocal pending
+        if pending is not None:
+            ops.append({"op": "affine", "scale": add(pending[0]), "shift": add(pending[1])})
+            pending = None
+
+    def linear(kind, kernel, bias, act, **extra):
+        ops.append({"op": kind, "w": add(kernel), "b": add(bias), "act": act, **extra})
+
+    for layer in keras_model.layers:
+        if isinstance(layer, (L.InputLayer, L.Dropout)):
+            continue
+        if isinstance(layer, L.BatchNormalization):
+            scale, shift = _bn_affine(layer)
+            last = ops[-1] if ops else None
+            if pending is None and last and last["op"] in ("conv", "dense") and last["act"] == "linear":
+                # Conv/Dense -> BN: scale the output channels.
+                w, b = arrays[f"a{last['w']}"], arrays[f"a{last['b']}"]
+                arrays[f"a{last['w']}"] = w * scale
+                arrays[f"a{last['b']}"] = b * scale + shift
+            else:
+                materialise()
+                pending = (scale, shift)
+            continue
+        if isinstance(layer, (L.Activation, L.ReLU, L.Softmax)):
+            act = "relu" if isinstance(layer, L.ReLU) else "softmax" if isinstance(layer, L.Softmax) else _activation(layer)
+            materialise()
+            if ops and ops[-1].get("act") == "linear":
+                ops[-1]["act"] = act
+            else:
+                ops.append({"op": "act", "act": act})
+            continue
+        if isinstance(layer, L.MaxPooling2D):
+            if pending is not None and (pending[0] <= 0).any():
+                materialise()   # max does not commute with a negative scale
+            pool, strides = layer.pool_size, layer.strides or layer.pool_size
+            if tuple(pool) != tuple(strides) or layer.padding != "valid":
+                raise ValueError(f"{layer.name}: only non-overlapping valid max-pooling is supported")
+            ops.append({"op": "maxpool", "size": list(pool)})
+            continue
+        if isinstance(layer, L.Flatten):
+            if pending is not None:
+                # Channels-last flatten: the channel index cycles fastest.
+                positions = int(np.prod(layer.input.shape[1:-1]))
+                pending = (np.tile(pending[0], positions), np.tile(pending[1], positions))
+            ops.append({"op": "flatten"})
+            continue
+        if isinstance(layer, L.Conv2D):
+            if tuple(layer.strides) != (1, 1) or tuple(layer.dilation_rate) != (1, 1) or layer.groups != 1:
+                raise ValueError(f"{layer.name}: only stride-1, undilated convolutions are supported")
+            kernel, bias = layer.get_weights() if layer.use_bias else (layer.get_weights()[0], None)
+            kernel = np.asarray(kernel, dtype=np.float64)
+            bias = np.zeros(kernel.shape[-1]) if bias is None else np.asarray(bias, dtype=np.float64)
+            if pending is not None and layer.padding == "valid":
+                # BN -> Conv: scale the input channels; the shift becomes a bias term.
+                bias = bias + np.einsum("hwio,i->o", kernel, pending[1])
+                kernel = kernel * pending[0][:, None]
+                pending = None
+            materialise()
+            linear("conv", kernel, bias, _activation(layer), pad=layer.padding)
+            continue
+        if isinstance(layer, L.Dense):
+            kernel, bias = layer.get_weights() if layer.use_bias else (layer.get_weights()[0], None)
+            kernel = np.asarray(kernel, dtype=np.float64)
+            bias = np.zeros(kernel.shape[-1]) if bias is None else np.asarray(bias, dtype=np.float64)
+            if pending is not None:
+                bias = bias + pending[1] @ kernel
+                kernel = kernel * pending[0][:, None]
+                pending = None
+            linear("dense", kernel, bias, _activation(layer))
+            continue
+        raise ValueError(f"{layer.name}: unsupported layer type {type(layer).__name__}")
+    materialise()
+
+    # The last EMBED_DIM-unit dense layer before the classifier is the embedding.
+    for op in reversed(ops[:-1]):
+        if op["op"] == "dense" and arrays[f"a{op['b']}"].shape[0] == EMBED_DIM:
+            op["embedding"] = embedding_set = True
+            break
+    arrays = {k: v.astype(dtype) for k, v in arrays.items()}
+    spec = {"input": list(keras_model.input_shape[1:]), "ops": ops, "embedding": embedding_set}
+    # Written aside and renamed: a running NumpyCNN may have the old file mapped.
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, spec=np.array(json.dumps(spec)), **arrays)
+    os.replace(tmp, path)
+    return path
+
+
+# --------------------------------------------------
+# INFERENCE
+# --------------------------------------------------
+def _map_npz(path):
+    """Read-only memory maps of the arrays in an ``.npz``; compressed members are read normally."""
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            name = info.filename[:-len(".npy")] if info.filename.endswith(".npy") else info.filename
+            if info.compress_type != zipfile.ZIP_STORED:
+                with archive.open(info) as member:
+                    arrays[name] = np.lib.format.read_array(member)
+                continue
+            # The member's data follows its local header (30 bytes + name + extra field).
+            f.seek(info.header_offset + 26)
+            name_len, extra_len = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_len + extra_len)
+            version = np.lib.format.read_magic(f)
+            read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else \
+                np.lib.format.read_array_header_2_0
+            shape, fortran, dtype = read_header(f)
+            if dtype.hasobject or not shape or 0 in shape:
+                f.seek(info.header_offset + 30 + name_len + extra_len)
+                arrays[name] = np.lib.format.read_array(f)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=f.tell(), shape=shape,
+                                         order="F" if fortran else "C")
+    return arrays
+
+
+class NumpyCNN:
+    """Forward pass of an ``export_npz`` file.
+
+    ``dtype`` is the compute precision. float16 halves weight and activation
+    memory but NumPy has no float16 BLAS, so float32 is much faster.
+    """
+
+    def __init__(self, path, dtype="float32"):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        data = _map_npz(path)
+        spec = json.loads(str(data.pop("spec")[()]))
+        # astype(copy=False) keeps the memory map when the stored dtype is the compute dtype.
+        weights = {k: v.astype(self.dtype, copy=False) for k, v in data.items()}
+        self.input_shape = tuple(spec["input"])
+        self.has_embedding = spec["embedding"]
+        self.ops = []
+        shape = self.input_shape
+        for op in spec["ops"]:
+            op = dict(op)
+            kind = op["op"]
+            if kind in ("conv", "dense"):
+                kernel = weights[f"a{op.pop('w')}"]
+                op["bias"] = weights[f"a{op.pop('b')}"]
+                if kind == "conv":
+                    kh, kw, cin, cout = kernel.shape
+                    op["k"] = (kh, kw)
+                    if op["pad"] == "same":
+                        # Like Keras, an even kernel gets the extra row / column at the bottom / right.
+                        op["pad"] = ((kh - 1) // 2, (kw - 1) // 2)
+                        op["padded_shape"] = (shape[0] + kh - 1, shape[1] + kw - 1)
+                    else:
+                        op["pad"], op["padded_shape"] = (0, 0), tuple(shape[:2])
+                    # im2col columns are ordered (kh, kw, cin), matching the kernel layout.
+                    op["kernel"] = np.ascontiguousarray(kernel.reshape(kh * kw * cin, cout))
+                    h = op["padded_shape"][0] - kh + 1
+                    w = op["padded_shape"][1] - kw + 1
+                    op["in_shape"], shape = shape, (h, w, cout)
+                else:
+                    op["kernel"] = np.ascontiguousarray(kernel)
+                    shape = (kernel.shape[1],)
+            elif kind == "affine":
+                op["scale"] = weights[f"a{op['scale']}"]
+                op["shift"] = weights[f"a{op['shift']}"]
+            elif kind == "maxpool":
+                ph, pw = op["size"]
+                shape = (shape[0] // ph, shape[1] // pw, shape[2])
+            elif kind == "flatten":
+                shape = (int(np.prod(shape)),)
+            op["shape"] = shape
+            self.ops.append(op)
+        self.num_classes = shape[-1]
+        self.embedding_shape = next((op["shape"] for op in self.ops if op.get("embedding")), None)
+        self._capacity = 0
+        self._buffers = []
+        self._lock = threading.Lock()
+
+    def _allocate(self, n):
+        # One output buffer per op plus the im2col / padding scratch of convs.
+        buffers = []
+        for op in self.ops:
+            entry = {}
+            if op["op"] == "conv":
+                (h, w, cout), (kh, kw) = op["shape"], op["k"]
+                cin = op["in_shape"][2]
+                entry["col"] = np.empty((n, h, w, kh, kw, cin), dtype=self.dtype)
+                if op["padded_shape"] != op["in_shape"][:2]:
+                    entry["padded"] = np.zeros((n,) + op["padded_shape"] + (cin,), dtype=self.dtype)
+            if op["op"] in ("conv", "dense", "maxpool"):
+                entry["out"] = np.empty((n,) + op["shape"], dtype=self.dtype)
+            buffers.append(entry)
+        self._buffers = buffers
+        self._capacity = n
+
+    @staticmethod
+    def _act(x, act):
+        if act == "relu":
+            np.maximum(x, 0, out=x)
+        elif act == "softmax":
+            x -= x.max(axis=-1, keepdims=True)
+            np.exp(x, out=x)
+            x /= x.sum(axis=-1, keepdims=True)
+        return x
+
+    def _conv(self, x, op, buf, n, act):
+        kh, kw = op["k"]
+        h, w, cout = op["shape"]
+        if "padded" in buf:
+            ph, pw = op["pad"]
+            padded = buf["padded"][:n]
+            padded[:, ph:ph + x.shape[1], pw:pw + x.shape[2]] = x
+            x = padded
+        col = buf["col"][:n]
+        for i in range(kh):
+            for j in range(kw):
+                col[:, :, :, i, j, :] = x[:, i:i + h, j:j + w, :]
+        out = buf["out"][:n]
+        np.matmul(col.reshape(n * h * w, -1), op["kernel"], out=out.reshape(n * h * w, cout))
+        out += op["bias"]
+        return self._act(out, act)
+
+    def _forward(self, batch, logits=False):
+        n = len(batch)
+        if n == 0:
+            embedding = np.zeros((0,) + self.embedding_shape, dtype=self.dtype) if self.has_embedding else None
+            return np.zeros((0, self.num_classes), dtype=np.float32), embedding
+        if n > self._capacity:
+            self._allocate(n)
+        x = np.asarray(batch, dtype=self.dtype).reshape((n,) + self.input_shape)
+        owned = False   # x may still be the caller's array
+        embedding = None
+        last = len(self.ops) - 1
+        for index, (op, buf) in enumerate(zip(self.ops, self._buffers)):
+            kind = op["op"]
+            act = op.get("act")
+            if logits and index == last and act == "softmax":
+                act = "linear"
+            if kind == "conv":
+                x = self._conv(x, op, buf, n, act)
+            elif kind == "dense":
+                out = buf["out"][:n]
+                np.matmul(x, op["kernel"], out=out)
+                out += op["bias"]
+                x = self._act(out, act)
+                if op.get("embedding"):
+                    embedding = x.copy()
+            elif kind == "maxpool":
+                (ph, pw), (h, w, _) = op["size"], op["shape"]
+                out = buf["out"][:n]
+                x = x[:, :h * ph, :w * pw]
+                np.copyto(out, x[:, 0::ph, 0::pw])
+                for i in range(ph):
+                    for j in range(pw):
+                        if i or j:
+                            np.maximum(out, x[:, i::ph, j::pw], out=out)
+                x = out
+            elif kind == "flatten":
+                x = x.reshape(n, -1)
+                continue
+            elif kind == "affine":
+                x = x * op["scale"] + op["shift"]
+            elif kind == "act":
+                x = self._act(x if owned else x.copy(), act)
+            owned = True
+        return x.astype(np.float32), embedding
+
+    def predict(self, batch):
+        """Softmax probabilities for a (N, 64, 64, 1) float batch."""
+        with self._lock:
+            return self._forward(batch)[0]
+
+    def logits(self, batch):
+        """Pre-softmax outputs of the last layer."""
+        with self._lock:
+            return self._forward(batch, logits=True)[0]
+
+    def predict_embeddings(self, batch):
+        if not self.has_embedding:
+            raise ValueError(f"{self.path} has no {EMBED_DIM}-unit embedding layer")
+        with self._lock:
+            probs, embeddings = self._forward(batch)
+            return probs, embeddings.astype(np.float32)
+
+
+def compare_keras(keras_model, net, crops):
+    """Max absolute logit and probability differences against the Keras model."""
+    import tensorflow as tf
+
+    probs = keras_model.predict(crops, verbose=0)
+    last = keras_model.layers[-1]
+    # Logits: the final layer's pre-activation, recomputed from its input.
+    logits = tf.keras.Model(keras_model.inputs, last.input).predict(crops, verbose=0)
+    if isinstance(last, tf.keras.layers.Dense):
+        kernel, bias = last.get_weights()
+        logits = logits @ kernel + bias
+    ours = net.logits(crops)
+    return {
+        "glyphs": len(crops),
+        "max_logit_diff": float(np.abs(ours - logits).max()),
+        "max_prob_diff": float(np.abs(net.predict(crops) - probs).max()),
+        "top1_agreement": float((ours.argmax(axis=1) == probs.argmax(axis=1)).mean()),
+    }
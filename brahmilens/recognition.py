@@ -0,0 +1,72 @@
+import cv2
+import numpy as np
+
+from .config import IMG_SIZE, PREDICT_BATCH_SIZE, WORD_GAP
+from .metrics import METRICS
+
+SIGNATURE = 16
+
+
+def prepare_crops(boxes, thresh):
+    """Resize every box of ``thresh`` into one (N, 64, 64, 1) float32 batch."""
+    with METRICS.stage("crop_resize"):
+        batch = np.empty((len(boxes), IMG_SIZE, IMG_SIZE, 1), dtype="float32")
+        for i, (x, y, w, h) in enumerate(boxes):
+            batch[i, :, :, 0] = cv2.resize(thresh[y:y+h, x:x+w], (IMG_SIZE, IMG_SIZE))
+        batch /= 255.0
+        return batch
+
+
+def signatures(crops):
+    """Block-mean 16x16 thumbnails of a (N, 64, 64, 1) crop batch, for comparing glyph appearance."""
+    n, size = len(crops), crops.shape[1]
+    f = size // SIGNATURE
+    return crops[..., 0].reshape(n, SIGNATURE, f, SIGNATURE, f).mean(axis=(2, 4))
+
+
+def predict_batched(model, batch, batch_size=PREDICT_BATCH_SIZE, embeddings=False):
+    """Probabilities for ``batch``; with ``embeddings`` also the bottleneck activations."""
+    if len(batch) == 0:
+        empty = np.empty((0, 0), dtype="float32")
+        return (empty, empty) if embeddings else empty
+    chunks = []
+    with METRICS.stage("inference"):
+        for start in range(0, len(batch), batch_size):
+            chunk = batch[start:start + batch_size]
+            METRICS.observe("batch_size", len(chunk))
+            chunks.append(model.predict_embeddings(chunk) if embeddings else model.predict(chunk))
+    if embeddings:
+        return np.concatenate([c[0] for c in chunks]), np.concatenate([c[1] for c in chunks])
+    return np.concatenate(chunks)
+
+
+def build_label_table(index_to_label):
+    return np.array([index_to_label[i] for i in range(len(index_to_label))], dtype=object)
+
+
+def assemble_sentence(boxes, labels, word_gap=WORD_GAP):
+    sentence = ""
+    prev_end = None
+    for (x, y, w, h), label in zip(boxes, labels):
+        if prev_end is not None and x - prev_end > word_gap:
+            sentence += " "
+        sentence += label
+        prev_end = x + w
+    return sentence
+
+
+def word_breaks(boxes, word_gap=WORD_GAP):
+    """``breaks[i]`` is True when a word gap follows box ``i`` on its line."""
+    breaks = np.zeros(len(boxes), dtype=bool)
+    for i in range(len(boxes) - 1):
+        x, _, w, _ = boxes[i]
+        breaks[i] = boxes[i + 1][0] - (x + w) > word_gap
+    return breaks
+
+
+def assemble_lines(boxes, labels, lines, word_gap=WORD_GAP):
+    """One sentence per text line; ``lines`` holds index lists into ``boxes``."""
+    return [
+        assemble_sentence([boxes[i] for i in line], [labels[i] for i in line], word_gap)
+        for line in lines
+    ]
@@ -0,0 +1,367 @@
+"""Versioned model registry with background hot swap and A/B routing.
+
+    python -m brahmilens.registry publish models/ v2 --model brahmi_char_369_v2.h5 --activate
+    python -m brahmilens.registry candidate models/ v3 --fraction 0.1
+    python -m brahmilens.registry list models/
+
+A registry is a directory of immutable versions plus two pointer files:
+
+    CURRENT           name of the version serving traffic
+    CANDIDATE.json    {"version": ..., "fraction": ...} for A/B tests (optional)
+    <version>/
+        manifest.json          backend, label file, sha256 of every file, metadata
+        index_to_label.json
+        architecture.json      keras: the graph ...
+        weights/00000.npy ...  ... and one .npy per tensor
+        model.onnx | model.tflite | model.npz
+
+Versions are staged in a temporary directory and renamed into place, and the
+pointer files are replaced atomically, so readers never see half a version.
+Keras and NumPy weights are memory-mapped when a version loads, so a swap
+does not read a second full copy of the weights onto the heap.
+``HotSwapEngine`` watches the pointers, loads and warms a new version on
+its own thread, switches traffic with a reference swap, and drops the old
+engine; in-flight reads finish on the engine they started with.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+
+from .cache import file_sha256
+
+log = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+LABELS = "index_to_label.json"
+# Single-file model of each non-Keras backend inside a version directory
+MODEL_FILES = {"onnx": "model.onnx", "tflite": "model.tflite", "numpy": "model.npz"}
+
+
+def read_manifest(version_dir):
+    """The manifest of a registry version directory, or None for anything else."""
+    path = os.path.join(version_dir, MANIFEST)
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _export_keras(model_path, out_dir):
+    # Graph as JSON and weights as plain .npy files, readable without h5py.
+    import numpy as np
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    with open(os.path.join(out_dir, "architecture.json"), "w", encoding="utf-8") as f:
+        f.write(model.to_json())
+    os.makedirs(os.path.join(out_dir, "weights"))
+    for i, weight in enumerate(model.get_weights()):
+        np.save(os.path.join(out_dir, "weights", f"{i:05d}.npy"), weight)
+
+
+class ModelRegistry:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(v for v in os.listdir(self.root) if read_manifest(self.path(v)) is not None)
+
+    def manifest(self, version):
+        manifest = read_manifest(self.path(version))
+        if manifest is None:
+            raise KeyError(f"no model version {version!r} in {self.root}")
+        return manifest
+
+    # ---------------- pointers ----------------
+    def current(self):
+        try:
+            with open(os.path.join(self.root, "CURRENT"), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def activate(self, version):
+        self.verify(version)
+        _write_atomic(os.path.join(self.root, "CURRENT"), version + "\n")
+
+    def candidate(self):
+        """``(version, fraction)`` of the A/B candidate, or None."""
+        try:
+            with open(os.path.join(self.root, "CANDIDATE.json"), encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        return data["version"], float(data["fraction"])
+
+    def set_candidate(self, version, fraction):
+        if not 0.0 < fraction < 1.0:
+            raise ValueError("candidate fraction must be between 0 and 1")
+        self.verify(version)
+        _write_atomic(os.path.join(self.root, "CANDIDATE.json"),
+                      json.dumps({"version": version, "fraction": fraction}))
+
+    def clear_candidate(self):
+        try:
+            os.remove(os.path.join(self.root, "CANDIDATE.json"))
+        except FileNotFoundError:
+            pass
+
+    # ---------------- versions ----------------
+    def publish(self, version, model_path, label_path, backend="keras", metadata=None):
+        """Copy a model into the registry as ``version``; returns its manifest."""
+        if os.path.exists(self.path(version)):
+            raise FileExistsError(f"model version {version!r} already exists")
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f".staging-{version}-{os.getpid()}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            if backend == "keras":
+                _export_keras(model_path, staging)
+            else:
+                shutil.copyfile(model_path, os.path.join(staging, MODEL_FILES[backend]))
+            shutil.copyfile(label_path, os.path.join(staging, LABELS))
+            files = {}
+            for base, _, names in os.walk(staging):
+                for name in names:
+                    full = os.path.join(base, name)
+                    files[os.path.relpath(full, staging).replace(os.sep, "/")] = file_sha256(full)
+            manifest = {
+                "version": version,
+                "backend": backend,
+                "labels": LABELS,
+                "files": dict(sorted(files.items())),
+                "source": os.path.basename(model_path),
+                "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "metadata": metadata or {},
+            }
+            with open(os.path.join(staging, MANIFEST), "w", encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+            os.rename(staging, self.path(version))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return manifest
+
+    def verify(self, version):
+        """Raise ``ValueError`` if any file of ``version`` does not match its checksum."""
+        manifest = self.manifest(version)
+        for name, expected in manifest["files"].items():
+            path = os.path.join(self.path(version), name)
+            if not os.path.isfile(path) or file_sha256(path) != expected:
+                raise ValueError(f"model version {version!r}: {name} is missing or corrupt")
+        return manifest
+
+
+def manifest_hash(version_dir):
+    """Stable identity of a registry version (its manifest lists every file's checksum)."""
+    return file_sha256(os.path.join(version_dir, MANIFEST))
+
+
+class HotSwapEngine:
+    """``OCREngine`` stand-in that follows a registry's CURRENT / CANDIDATE pointers.
+
+    Attribute access is forwarded to the active engine, so it can be used
+    wherever an engine is expected; ``read`` and ``route`` additionally send
+    ``fraction`` of the requests to the candidate version.
+    """
+
+    def __init__(self, registry, poll_s=5.0, factory=None, **engine_kwargs):
+        if factory is None:
+            from .startup import load_engine as factory
+        self.registry = registry
+        self.poll_s = poll_s
+        self._factory = factory
+        self._engine_kwargs = engine_kwargs
+        self._lock = threading.Lock()
+        self._active = None       # (version, engine)
+        self._candidate = None    # (version, engine, fraction)
+        self._failed = set()
+        self._stop = threading.Event()
+        self._watcher = None
+        self.stats = {}
+
+    def _load(self, version):
+        manifest = self.registry.verify(version)
+        log.info("brahmilens: loading model %s", version)
+        return self._factory(backend=manifest["backend"], model_path=self.registry.path(version),
+                             **self._engine_kwargs)
+
+    def start(self):
+        """Load the current version now, then follow the registry on a daemon thread."""
+        version = self.registry.current()
+        if version is None:
+            raise RuntimeError(f"no CURRENT model in {self.registry.root}")
+        self._active = (version, self._load(version))
+        self.refresh()
+        self._watcher = threading.Thread(target=self._watch, name="brahmilens-registry", daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_s):
+            try:
+                self.refresh()
+            except Exception:
+                log.exception("brahmilens: registry refresh failed")
+
+    def refresh(self):
+        """Load and switch to whatever the pointers name now (blocking; normally on the watcher)."""
+        current = self.registry.current()
+        wanted = self.registry.candidate()
+        # A failed version is retried once the pointers have moved off it and back.
+        self._failed &= {current, wanted and wanted[0]}
+        if current and current != self._active[0] and current not in self._failed:
+            candidate = self._candidate
+            try:
+                engine = candidate[1] if candidate and candidate[0] == current else self._load(current)
+            except Exception:
+                self._failed.add(current)
+                raise
+            with self._lock:
+                old, self._active = self._active, (current, engine)
+                if candidate and candidate[0] == current:
+                    self._candidate = None
+            log.info("brahmilens: switched model %s -> %s", old[0], current)
+            del old  # in-flight reads keep their own reference until they finish
+
+        if wanted is None or wanted[0] == self._active[0]:
+            with self._lock:
+                self._candidate = None
+        elif self._candidate and self._candidate[0] == wanted[0]:
+            with self._lock:
+                self._candidate = (wanted[0], self._candidate[1], wanted[1])
+        elif wanted[0] not in self._failed:
+            try:
+                engine = self._load(wanted[0])
+            except Exception:
+                self._failed.add(wanted[0])
+                raise
+            with self._lock:
+                self._candidate = (wanted[0], engine, wanted[1])
+
+    # ---------------- routing ----------------
+    @property
+    def version(self):
+        return self._active[0]
+
+    def route(self, key=None):
+        """``(version, engine)`` for one request; ``key`` makes the A/B assignment sticky.
+
+        Callers that make several engine calls per request (``LiveReader``,
+        ``IncrementalPipeline``) route once and use the returned engine, so a
+        request never mixes versions across a swap.
+        """
+        with self._lock:
+            active, candidate = self._active, self._candidate
+        if candidate is not None:
+            draw = random.random() if key is None else int(hashlib.sha1(str(key).encode()).hexdigest()[:8], 16) / 2**32
+            if draw < candidate[2]:
+                return candidate[0], candidate[1]
+        return active
+
+    def read(self, image, key=None):
+        version, engine = self.route(key)
+        start = time.perf_counter()
+        result = engine.read(image)
+        elapsed = time.perf_counter() - start
+        result.model_version = version
+        with self._lock:
+            entry = self.stats.setdefault(version, {"requests": 0, "seconds": 0.0, "glyphs": 0})
+            entry["requests"] += 1
+            entry["seconds"] += elapsed
+            entry["glyphs"] += len(result.boxes)
+        return result
+
+    def __getattr__(self, name):
+        if name.startswith("_") or self._active is None:
+            raise AttributeError(name)
+        return getattr(self._active[1], name)
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+def main(argv=None):
+    from .config import LABEL_PATH
+
+    parser = argparse.ArgumentParser(prog="brahmilens.registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="add a model version")
+    pub.add_argument("root")
+    pub.add_argument("version")
+    pub.add_argument("--model", required=True)
+    pub.add_argument("--labels", default=LABEL_PATH)
+    pub.add_argument("--backend", choices=["keras", *MODEL_FILES], default="keras")
+    pub.add_argument("--meta", action="append", default=[], metavar="KEY=VALUE")
+    pub.add_argument("--activate", action="store_true")
+    act = sub.add_parser("activate", help="point CURRENT at a version")
+    act.add_argument("root")
+    act.add_argument("version")
+    cand = sub.add_parser("candidate", help="route a fraction of traffic to a version (0 clears)")
+    cand.add_argument("root")
+    cand.add_argument("version", nargs="?")
+    cand.add_argument("--fraction", type=float, default=0.1)
+    for name in ("list", "verify"):
+        p = sub.add_parser(name)
+        p.add_argument("root")
+        p.add_argument("version", nargs="?")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        metadata = dict(item.split("=", 1) for item in args.meta)
+        manifest = registry.publish(args.version, args.model, args.labels, args.backend, metadata)
+        if args.activate:
+            registry.activate(args.version)
+        print(json.dumps(manifest, indent=2))
+    elif args.command == "activate":
+        registry.activate(args.version)
+    elif args.command == "candidate":
+        if args.version is None or args.fraction <= 0:
+            registry.clear_candidate()
+        else:
+            registry.set_candidate(args.version, args.fraction)
+    elif args.command == "verify":
+        for version in [args.version] if args.version else registry.versions():
+            try:
+                registry.verify(version)
+                print(f"{version}\tok")
+            except ValueError as e:
+                print(f"{version}\t{e}")
+                return 1
+    else:
+        current, candidate = registry.current(), registry.candidate()
+        for version in registry.versions():
+            m = registry.manifest(version)
+            mark = "*" if version == current else ("~" if candidate and version == candidate[0] else " ")
+            print(f"{mark} {version}\t{m['backend']}\t{m['created']}\t{json.dumps(m['metadata'])}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import json
+import os
+
+from .backends import load_backend
+from .config import LABEL_PATH
+from .registry import MODEL_FILES, read_manifest
+
+
+def load_labels(label_path=LABEL_PATH):
+    with open(label_path, encoding="utf-8") as f:
+        labels = json.load(f)
+    return {int(k): v for k, v in labels.items()}
+
+
+def load_resources(model_path=None, label_path=LABEL_PATH, backend=None, **backend_kwargs):
+    """Return the configured inference backend and the index-to-label map.
+
+    ``model_path`` may also be a model registry version directory, which
+    brings its own backend and labels.
+    """
+    manifest = read_manifest(model_path) if model_path and os.path.isdir(model_path) else None
+    if manifest is not None:
+        backend = manifest["backend"]
+        label_path = os.path.join(model_path, manifest["labels"])
+        if backend != "keras":
+            model_path = os.path.join(model_path, MODEL_FILES[backend])
+    return load_backend(backend, model_path, **backend_kwargs), load_labels(label_path)
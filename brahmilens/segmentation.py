@@ -0,0 +1,79 @@
+from dataclasses import dataclass, replace
+
+import cv2
+
+from .metrics import METRICS
+
+
+@dataclass(frozen=True)
+class SegmentationParams:
+    block_size: int = 15
+    c: int = 8
+    kernel_size: int = 2
+    min_height: int = 15
+    min_width: int = 8
+    # "contours" (findContours) or "components" (see components.py)
+    method: str = "contours"
+    # components only: smallest fragment kept, and how far (as a fraction of
+    # the median glyph height) a fragment may sit from its host glyph
+    min_fragment_area: int = 6
+    attach_radius: float = 0.6
+
+
+DEFAULT_SEGMENTATION = SegmentationParams()
+
+
+def scaled_params(params, scale):
+    """``params`` for a page decoded at ``1 / scale`` of its full size.
+
+    Pixel-unit settings shrink with the page, so a reduced decode keeps the
+    same glyphs as a full-size one. A reduced box also covers the partial
+    pixels at its edges, about half a pixel more than the ink it holds, so
+    the size limits are raised by that much; otherwise fragments just under
+    the limit at full size pass it once reduced.
+    """
+    if scale == 1.0:
+        return params
+    return replace(
+        params,
+        block_size=max(3, int(round(params.block_size / scale)) | 1),
+        kernel_size=max(1, int(round(params.kernel_size / scale))),
+        min_height=params.min_height / scale + 0.5,
+        min_width=params.min_width / scale + 0.5,
+        min_fragment_area=params.min_fragment_area / scale ** 2,
+    )
+
+
+def binarize(image, params=DEFAULT_SEGMENTATION):
+    with METRICS.stage("threshold"):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        thresh = cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY_INV, params.block_size, params.c
+        )
+    with METRICS.stage("morphology"):
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (params.kernel_size, params.kernel_size))
+        return cv2.morphologyEx(thresh, cv2.MORPH_OPEN, kernel)
+
+
+def contour_boxes(thresh):
+    """Bounding rects of every external contour, before any size filtering."""
+    with METRICS.stage("contours"):
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return [cv2.boundingRect(c) for c in contours]
+
+
+def filter_boxes(rects, params=DEFAULT_SEGMENTATION):
+    """Keep rects passing the size filter, sorted left to right."""
+    boxes = [(x, y, w, h) for x, y, w, h in rects if h > params.min_height and w > params.min_width]
+    return sorted(boxes, key=lambda b: b[0])
+
+
+def find_boxes(thresh, params=DEFAULT_SEGMENTATION):
+    return filter_boxes(contour_boxes(thresh), params)
+
+
+def segment_characters(image, params=DEFAULT_SEGMENTATION):
+    """Return glyph boxes sorted left to right and the binarised page."""
+    thresh = binarize(image, params)
+    return find_boxes(thresh, params), thresh
@@ -0,0 +1,251 @@
+"""Local HTTP inference server with cross-request micro-batching.
+
+    python -m brahmilens.server --port 8080
+
+Endpoints:
+    GET  /health      liveness, queue depth and batching counters
+    GET  /metrics     Prometheus text exposition (see metrics.py)
+    POST /ocr         raw image bytes -> OCR result JSON
+    POST /recognize   .npy (N, 64, 64, 1) float32 crops -> labels + probabilities
+
+Segmentation runs on a thread pool; crops from concurrent requests share
+inference batches through ``MicroBatcher``. When the queue is full, requests
+get 503 with ``Retry-After``.
+"""
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+
+from .batching import MicroBatcher, QueueFull
+from .config import IMG_SIZE, PREDICT_BATCH_SIZE
+from .metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 64 * 2**20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class OCRServer:
+    def __init__(self, engine, host="127.0.0.1", port=8080, max_batch_size=PREDICT_BATCH_SIZE,
+                 max_wait_ms=5.0, max_queue=4096, workers=None):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        # engine.predict, not the bare model: batches go through the crop cache
+        # (and hot-swap routing) exactly like in-process reads.
+        self.batcher = MicroBatcher(engine.predict, max_batch_size, max_wait_ms, max_queue)
+        self.pool = ThreadPoolExecutor(max_workers=workers or os.cpu_count(), thread_name_prefix="brahmilens-seg")
+        self.requests = 0
+        self._server = None
+
+    # ---------------- lifecycle ----------------
+    async def start(self):
+        """Bind and start serving; returns the bound port (useful with port=0)."""
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.batcher.stop()
+        self.pool.shutdown(wait=False)
+
+    async def serve_forever(self):
+        await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    # ---------------- HTTP plumbing ----------------
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError):
+                    break
+                if not request_line.strip():
+                    break
+                status, payload, headers, keep_alive = await self._respond(request_line, reader)
+                if isinstance(payload, str):
+                    body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                head = [
+                    f"HTTP/1.1 {status.value} {status.phrase}",
+                    f"Content-Type: {content_type}",
+                    f"Content-Length: {len(body)}",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ] + [f"{k}: {v}" for k, v in headers.items()]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line, reader):
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+
+        try:
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"body exceeds {MAX_BODY_BYTES} bytes")
+            body = await reader.readexactly(length) if length else b""
+            return HTTPStatus.OK, await self._route(method, path.split("?", 1)[0], body), {}, keep_alive
+        except HTTPError as e:
+            return e.status, {"error": str(e)}, {}, keep_alive
+        except QueueFull as e:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": f"overloaded: {e}"}, {"Retry-After": "1"}, keep_alive
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}, {}, False
+        except Exception:
+            log.exception("brahmilens: %s failed", request_line.decode("latin-1").strip())
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal server error"}, {}, False
+
+    async def _route(self, method, path, body):
+        routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/metrics"): self.metrics,
+            ("POST", "/ocr"): self.ocr,
+            ("POST", "/recognize"): self.recognize,
+        }
+        handler = routes.get((method, path))
+        if handler is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"no route for {method} {path}")
+        self.requests += 1
+        return await handler(body)
+
+    # ---------------- endpoints ----------------
+    async def health(self, body):
+        return {
+            "status": "ok",
+            "requests": self.requests,
+            "queue_depth": self.batcher.depth,
+            "max_queue": self.batcher.max_queue,
+            **self.batcher.stats,
+        }
+
+    async def metrics(self, body):
+        return METRICS.render_prometheus()
+
+    def _prepare(self, body):
+        t0 = time.perf_counter()
+        try:
+            image, scale = self.engine.load(body)
+        except OSError as e:
+            raise ValueError(f"cannot decode image: {e}") from None
+        t1 = time.perf_counter()
+        key, hit = self.engine.lookup(image, scale)
+        if hit is not None:
+            return key, hit, None, None, (t1 - t0, 0.0)
+        boxes, crops = self.engine.prepare(image, scale)
+        return key, None, boxes, crops, (t1 - t0, time.perf_counter() - t1)
+
+    async def ocr(self, body):
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        key, result, boxes, crops, (decode_s, segment_s) = await loop.run_in_executor(self.pool, self._prepare, body)
+        queue_s = inference_s = 0.0
+        if result is None:
+            if len(crops):
+                probs, queue_s, inference_s = await self.batcher.submit(crops)
+            else:
+                probs = self.engine.predict(crops)
+            topk = self.engine.candidates(probs)
+            result = self.engine.store(key, self.engine.assemble(boxes, topk=topk))
+        return {
+            **result.to_dict(),
+            "cached": crops is None,
+            "timing_ms": {
+                "decode": decode_s * 1e3,
+                "segment": segment_s * 1e3,
+                "queue": queue_s * 1e3,
+                "inference": inference_s * 1e3,
+                "total": (time.perf_counter() - start) * 1e3,
+            },
+        }
+
+    async def recognize(self, body):
+        start = time.perf_counter()
+        try:
+            crops = np.load(io.BytesIO(body), allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"expected a .npy crop batch: {e}") from None
+        if crops.dtype.kind not in "fiu":
+            raise ValueError(f"expected numeric crops, got dtype {crops.dtype}")
+        crops = crops.astype("float32", copy=False)
+        if crops.ndim == 3:
+            crops = crops[..., None]
+        if crops.ndim != 4 or crops.shape[1:] != (IMG_SIZE, IMG_SIZE, 1):
+            raise ValueError(f"expected (N, {IMG_SIZE}, {IMG_SIZE}, 1) crops, got {crops.shape}")
+        probs, queue_s, inference_s = await self.batcher.submit(crops)
+        labels, top1 = self.engine.decode(probs)
+        return {
+            "labels": labels,
+            "probabilities": top1.tolist(),
+            "timing_ms": {
+                "queue": queue_s * 1e3,
+                "inference": inference_s * 1e3,
+                "total": (time.perf_counter() - start) * 1e3,
+            },
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--backend")
+    parser.add_argument("--model")
+    parser.add_argument("--max-batch-size", type=int, default=PREDICT_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-queue", type=int, default=4096, help="queued glyphs before answering 503")
+    parser.add_argument("--workers", type=int, help="segmentation threads")
+    parser.add_argument("--metrics", action="store_true", help="enable stage instrumentation for /metrics")
+    args = parser.parse_args(argv)
+
+    from .startup import load_engine
+
+    if args.metrics:
+        METRICS.enable()
+
+    engine = load_engine(args.backend, model_path=args.model)
+    print(f"brahmilens: {engine.startup_report.format()}")
+    server = OCRServer(engine, args.host, args.port, args.max_batch_size, args.max_wait_ms,
+                       args.max_queue, args.workers)
+    print(f"brahmilens: serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,333 @@
+"""Persistent nearest-neighbour index over glyph embeddings ("find similar glyphs").
+
+    python -m brahmilens.similarity add corpus.idx archive/ --recursive
+    python -m brahmilens.similarity query corpus.idx page.png --glyph 3
+
+An inverted-file (IVF) index: embeddings are L2-normalised and stored as
+float16, grouped by their nearest of ``nlist`` k-means centroids, so a query
+scores only the ``nprobe`` closest lists. On disk an index is a directory:
+
+    meta.json            dim, nlist, count, current generation
+    centroids.npy        (nlist, dim) float32
+    gen-<n>/vectors.f16  compacted vectors, grouped by list (memory-mapped)
+    gen-<n>/ids.i64      glyph id of each row
+    gen-<n>/offsets.npy  (nlist + 1) row offsets of each list
+    tail.f16, tail.i64   append-only inserts since the last compaction
+    records.jsonl/.off   optional per-glyph metadata and its byte offsets
+
+Inserts append to the tail, which is scanned exhaustively. Once the tail
+outgrows ``compact_ratio`` of the compacted part it is merged into a fresh
+generation, and ``meta.json`` is switched to that generation atomically.
+Centroids are trained when the first ``train_size`` vectors have arrived. The
+index has a single writer; readers only ever see complete generations. A
+compaction keeps the generation it replaced, so readers still mapping it are
+not left on deleted files; it is removed by the compaction after that.
+``meta.json`` is written last on every insert: tail rows and records past its
+``count`` are leftovers of a crashed insert and are cut off by the next one.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+
+import numpy as np
+
+from .config import EMBED_DIM
+
+ASSIGN_CHUNK = 65536
+
+
+def _normalise(vectors, dim):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    # A page without glyphs yields no embeddings; keep the (0, dim) shape.
+    vectors = vectors.reshape(len(vectors), -1) if vectors.size else vectors.reshape(0, dim)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _memmap(path, dtype, dim=None):
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    itemsize = np.dtype(dtype).itemsize * (dim or 1)
+    rows = size // itemsize
+    if rows == 0:
+        return np.empty((0, dim) if dim else 0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(rows, dim) if dim else (rows,))
+
+
+def _atomic_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def kmeans(vectors, k, iterations=20, seed=0):
+    """Spherical k-means; returns (k, dim) unit-length centroids."""
+    rng = np.random.default_rng(seed)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        assign = (vectors @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vectors)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        # Re-seed empty lists with random points so every list stays in use.
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = _normalise(sums, sums.shape[1])
+    return centroids
+
+
+class GlyphIndex:
+    """IVF index over float16 glyph embeddings; see the module docstring for the layout."""
+
+    def __init__(self, path, dim=EMBED_DIM, nlist=256, train_size=None, compact_ratio=0.25,
+                 min_compact=50_000):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_path = os.path.join(path, "meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"dim": dim, "nlist": nlist, "count": 0, "generation": 0, "compacted": 0}
+            _atomic_json(meta_path, self.meta)
+        self.dim = self.meta["dim"]
+        # Faiss' rule of thumb: about 40 training points per list.
+        self.train_size = train_size or 40 * self.meta["nlist"]
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        centroids = os.path.join(path, "centroids.npy")
+        self.centroids = np.load(centroids) if os.path.exists(centroids) else None
+        self._load_generation()
+
+    def _file(self, name, generation=None):
+        if generation is None:
+            return os.path.join(self.path, name)
+        return os.path.join(self.path, f"gen-{generation}", name)
+
+    def _load_generation(self):
+        gen = self.meta["generation"]
+        self.vectors = _memmap(self._file("vectors.f16", gen), np.float16, self.dim)
+        self.ids = _memmap(self._file("ids.i64", gen), np.int64)
+        offsets = self._file("offsets.npy", gen)
+        self.offsets = np.load(offsets) if os.path.exists(offsets) else None
+
+    def _tail(self):
+        vectors = _memmap(self._file("tail.f16"), np.float16, self.dim)
+        ids = _memmap(self._file("tail.i64"), np.int64)
+        n = min(len(vectors), len(ids))
+        # Rows merged by a compaction whose tail reset never happened, and rows
+        # of an insert that crashed before updating meta.json, are skipped.
+        keep = (ids[:n] >= self.meta["compacted"]) & (ids[:n] < self.meta["count"])
+        return vectors[:n][keep], ids[:n][keep]
+
+    def _truncate(self, name, size):
+        path = self._file(name)
+        if os.path.exists(path) and os.path.getsize(path) > size:
+            with open(path, "r+b") as f:
+                f.truncate(size)
+
+    def _repair(self):
+        """Cut off tail rows and records that meta.json does not count (a crashed insert)."""
+        count = self.meta["count"]
+        ids = _memmap(self._file("tail.i64"), np.int64)
+        rows = min(len(ids), len(_memmap(self._file("tail.f16"), np.float16, self.dim)))
+        # Tail ids only grow, so the counted rows are a prefix.
+        rows = int(np.searchsorted(ids[:rows], count))
+        del ids
+        self._truncate("tail.i64", rows * 8)
+        self._truncate("tail.f16", rows * self.dim * 2)
+
+        offsets_path = self._file("records.off")
+        if os.path.exists(offsets_path) and os.path.getsize(offsets_path) > count * 8:
+            with open(offsets_path, "rb") as f:
+                f.seek(count * 8)
+                end = int(np.frombuffer(f.read(8), dtype=np.int64)[0])
+            self._truncate("records.jsonl", end)
+            self._truncate("records.off", count * 8)
+
+    def __len__(self):
+        return self.meta["count"]
+
+    # ---------------- writing ----------------
+    def add(self, vectors, records=None):
+        """Append embeddings (and optional JSON-able records); returns their ids."""
+        vectors = _normalise(vectors, self.dim)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim}-d embeddings, got {vectors.shape[1]}-d")
+        start = self.meta["count"]
+        if not len(vectors):
+            return np.empty(0, dtype=np.int64)
+        if records is not None:
+            records = list(records)
+            if len(records) != len(vectors):
+                raise ValueError("need one record per embedding")
+        ids = np.arange(start, start + len(vectors), dtype=np.int64)
+        self._repair()
+        with open(self._file("tail.f16"), "ab") as f:
+            f.write(vectors.astype(np.float16).tobytes())
+        with open(self._file("tail.i64"), "ab") as f:
+            f.write(ids.tobytes())
+        if records is not None:
+            self._append_records(records)
+        self.meta["count"] = start + len(vectors)
+        _atomic_json(self._file("meta.json"), self.meta)
+
+        tail = len(self) - self.meta["compacted"]
+        if self.centroids is None:
+            if len(self) >= self.train_size:
+                self.compact(retrain=True)
+        elif tail >= max(self.min_compact, self.compact_ratio * self.meta["compacted"]):
+            self.compact()
+        return ids
+
+    def _append_records(self, records):
+        offsets_path = self._file("records.off")
+        written = os.path.getsize(offsets_path) // 8 if os.path.exists(offsets_path) else 0
+        # Ids added earlier without records get empty (null) slots.
+        missing = self.meta["count"] - written
+        with open(self._file("records.jsonl"), "ab") as data, open(offsets_path, "ab") as offs:
+            pos = data.tell()
+            for record in [None] * missing + records:
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode()
+                offs.write(np.int64(pos).tobytes())
+                data.write(line)
+                pos += len(line)
+
+    def compact(self, retrain=False):
+        """Merge the tail into a new generation grouped by list (training centroids if needed)."""
+        tail_vectors, tail_ids = self._tail()
+        vectors = np.concatenate([np.asarray(self.vectors), tail_vectors])
+        ids = np.concatenate([np.asarray(self.ids), tail_ids])
+        if not len(vectors):
+            return
+        if retrain or self.centroids is None:
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(len(vectors), min(len(vectors), 256 * self.meta["nlist"]), replace=False)]
+            self.centroids = kmeans(sample.astype(np.float32), self.meta["nlist"])
+            np.save(self._file("centroids.npy"), self.centroids)
+
+        assign = np.concatenate([
+            (vectors[i:i + ASSIGN_CHUNK].astype(np.float32) @ self.centroids.T).argmax(axis=1)
+            for i in range(0, len(vectors), ASSIGN_CHUNK)
+        ])
+        order = np.argsort(assign, kind="stable")
+        gen = self.meta["generation"] + 1
+        os.makedirs(self._file("", gen), exist_ok=True)
+        vectors[order].tofile(self._file("vectors.f16", gen))
+        ids[order].tofile(self._file("ids.i64", gen))
+        np.save(self._file("offsets.npy", gen),
+                np.searchsorted(assign[order], np.arange(len(self.centroids) + 1)).astype(np.int64))
+
+        old = self.meta["generation"]
+        self.meta.update(generation=gen, compacted=self.meta["count"])
+        _atomic_json(self._file("meta.json"), self.meta)
+        for name in ("tail.f16", "tail.i64"):
+            # A fresh file rather than truncation, so mapped readers keep the old one.
+            open(self._file(name + ".tmp"), "wb").close()
+            os.replace(self._file(name + ".tmp"), self._file(name))
+        # Readers may still map generation ``old``; only older ones are removed.
+        for entry in os.listdir(self.path):
+            match = re.fullmatch(r"gen-(\d+)", entry)
+            if match and int(match.group(1)) < old:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+        self._load_generation()
+
+    # ---------------- search ----------------
+    def search(self, queries, k=10, nprobe=8):
+        """Cosine-similarity top ``k`` per query; returns ``(scores, ids)``, both (Q, k), -1 padded."""
+        queries = _normalise(queries, self.dim)
+        tail_vectors, tail_ids = self._tail()
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        probe = None
+        if self.centroids is not None and self.offsets is not None:
+            nprobe = min(nprobe, len(self.centroids))
+            probe = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        for qi, q in enumerate(queries):
+            parts, part_ids = [tail_vectors], [tail_ids]
+            if probe is not None:
+                for lst in probe[qi]:
+                    lo, hi = self.offsets[lst], self.offsets[lst + 1]
+                    parts.append(self.vectors[lo:hi])
+                    part_ids.append(self.ids[lo:hi])
+            cand_ids = np.concatenate(part_ids)
+            if not len(cand_ids):
+                continue
+            sims = np.concatenate(parts).astype(np.float32) @ q
+            top = np.argpartition(-sims, min(k, len(sims)) - 1)[:k]
+            top = top[np.argsort(-sims[top])]
+            scores[qi, :len(top)] = sims[top]
+            found[qi, :len(top)] = cand_ids[top]
+        return scores, found
+
+    def records(self, ids):
+        """Stored metadata for ``ids`` (None where there is none)."""
+        offsets = _memmap(self._file("records.off"), np.int64)
+        if not len(offsets):
+            return [None] * len(ids)
+        out = []
+        with open(self._file("records.jsonl"), "rb") as f:
+            for i in np.asarray(ids).tolist():
+                if 0 <= i < len(offsets):
+                    f.seek(int(offsets[i]))
+                    out.append(json.loads(f.readline()))
+                else:
+                    out.append(None)
+        return out
+
+
+# --------------------------------------------------
+# CLI
+# --------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.similarity")
+    sub = parser.add_subparsers(dest="command", required=True)
+    add = sub.add_parser("add", help="OCR images and index their glyph embeddings")
+    add.add_argument("index")
+    add.add_argument("paths", nargs="+")
+    add.add_argument("-r", "--recursive", action="store_true")
+    add.add_argument("--nlist", type=int, default=256)
+    query = sub.add_parser("query", help="glyphs that look like one glyph of an image")
+    query.add_argument("index")
+    query.add_argument("image")
+    query.add_argument("--glyph", type=int, default=0, help="glyph number in reading order")
+    query.add_argument("-k", type=int, default=10)
+    query.add_argument("--nprobe", type=int, default=8)
+    for p in (add, query):
+        p.add_argument("--backend")
+        p.add_argument("--model")
+    args = parser.parse_args(argv)
+
+    from .cli import iter_images
+    from .engine import OCREngine
+
+    engine = OCREngine(args.model, backend=args.backend, embeddings=True)
+    if args.command == "add":
+        index = GlyphIndex(args.index, nlist=args.nlist)
+        for path in iter_images(args.paths, args.recursive):
+            result = engine.read(path)
+            records = [{"source": path, "box": list(map(int, box)), "label": label}
+                       for box, label in zip(result.boxes, result.labels)]
+            index.add(result.embeddings, records)
+            print(f"{path}\t{len(records)} glyphs", file=sys.stderr)
+        print(f"{len(index)} glyphs indexed", file=sys.stderr)
+        return 0
+
+    index = GlyphIndex(args.index)
+    result = engine.read(args.image)
+    if not 0 <= args.glyph < len(result.boxes):
+        parser.error(f"{args.image} has {len(result.boxes)} glyphs")
+    scores, ids = index.search(result.embeddings[args.glyph:args.glyph + 1], args.k, args.nprobe)
+    for score, record in zip(scores[0], index.records(ids[0])):
+        if record is not None:
+            print(f"{score:.3f}\t{record['label']}\t{record['source']}\t{record['box']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
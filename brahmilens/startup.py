@@ -0,0 +1,106 @@
+"""Timed, optionally backgrounded engine start-up.
+
+    python -m brahmilens.startup --backend keras
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from .backends import backend_class, import_runtime
+from .config import PREDICT_BATCH_SIZE
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class StartupReport:
+    backend: str
+    import_s: float
+    load_s: float
+    warmup_s: float
+
+    @property
+    def total_s(self):
+        return self.import_s + self.load_s + self.warmup_s
+
+    def to_dict(self):
+        return {**asdict(self), "total_s": self.total_s}
+
+    def format(self):
+        return (
+            f"{self.backend}: import {self.import_s:.2f}s | weights {self.load_s:.2f}s | "
+            f"first inference {self.warmup_s:.2f}s | total {self.total_s:.2f}s"
+        )
+
+
+def load_engine(backend=None, warmup_batch_sizes=(1, PREDICT_BATCH_SIZE), **kwargs):
+    """Build an ``OCREngine`` and warm it up; the timing lands on ``engine.startup_report``."""
+    from .engine import OCREngine
+
+    name = backend_class(backend).name
+    t0 = time.perf_counter()
+    import_runtime(name)
+    t1 = time.perf_counter()
+    engine = OCREngine(backend=name, **kwargs)
+    t2 = time.perf_counter()
+    engine.warmup(warmup_batch_sizes)
+    t3 = time.perf_counter()
+
+    engine.startup_report = StartupReport(name, t1 - t0, t2 - t1, t3 - t2)
+    log.info("brahmilens startup %s", engine.startup_report.format())
+    return engine
+
+
+class BackgroundLoader:
+    """Run ``factory`` on a daemon thread as soon as it is created."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._done = threading.Event()
+        self._value = None
+        self._error = None
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="brahmilens-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self._value = self._factory()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+
+    def ready(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("engine is still loading")
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.startup")
+    parser.add_argument("--backend")
+    parser.add_argument("--model")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    engine = load_engine(args.backend, model_path=args.model)
+    report = engine.startup_report
+    if args.json:
+        print(json.dumps({**report.to_dict(), "wall_s": time.perf_counter() - t0}))
+    else:
+        print(report.format())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
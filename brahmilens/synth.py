@@ -0,0 +1,125 @@
+"""Synthetic Brahmi-like pages with ground truth, for benchmarks and tests.
+
+No glyph artwork ships with the repo, so each label is drawn procedurally: the
+base consonant and every vowel sign / anusvara get their own deterministic
+stroke pattern (seeded by code point), and a label's glyph is its base plus
+its signs. Identical labels therefore look alike across pages and runs.
+"""
+from dataclasses import asdict, dataclass
+
+import cv2
+import numpy as np
+
+from .resources import load_labels
+
+CANVAS = 64
+
+
+def _strokes(code_point, count, region):
+    rng = np.random.default_rng(code_point)
+    x0, y0, x1, y1 = region
+    pts = np.stack([rng.integers(x0, x1, 2 * count), rng.integers(y0, y1, 2 * count)], axis=1)
+    arcs = rng.random(count) < 0.4
+    return [(tuple(pts[2 * i]), tuple(pts[2 * i + 1]), bool(arcs[i])) for i in range(count)]
+
+
+def _draw(canvas, strokes, thickness):
+    for a, b, arc in strokes:
+        if arc:
+            centre = ((a[0] + b[0]) // 2, (a[1] + b[1]) // 2)
+            axes = (max(2, abs(b[0] - a[0]) // 2), max(2, abs(b[1] - a[1]) // 2))
+            cv2.ellipse(canvas, centre, axes, 0, 0, 270, 255, thickness)
+        else:
+            cv2.line(canvas, a, b, 255, thickness)
+
+
+def glyph_mask(label):
+    """64x64 uint8 ink mask (255 = ink) for ``label``."""
+    canvas = np.zeros((CANVAS, CANVAS), dtype=np.uint8)
+    base, signs = label[0], label[1:]
+    strokes = _strokes(ord(base), 3, (14, 18, 50, 58))
+    # Chain the strokes so the base glyph stays one connected shape.
+    for (_, b, _), (c, _, _) in zip(strokes, strokes[1:]):
+        cv2.line(canvas, b, c, 255, 4)
+    _draw(canvas, strokes, 4)
+    for sign in signs:
+        if sign == "ं":  # anusvara: detached dot above
+            cv2.circle(canvas, (46, 8), 3, 255, -1)
+        else:
+            _draw(canvas, _strokes(ord(sign), 1, (40, 2, 62, 18)), 3)
+    return canvas
+
+
+@dataclass
+class PageSpec:
+    glyphs: int = 60
+    glyphs_per_line: int = 20
+    glyph_height: int = 48
+    noise: float = 8.0
+    blur: float = 0.0
+    scale: float = 1.0
+    seed: int = 0
+    # weathering: cracks, lichen patches and grain per 20 glyphs (not in truth)
+    clutter: float = 0.0
+
+
+def _weather(ink, count, size, rng):
+    h, w = ink.shape
+    kinds = rng.integers(0, 3, count)
+    for kind in kinds.tolist():
+        x, y = int(rng.integers(0, w)), int(rng.integers(0, h))
+        if kind == 0:  # crack: long thin meandering polyline
+            steps = rng.normal(0, size / 3, (int(rng.integers(4, 10)), 2)).cumsum(axis=0)
+            steps[:, 0] += np.arange(len(steps)) * rng.choice([-1, 1]) * size / 2
+            pts = (steps + (x, y)).astype(np.int32)
+            cv2.polylines(ink, [pts], False, 255, int(rng.integers(1, 3)))
+        elif kind == 1:  # lichen: solid irregular patch
+            axes = (int(rng.integers(size // 4, size)), int(rng.integers(size // 4, size)))
+            cv2.ellipse(ink, (x, y), axes, float(rng.uniform(0, 180)), 0, 360, 255, -1)
+        else:  # grain: cluster of specks
+            for dx, dy in rng.normal(0, size / 4, (int(rng.integers(5, 20)), 2)).astype(int):
+                cv2.circle(ink, (x + dx, y + dy), int(rng.integers(1, 4)), 255, -1)
+
+
+def render_page(spec, index_to_label=None):
+    """Return ``(rgb_page, truth)`` where ``truth`` lists label, box and line per glyph."""
+    index_to_label = index_to_label or load_labels()
+    rng = np.random.default_rng(spec.seed)
+    ids = rng.integers(0, len(index_to_label), spec.glyphs)
+
+    size = spec.glyph_height
+    pitch_x, pitch_y = int(size * 1.1), int(size * 1.8)
+    lines = max(1, -(-spec.glyphs // spec.glyphs_per_line))
+    width = size + pitch_x * min(spec.glyphs, spec.glyphs_per_line) + size * (spec.glyphs_per_line // 5 + 1)
+    height = size + pitch_y * lines
+    ink = np.zeros((height, width), dtype=np.uint8)
+
+    truth = []
+    for n, label_id in enumerate(ids.tolist()):
+        line, col = divmod(n, spec.glyphs_per_line)
+        word_gaps = col // 5  # a word break every five glyphs
+        x = size // 2 + col * pitch_x + word_gaps * size // 2
+        y = size // 2 + line * pitch_y + int(rng.integers(-size // 10, size // 10 + 1))
+        glyph = cv2.resize(glyph_mask(index_to_label[label_id]), (size, size), interpolation=cv2.INTER_AREA)
+        np.maximum(ink[y:y + size, x:x + size], glyph, out=ink[y:y + size, x:x + size])
+        truth.append({"label": index_to_label[label_id], "box": [x, y, size, size], "line": line})
+
+    if spec.clutter:
+        _weather(ink, int(round(spec.clutter * spec.glyphs / 20)), size, rng)
+
+    page = 235 - (ink.astype(np.float32) * (190 / 255))
+    if spec.blur:
+        page = cv2.GaussianBlur(page, (0, 0), spec.blur)
+    if spec.noise:
+        page += rng.normal(0, spec.noise, page.shape).astype(np.float32)
+    page = np.clip(page, 0, 255).astype(np.uint8)
+
+    if spec.scale != 1.0:
+        page = cv2.resize(page, None, fx=spec.scale, fy=spec.scale, interpolation=cv2.INTER_LINEAR)
+        for t in truth:
+            t["box"] = [int(round(v * spec.scale)) for v in t["box"]]
+    return np.dstack([page] * 3), truth
+
+
+def spec_dict(spec):
+    return asdict(spec)
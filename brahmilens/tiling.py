@@ -0,0 +1,268 @@
+"""Tiled, multi-threaded segmentation for very large scans.
+
+Each tile is binarised with a halo wide enough for the adaptive threshold and
+the opening kernel, so its core pixels match the full-page threshold exactly.
+Connected components are labelled per tile and stitched across seams with a
+union-find. ``RETR_EXTERNAL`` drops components nested inside holes; a
+component is kept when the background pixel just above its first pixel belongs
+to the page's outer background, which is why background components are
+labelled and stitched as well. Box order matches ``findContours`` followed by
+a stable sort on ``x``.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from .segmentation import DEFAULT_SEGMENTATION, binarize
+from .unionfind import union_find
+
+
+# --------------------------------------------------
+# WINDOWED SOURCES
+# --------------------------------------------------
+class ArraySource:
+    """Window reader over an ndarray or ``np.memmap``; only touched pages are read."""
+
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape[:2]
+
+    def read(self, y0, y1, x0, x1):
+        return np.ascontiguousarray(self.array[y0:y1, x0:x1])
+
+
+def open_source(path):
+    """Open ``.npy`` scans memory-mapped; other formats are decoded once to grayscale."""
+    if path.endswith(".npy"):
+        return ArraySource(np.load(path, mmap_mode="r"))
+    Image.MAX_IMAGE_PIXELS = None
+    with Image.open(path) as image:
+        return ArraySource(np.asarray(image.convert("L")))
+
+
+def as_source(image):
+    return image if hasattr(image, "read") else ArraySource(image)
+
+
+def halo_for(params):
+    # adaptiveThreshold reads block_size // 2 pixels around each pixel, and the
+    # opening (erode then dilate) reads kernel_size - 1 more on top of that.
+    return params.block_size // 2 + 2 * (params.kernel_size - 1)
+
+
+def threshold_window(source, y0, y1, x0, x1, params, halo):
+    """Binarise ``[y0:y1, x0:x1]`` exactly as the full page would be."""
+    h, w = source.shape
+    hy0, hy1 = max(0, y0 - halo), min(h, y1 + halo)
+    hx0, hx1 = max(0, x0 - halo), min(w, x1 + halo)
+    thresh = binarize(source.read(hy0, hy1, hx0, hx1), params)
+    return thresh[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+
+
+class TiledThreshold:
+    """Lazy stand-in for the full-page threshold: slices are binarised on demand."""
+
+    def __init__(self, source, params=DEFAULT_SEGMENTATION):
+        self.source = source
+        self.params = params
+        self.halo = halo_for(params)
+        self.shape = source.shape
+        self.ndim = 2
+
+    def __getitem__(self, key):
+        ys, xs = key
+        y0, y1, _ = ys.indices(self.shape[0])
+        x0, x1, _ = xs.indices(self.shape[1])
+        return threshold_window(self.source, y0, y1, x0, x1, self.params, self.halo)
+
+
+# --------------------------------------------------
+# PER-TILE LABELLING
+# --------------------------------------------------
+def _edges(labels):
+    return {
+        "top": labels[0].copy(), "bottom": labels[-1].copy(),
+        "left": labels[:, 0].copy(), "right": labels[:, -1].copy(),
+    }
+
+
+def _first_pixels(fg, stats):
+    # Leftmost pixel on each component's top row, i.e. its first pixel in raster order.
+    n = len(stats)
+    tops = stats[:, 1]
+    rows = np.unique(tops[1:])
+    sub = fg[rows]
+    r, x = np.nonzero(sub)
+    labels = sub[r, x]
+    on_top = tops[labels] == rows[r]
+    first_x = np.full(n, fg.shape[1], dtype=np.int64)
+    np.minimum.at(first_x, labels[on_top], x[on_top])
+    return tops.astype(np.int64), first_x
+
+
+def _label_tile(source, y0, y1, x0, x1, params, halo):
+    core = threshold_window(source, y0, y1, x0, x1, params, halo)
+    n_fg, fg, stats, _ = cv2.connectedComponentsWithStats(core, connectivity=8)
+    n_bg, bg = cv2.connectedComponents((core == 0).view(np.uint8), connectivity=4)
+
+    first_y, first_x = _first_pixels(fg, stats)
+    # The pixel above a component's first pixel lies in the background that
+    # surrounds it (never in one of its holes). -1 means "in the tile above".
+    above = np.full(n_fg, -1, dtype=np.int64)
+    inside = first_y > 0
+    inside[0] = False
+    above[inside] = bg[first_y[inside] - 1, first_x[inside]]
+
+    return {
+        "origin": (y0, x0),
+        "n_fg": n_fg, "n_bg": n_bg,
+        "stats": stats[:, :4].astype(np.int64),
+        "first_y": first_y, "first_x": first_x, "above": above,
+        "fg": _edges(fg), "bg": _edges(bg),
+    }
+
+
+# --------------------------------------------------
+# STITCHING
+# --------------------------------------------------
+def _seam_pairs(a, b, diagonal):
+    # Label pairs facing each other across a seam; ``diagonal`` adds 8-neighbours.
+    shifts = (-1, 0, 1) if diagonal else (0,)
+    out = []
+    n = len(a)
+    for s in shifts:
+        lo, hi = max(0, -s), min(n, n - s)
+        pa, pb = a[lo:hi], b[lo + s:hi + s]
+        mask = (pa > 0) & (pb > 0)
+        out.append(np.stack([pa[mask], pb[mask]], axis=1))
+    return np.concatenate(out)
+
+
+def _concat(chunks):
+    chunks = [e for e in chunks if len(e)]
+    return np.concatenate(chunks) if chunks else np.zeros((0, 2), dtype=np.int64)
+
+
+def _stitch(grid, page_shape, params):
+    rows, cols = len(grid), len(grid[0])
+    page_w = page_shape[1]
+    tiles = [t for row in grid for t in row]
+    fg_off = np.cumsum([0] + [t["n_fg"] for t in tiles])
+    bg_off = np.cumsum([0] + [t["n_bg"] for t in tiles])
+
+    # Global ids: tile-local label + per-tile offset.
+    fg_edges, bg_edges = [], []
+    for r in range(rows):
+        for c in range(cols):
+            t, i = grid[r][c], r * cols + c
+            for dr, dc, side_a, side_b in ((0, 1, "right", "left"), (1, 0, "bottom", "top")):
+                if r + dr >= rows or c + dc >= cols:
+                    continue
+                u, j = grid[r + dr][c + dc], (r + dr) * cols + c + dc
+                pairs = _seam_pairs(t["fg"][side_a], u["fg"][side_b], diagonal=True)
+                fg_edges.append(pairs + [fg_off[i], fg_off[j]])
+                pairs = _seam_pairs(t["bg"][side_a], u["bg"][side_b], diagonal=False)
+                bg_edges.append(pairs + [bg_off[i], bg_off[j]])
+
+            # 8-connectivity also joins foreground diagonally across tile corners.
+            for dc, corner in ((1, -1), (-1, 0)):
+                if r + 1 < rows and 0 <= c + dc < cols:
+                    u, j = grid[r + 1][c + dc], (r + 1) * cols + c + dc
+                    a, b = t["fg"]["bottom"][corner], u["fg"]["top"][-1 - corner]
+                    if a and b:
+                        fg_edges.append(np.array([[a + fg_off[i], b + fg_off[j]]]))
+
+    fg_edges, bg_edges = _concat(fg_edges), _concat(bg_edges)
+    fg_root = union_find(fg_off[-1], fg_edges[:, 0], fg_edges[:, 1])
+    bg_root = union_find(bg_off[-1], bg_edges[:, 0], bg_edges[:, 1])
+
+    # findContours zero-pads the page, so background on the page border is the
+    # outer background.
+    outer = np.zeros(bg_off[-1], dtype=bool)
+    for r in range(rows):
+        for c in range(cols):
+            t, i = grid[r][c], r * cols + c
+            for side, on in (("top", r == 0), ("bottom", r == rows - 1),
+                             ("left", c == 0), ("right", c == cols - 1)):
+                if on:
+                    labels = t["bg"][side]
+                    outer[bg_root[labels[labels > 0] + bg_off[i]]] = True
+
+    # Per tile part: global first pixel and the background id above it.
+    parts_root, parts_first, parts_above = [], [], []
+    for r in range(rows):
+        for c in range(cols):
+            t, i = grid[r][c], r * cols + c
+            oy, ox = t["origin"]
+            above = t["above"][1:].copy()
+            fy, fx = t["first_y"][1:], t["first_x"][1:]
+            local = above > 0
+            above[local] += bg_off[i]
+            above[~local] = -1
+            if r > 0:
+                up = (r - 1) * cols + c
+                spill = t["first_y"][1:] == 0
+                above[spill] = grid[r - 1][c]["bg"]["bottom"][fx[spill]] + bg_off[up]
+            parts_root.append(fg_root[fg_off[i] + 1:fg_off[i + 1]])
+            parts_first.append((fy + oy) * page_w + fx + ox)
+            parts_above.append(above)
+    parts_root = np.concatenate(parts_root)
+    parts_first = np.concatenate(parts_first)
+    parts_above = np.concatenate(parts_above)
+
+    n = fg_off[-1]
+    first = np.full(n, np.iinfo(np.int64).max)
+    np.minimum.at(first, parts_root, parts_first)
+    lead = parts_first == first[parts_root]
+    external = np.zeros(n, dtype=bool)
+    lead_above = parts_above[lead]
+    external[parts_root[lead]] = (lead_above < 0) | outer[bg_root[np.maximum(lead_above, 0)]]
+
+    # Merge tile boxes per stitched component.
+    x0 = np.full(n, np.iinfo(np.int64).max)
+    y0 = np.full(n, np.iinfo(np.int64).max)
+    x1 = np.full(n, -1)
+    y1 = np.full(n, -1)
+    for i, t in enumerate(tiles):
+        ids = fg_root[fg_off[i] + 1:fg_off[i + 1]]
+        s = t["stats"][1:]
+        oy, ox = t["origin"]
+        np.minimum.at(x0, ids, s[:, 0] + ox)
+        np.minimum.at(y0, ids, s[:, 1] + oy)
+        np.maximum.at(x1, ids, s[:, 0] + s[:, 2] + ox)
+        np.maximum.at(y1, ids, s[:, 1] + s[:, 3] + oy)
+
+    ids = np.flatnonzero(external)
+    w, h = x1[ids] - x0[ids], y1[ids] - y0[ids]
+    ok = (h > params.min_height) & (w > params.min_width)
+    ids, w, h = ids[ok], w[ok], h[ok]
+    # findContours emits components in reverse raster order of their first pixel.
+    order = np.lexsort((-first[ids], x0[ids]))
+    return [(int(x0[ids[i]]), int(y0[ids[i]]), int(w[i]), int(h[i])) for i in order]
+
+
+# --------------------------------------------------
+# ENTRY POINT
+# --------------------------------------------------
+def segment_tiled(image, params=DEFAULT_SEGMENTATION, tile_size=2048, workers=None):
+    """Tiled equivalent of ``segment_characters``.
+
+    ``image`` may be an array, an ``np.memmap`` or any object with ``shape`` and
+    ``read(y0, y1, x0, x1)``. The returned threshold is a ``TiledThreshold``
+    that binarises crops on demand, so peak memory follows the tile size.
+    """
+    source = as_source(image)
+    h, w = source.shape
+    halo = halo_for(params)
+    ys = list(range(0, h, tile_size))
+    xs = list(range(0, w, tile_size))
+    jobs = [(y, min(h, y + tile_size), x, min(w, x + tile_size)) for y in ys for x in xs]
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        labelled = list(pool.map(lambda j: _label_tile(source, *j, params, halo), jobs))
+
+    grid = [labelled[r * len(xs):(r + 1) * len(xs)] for r in range(len(ys))]
+    return _stitch(grid, (h, w), params), TiledThreshold(source, params)
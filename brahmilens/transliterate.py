@@ -0,0 +1,219 @@
+"""Transliteration of recognised Devanagari into Brahmi, IAST and ISO 15919.
+
+    python -m brahmilens.transliterate --to iast corpus.txt
+
+Every scheme is a table of Devanagari grapheme clusters (consonant,
+consonant + matra, consonant + virama, independent vowel, sign) compiled
+into a trie of nested dicts. Text is converted by longest match in a single
+left-to-right pass, so conjuncts fall out of consonant + virama clusters and
+the inherent vowel is only written for a bare consonant. ``stream`` carries
+an unfinished match over to the next chunk, so arbitrarily long input is
+converted in constant memory. Characters outside the table pass through.
+"""
+import argparse
+import sys
+from functools import lru_cache
+
+SCHEMES = ("brahmi", "iast", "iso15919")
+
+VIRAMA = "्"
+NUKTA = "़"
+BRAHMI_VIRAMA = "\U00011046"
+
+# Devanagari, Brahmi, romanisation (identical in IAST and ISO 15919)
+CONSONANTS = [
+    ("क", "\U00011013", "k"), ("ख", "\U00011014", "kh"), ("ग", "\U00011015", "g"),
+    ("घ", "\U00011016", "gh"), ("ङ", "\U00011017", "ṅ"),
+    ("च", "\U00011018", "c"), ("छ", "\U00011019", "ch"), ("ज", "\U0001101a", "j"),
+    ("झ", "\U0001101b", "jh"), ("ञ", "\U0001101c", "ñ"),
+    ("ट", "\U0001101d", "ṭ"), ("ठ", "\U0001101e", "ṭh"), ("ड", "\U0001101f", "ḍ"),
+    ("ढ", "\U00011020", "ḍh"), ("ण", "\U00011021", "ṇ"),
+    ("त", "\U00011022", "t"), ("थ", "\U00011023", "th"), ("द", "\U00011024", "d"),
+    ("ध", "\U00011025", "dh"), ("न", "\U00011026", "n"),
+    ("प", "\U00011027", "p"), ("फ", "\U00011028", "ph"), ("ब", "\U00011029", "b"),
+    ("भ", "\U0001102a", "bh"), ("म", "\U0001102b", "m"),
+    ("य", "\U0001102c", "y"), ("र", "\U0001102d", "r"), ("ल", "\U0001102e", "l"),
+    ("व", "\U0001102f", "v"), ("श", "\U00011030", "ś"), ("ष", "\U00011031", "ṣ"),
+    ("स", "\U00011032", "s"), ("ह", "\U00011033", "h"), ("ळ", "\U00011034", "ḷ"),
+    ("ऴ", "\U00011035", "ḻ"), ("ऱ", "\U00011036", "ṟ"), ("ऩ", "\U00011037", "ṉ"),
+]
+
+# Nukta letters: precomposed form, base letter, romanisation. Brahmi has no
+# nukta, so they are written with the base letter.
+NUKTA_CONSONANTS = [
+    ("क़", "क", "q"), ("ख़", "ख", "k͟h"), ("ग़", "ग", "ġ"), ("ज़", "ज", "z"),
+    ("ड़", "ड", "ṛ"), ("ढ़", "ढ", "ṛh"), ("फ़", "फ", "f"), ("य़", "य", "ẏ"),
+]
+
+# Independent vowel, vowel sign, Brahmi vowel, Brahmi sign, IAST, ISO 15919
+VOWELS = [
+    ("अ", "", "\U00011005", "", "a", "a"),
+    ("आ", "ा", "\U00011006", "\U00011038", "ā", "ā"),
+    ("इ", "ि", "\U00011007", "\U0001103a", "i", "i"),
+    ("ई", "ी", "\U00011008", "\U0001103b", "ī", "ī"),
+    ("उ", "ु", "\U00011009", "\U0001103c", "u", "u"),
+    ("ऊ", "ू", "\U0001100a", "\U0001103d", "ū", "ū"),
+    ("ऋ", "ृ", "\U0001100b", "\U0001103e", "ṛ", "r̥"),
+    ("ॠ", "ॄ", "\U0001100c", "\U0001103f", "ṝ", "r̥̄"),
+    ("ऌ", "ॢ", "\U0001100d", "\U00011040", "ḷ", "l̥"),
+    ("ॡ", "ॣ", "\U0001100e", "\U00011041", "ḹ", "l̥̄"),
+    ("ऎ", "ॆ", "\U00011071", "\U00011073", "e", "e"),
+    ("ए", "े", "\U0001100f", "\U00011042", "e", "ē"),
+    ("ऐ", "ै", "\U00011010", "\U00011043", "ai", "ai"),
+    ("ऒ", "ॊ", "\U00011072", "\U00011074", "o", "o"),
+    ("ओ", "ो", "\U00011011", "\U00011044", "o", "ō"),
+    ("औ", "ौ", "\U00011012", "\U00011045", "au", "au"),
+]
+
+# Devanagari, Brahmi, IAST, ISO 15919
+SIGNS = [
+    ("ं", "\U00011001", "ṃ", "ṁ"),      # anusvara
+    ("ँ", "\U00011000", "m̐", "m̐"),     # candrabindu
+    ("ः", "\U00011002", "ḥ", "ḥ"),      # visarga
+    ("ऽ", "ऽ", "'", "'"),          # avagraha (no Brahmi counterpart)
+    ("ॐ", "\U00011011\U00011001", "oṃ", "ōṁ"),
+    ("।", "\U00011047", ".", "."),
+    ("॥", "\U00011048", "..", ".."),
+    ("\u200c", "\u200c", "", ""),  # ZWNJ / ZWJ only shape Indic rendering
+    ("\u200d", "\u200d", "", ""),
+] + [(chr(0x0966 + d), chr(0x11066 + d), str(d), str(d)) for d in range(10)]
+
+
+def build_table(scheme):
+    """``{devanagari cluster: output}`` for one of ``SCHEMES``."""
+    if scheme not in SCHEMES:
+        raise ValueError(f"unknown transliteration scheme {scheme!r}; expected one of {', '.join(SCHEMES)}")
+    column = SCHEMES.index(scheme)
+    brahmi = scheme == "brahmi"
+    letters = {dev: (bra if brahmi else rom) for dev, bra, rom in CONSONANTS}
+    for precomposed, base, rom in NUKTA_CONSONANTS:
+        out = letters[base] if brahmi else rom
+        letters[precomposed] = letters[base + NUKTA] = out
+
+    table = {}
+    for dev, _, bra, _, *roman in VOWELS:
+        table[dev] = bra if brahmi else roman[column - 1]
+    for dev, *outputs in SIGNS:
+        table[dev] = outputs[column]
+    for dev, out in letters.items():
+        table[dev] = out if brahmi else out + "a"
+        table[dev + VIRAMA] = out + BRAHMI_VIRAMA if brahmi else out
+        for _, sign, _, bra_sign, *roman in VOWELS[1:]:
+            table[dev + sign] = out + (bra_sign if brahmi else roman[column - 1])
+    # A stray matra or virama (e.g. a mis-segmented glyph) still reads as its vowel.
+    for _, sign, _, bra_sign, *roman in VOWELS[1:]:
+        table[sign] = bra_sign if brahmi else roman[column - 1]
+    table[VIRAMA] = BRAHMI_VIRAMA if brahmi else ""
+    return table
+
+
+def compile_trie(table):
+    """Nested ``{char: [output or None, children or None]}`` trie of ``table``."""
+    root = {}
+    for key, value in table.items():
+        children, node = root, None
+        for char in key:
+            node = children.get(char)
+            if node is None:
+                node = children[char] = [None, None]
+            if node[1] is None:
+                node[1] = {}
+            children = node[1]
+        node[0] = value
+    # Leaves get children=None so the matcher stops without a lookup.
+    stack = list(root.values())
+    while stack:
+        node = stack.pop()
+        if node[1]:
+            stack.extend(node[1].values())
+        else:
+            node[1] = None
+    return root
+
+
+class Transliterator:
+    """Longest-match converter over a compiled cluster trie."""
+
+    def __init__(self, table):
+        self.table = table
+        self._root = compile_trie(table)
+
+    def _convert(self, text, final=True):
+        # Returns (output, consumed); without ``final`` a match that runs into
+        # the end of ``text`` is left unconsumed, as the next chunk may extend it.
+        root = self._root
+        out = []
+        append = out.append
+        i, n = 0, len(text)
+        while i < n:
+            char = text[i]
+            node = root.get(char)
+            if node is None:
+                append(char)
+                i += 1
+                continue
+            value, children = node
+            end = j = i + 1
+            while children is not None:
+                if j == n:
+                    if not final:
+                        return "".join(out), i
+                    break
+                node = children.get(text[j])
+                if node is None:
+                    break
+                j += 1
+                if node[0] is not None:
+                    value, end = node[0], j
+                children = node[1]
+            append(char if value is None else value)
+            i = end
+        return "".join(out), i
+
+    def __call__(self, text):
+        return self._convert(text)[0]
+
+    def stream(self, chunks):
+        """Transliterate an iterable of text chunks, yielding output chunks."""
+        pending = ""
+        for chunk in chunks:
+            text = pending + chunk
+            out, consumed = self._convert(text, final=False)
+            pending = text[consumed:]
+            if out:
+                yield out
+        if pending:
+            yield self._convert(pending)[0]
+
+
+@lru_cache(maxsize=None)
+def transliterator(scheme):
+    return Transliterator(build_table(scheme))
+
+
+def transliterate(text, scheme="iast"):
+    """``text`` (Devanagari) in ``scheme``: "brahmi", "iast" or "iso15919"."""
+    return transliterator(scheme)(text)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="brahmilens.transliterate",
+                                     description="Transliterate Devanagari text, streaming.")
+    parser.add_argument("path", nargs="?", help="input file (default: stdin)")
+    parser.add_argument("--to", choices=SCHEMES, default="iast")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="characters read at a time")
+    args = parser.parse_args(argv)
+
+    source = open(args.path, encoding="utf-8") if args.path else sys.stdin
+    try:
+        chunks = iter(lambda: source.read(args.chunk_size), "")
+        for out in transliterator(args.to).stream(chunks):
+            sys.stdout.write(out)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
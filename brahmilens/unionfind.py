@@ -0,0 +1,28 @@
+import numpy as np
+
+
+def union_find(n, a, b):
+    """Vectorised union-find: return the root of each of ``n`` nodes joined by edges ``a[i]-b[i]``.
+
+    Roots are the smallest node id of each set. Edges are hooked from the larger
+    root to the smaller one and paths are fully compressed after every round, so
+    the number of rounds grows with the set depth rather than the edge count.
+    """
+    parent = np.arange(n, dtype=np.int64)
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    while len(a):
+        ra, rb = parent[a], parent[b]
+        differ = ra != rb
+        if not differ.any():
+            break
+        lo = np.minimum(ra[differ], rb[differ])
+        hi = np.maximum(ra[differ], rb[differ])
+        np.minimum.at(parent, hi, lo)
+        while True:
+            grand = parent[parent]
+            if np.array_equal(grand, parent):
+                break
+            parent = grand
+        a, b = a[differ], b[differ]
+    return parent
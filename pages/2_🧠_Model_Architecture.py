@@ -1,5 +1,9 @@
+import html
+
 import streamlit as st
-import os
+
+from brahmilens.config import EVAL_REPORT_PATH
+from brahmilens.evaluate import confusion_image, load_report
 
 st.set_page_config(
     page_title="Neural Map | BrahmiLens",
@@ -64,6 +68,21 @@ if st.button("← EXIT TO TERMINAL"):
 st.markdown("<h1 style='font-size: 3rem;'>Neural Map<span style='color:#58a6ff'>_</span></h1>", unsafe_allow_html=True)
 st.markdown("<p class='tech-header'>CNN-VGG Feature Extraction & Classification Pipeline</p>", unsafe_allow_html=True)
 
+# --------------------------------------------------
+# EVALUATION REPORT
+# --------------------------------------------------
+# Everything below is read from the last `python -m brahmilens.evaluate` run,
+# so the figures follow whichever model version was evaluated.
+report = load_report()
+
+def bar(label, value, color):
+    return f"""
+    <p style="font-size:0.8rem; margin-top:15px; margin-bottom:5px; color:{color};">{label} · {value:.1%}</p>
+    <div style="background:rgba(255,255,255,0.1); border-radius:10px; height:10px;">
+        <div style="background:{color}; width:{value:.1%}; height:10px; border-radius:10px;"></div>
+    </div>
+    """
+
 # --------------------------------------------------
 # ARCHITECTURE VISUALIZATION
 # --------------------------------------------------
@@ -72,6 +91,8 @@ col1, col2 = st.columns([1.5, 1], gap="large")
 with col1:
     st.markdown("### 📐 Architecture Schematic")
     
+    # Class count of the evaluated model version
+    output_units = f"{report['classes']} Units" if report else "One Unit per Label"
     layers = [
         ("INPUT LAYER", "64x64x1 Grayscale Tensor", "#ffffff"),
         ("CONVOLUTIONAL BLOCK 1", "16 Filters (3x3) | ReLU | Batch Norm", "#58a6ff"),
@@ -80,7 +101,7 @@ with col1:
         ("POOLING 2", "2x2 MaxPool | Feature Distillation", "#58a6ff"),
         ("FLATTEN", "6,272 Dimensional Vector", "#00ffcc"),
         ("DENSE HEAD", "64 Units | Dropout (0.5) | ReLU", "#00ffcc"),
-        ("OUTPUT LAYER", "11 Units | Softmax Activation", "#00ffcc")
+        ("OUTPUT LAYER", f"{output_units} | Softmax Activation", "#00ffcc")
     ]
     
     for title, desc, color in layers:
@@ -114,62 +135,76 @@ with col2:
     """, unsafe_allow_html=True)
 
     st.markdown("### 📊 Verified Performance")
-    stats_col1, stats_col2 = st.columns(2)
-    with stats_col1:
-        st.markdown("""
-        <div class="glass" style="text-align:center;">
-            <p class="tech-header">Final Accuracy</p>
-            <div class="metric-value">100%</div>
-        </div>
-        """, unsafe_allow_html=True)
-    with stats_col2:
-        st.markdown("""
-        <div class="glass" style="text-align:center;">
-            <p class="tech-header">Test Loss</p>
-            <div class="metric-value">0.00</div>
-        </div>
-        """, unsafe_allow_html=True)
+    if report is None:
+        st.info(
+            "No evaluation report yet. Run `python -m brahmilens.evaluate <labelled crops>` "
+            f"to write {EVAL_REPORT_PATH}."
+        )
+    else:
+        model = report["model"]
+        st.caption(
+            f"{model['backend']} · {model['path']} · "
+            f"{report['glyphs']:,} glyphs from {report['dataset']} · {report['created']}"
+        )
+        stats = [
+            ("Accuracy", f"{report['accuracy']:.1%}"),
+            ("Test Loss", f"{report['loss']:.3f}"),
+            ("Macro F1", f"{report['macro']['f1']:.3f}"),
+            ("ms / Glyph", f"{report['latency']['per_glyph_ms']:.2f}"),
+        ]
+        for row in (stats[:2], stats[2:]):
+            for column, (title, value) in zip(st.columns(2), row):
+                column.markdown(f"""
+                <div class="glass" style="text-align:center;">
+                    <p class="tech-header">{title}</p>
+                    <div class="metric-value">{value}</div>
+                </div>
+                """, unsafe_allow_html=True)
 
 # --------------------------------------------------
 # CONFUSION MATRIX SECTION
 # --------------------------------------------------
-st.markdown("---")
-st.markdown("### 🧬 Confusion Matrix Analysis")
-
-c1, c2 = st.columns([1.5, 1])
-
-with c1:
-    st.markdown("<div class='glass'>", unsafe_allow_html=True)
-    # REPLACE 'assets/confusion_matrix.png' with the actual path to your image
-    try:
-        st.image("assets/confusion_matrix.png", use_container_width=True, caption="Brahmi Character Recognition Matrix")
-    except:
-        st.warning("Confusion Matrix image not found in assets folder.")
-    st.markdown("</div>", unsafe_allow_html=True)
-
-with c2:
-    st.markdown("""
-    <div class="glass">
-        <p class="tech-header">Data Intelligence Report</p>
-        <p style="font-size:0.9rem; opacity:0.8; line-height:1.6;">
-            The visual evidence confirms that the CNN-VGG architecture has <b>zero leakage</b> across the 11 target classes. 
-            Every character (Actual) perfectly matches its label (Predicted).
-        </p>
-        <div style="margin-top:20px;">
-            <p style="font-size:0.8rem; margin-bottom:5px; color:#58a6ff;">F1-Score Precision</p>
-            <div style="background:rgba(255,255,255,0.1); border-radius:10px; height:10px;">
-                <div style="background:#58a6ff; width:100%; height:10px; border-radius:10px;"></div>
-            </div>
-            <p style="font-size:0.8rem; margin-top:15px; margin-bottom:5px; color:#00ffcc;">Recall Rate</p>
-            <div style="background:rgba(255,255,255,0.1); border-radius:10px; height:10px;">
-                <div style="background:#00ffcc; width:100%; height:10px; border-radius:10px;"></div>
-            </div>
+if report is not None:
+    st.markdown("---")
+    st.markdown("### 🧬 Confusion Matrix Analysis")
+
+    c1, c2 = st.columns([1.5, 1])
+
+    with c1:
+        st.image(
+            confusion_image(report), use_container_width=True,
+            caption=f"Actual (rows) vs predicted (columns), {report['classes']} classes, row-normalised",
+        )
+
+    with c2:
+        macro, weighted = report["macro"], report["weighted"]
+        confusions = "".join(
+            f"<li>{html.escape(c['true'])} → {html.escape(c['predicted'])} ×{c['count']}</li>"
+            for c in report["top_confusions"][:5]
+        ) or "<li>None</li>"
+        st.markdown(f"""
+        <div class="glass">
+            <p class="tech-header">Data Intelligence Report</p>
+            <p style="font-size:0.9rem; opacity:0.8; line-height:1.6;">
+                {report['classes_present']} of {report['classes']} classes present in the evaluation set.
+                Weighted F1 {weighted['f1']:.3f}.
+            </p>
+            {bar("Macro Precision", macro["precision"], "#bc85ff")}
+            {bar("Macro Recall", macro["recall"], "#00ffcc")}
+            {bar("Macro F1-Score", macro["f1"], "#58a6ff")}
+            <p class="tech-header" style="margin-top:20px;">Most Frequent Confusions</p>
+            <ul style="font-size:0.85rem; opacity:0.7;">{confusions}</ul>
         </div>
-        <p style="font-size:0.75rem; opacity:0.5; margin-top:20px; font-style:italic;">
-            Note: The matrix reveals a 1.0 probability density along the main diagonal, validating model robustness.
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+        """, unsafe_allow_html=True)
+
+    st.markdown("### 🎯 Per-Class Metrics")
+    st.caption("Weakest classes first.")
+    rows = sorted((c for c in report["per_class"] if c["support"]), key=lambda c: (c["f1"], -c["support"]))
+    st.dataframe(
+        [{"label": c["label"], "precision": round(c["precision"], 3), "recall": round(c["recall"], 3),
+          "f1": round(c["f1"], 3), "support": c["support"]} for c in rows],
+        use_container_width=True, hide_index=True,
+    )
 
 st.markdown("""
 <p style="text-align:center; opacity:0.3; font-family:monospace; margin-top:50px; letter-spacing:3px;">
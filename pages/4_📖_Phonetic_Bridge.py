@@ -1,5 +1,9 @@
+import html
+
 import streamlit as st
 
+from brahmilens.transliterate import transliterate
+
 st.set_page_config(
     page_title="Phonetic Bridge | BrahmiLens",
     page_icon="📖",
@@ -91,31 +95,18 @@ col1, col2 = st.columns([1, 1.2], gap="large")
 
 with col1:
     st.markdown("### 🛰️ Genetic Lineage")
-    st.markdown("""
-    <div class="glass">
-        <div class="evolution-box">
-            <div><small style="display:block; opacity:0.5">Brahmi</small><span class="glyph-large">𑀓</span></div>
-            <div class="arrow">→</div>
-            <div><small style="display:block; opacity:0.5">Devanagari</small><span class="glyph-large">क</span></div>
-            <div class="arrow">→</div>
-            <div><small style="display:block; opacity:0.5">IAST</small><span class="glyph-large">Ka</span></div>
-        </div>
-        <div class="evolution-box">
-            <div><small style="display:block; opacity:0.5">Brahmi</small><span class="glyph-large">𑀫</span></div>
-            <div class="arrow">→</div>
-            <div><small style="display:block; opacity:0.5">Devanagari</small><span class="glyph-large">म</span></div>
-            <div class="arrow">→</div>
-            <div><small style="display:block; opacity:0.5">IAST</small><span class="glyph-large">Ma</span></div>
-        </div>
+    boxes = "".join(
+        f"""
         <div class="evolution-box">
-            <div><small style="display:block; opacity:0.5">Brahmi</small><span class="glyph-large">𑀥</span></div>
+            <div><small style="display:block; opacity:0.5">Brahmi</small><span class="glyph-large">{transliterate(glyph, "brahmi")}</span></div>
             <div class="arrow">→</div>
-            <div><small style="display:block; opacity:0.5">Devanagari</small><span class="glyph-large">ध</span></div>
+            <div><small style="display:block; opacity:0.5">Devanagari</small><span class="glyph-large">{glyph}</span></div>
             <div class="arrow">→</div>
-            <div><small style="display:block; opacity:0.5">IAST</small><span class="glyph-large">Dha</span></div>
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+            <div><small style="display:block; opacity:0.5">IAST</small><span class="glyph-large">{transliterate(glyph, "iast")}</span></div>
+        </div>"""
+        for glyph in ("क", "म", "ध", "क्ष", "पि")
+    )
+    st.markdown(f'<div class="glass">{boxes}</div>', unsafe_allow_html=True)
 
 with col2:
     st.markdown("### 🧠 Linguistic Logic")
@@ -148,6 +139,22 @@ with col2:
     </div>
     """, unsafe_allow_html=True)
 
+# --------------------------------------------------
+# LIVE BRIDGE
+# --------------------------------------------------
+st.markdown("### 🔁 Live Bridge")
+# Defaults to the last inscription decoded on the main page in this session.
+text = st.text_area(
+    "Devanagari",
+    st.session_state.get("last_sentence") or "देवानं पियेन पियदसिन राजा लेखापिता",
+)
+b1, b2, b3 = st.columns(3)
+for column, label, scheme in ((b1, "Brahmi", "brahmi"), (b2, "IAST", "iast"), (b3, "ISO 15919", "iso15919")):
+    with column:
+        st.markdown(f"<p class='header-accent'>{label}</p>", unsafe_allow_html=True)
+        converted = html.escape(transliterate(text, scheme)).replace("\n", "<br>")
+        st.markdown(f'<div class="glass" style="font-size:1.4rem;">{converted}</div>', unsafe_allow_html=True)
+
 # --------------------------------------------------
 # FUTURE EXTENSIONS
 # --------------------------------------------------
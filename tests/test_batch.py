@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+from brahmilens import batch
+from brahmilens.batch import BatchRunner
+
+
+class _Result:
+    def __init__(self, path, fail):
+        self.path = path
+        self.fail = fail
+
+    def to_dict(self):
+        if self.fail and "broken" in self.path:
+            raise ValueError("unreadable")
+        return {"boxes": [[0, 0, 1, 1]] * len(self.path), "text": self.path}
+
+
+class FakeEngine:
+    fail = True
+
+    def read(self, path):
+        return _Result(path, self.fail)
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    # Forked workers inherit the module-level engine instead of loading a model.
+    monkeypatch.setattr(batch, "_ENGINE", FakeEngine())
+
+
+def lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def runner(out, **kwargs):
+    return BatchRunner(str(out), workers=2, checkpoint_every=2, progress=None, **kwargs)
+
+
+def test_results_are_written_in_input_order(tmp_path, fake_engine):
+    paths = [f"page{i:02d}.png" for i in range(25)] + ["broken.png"]
+    stats = runner(tmp_path / "out.jsonl").run(paths)
+    records = lines(tmp_path / "out.jsonl")
+    assert [r["path"] for r in records] == paths
+    assert records[-1]["error"] == "ValueError: unreadable"
+    assert stats["files"] == 26 and stats["errors"] == 1 and stats["skipped"] == 0
+    with open(str(tmp_path / "out.jsonl") + ".checkpoint", encoding="utf-8") as f:
+        assert json.load(f)["files"] == 26
+
+
+def test_resume_skips_finished_files(tmp_path, fake_engine):
+    out = tmp_path / "out.jsonl"
+    paths = [f"page{i}.png" for i in range(7)]
+    runner(out).run(paths[:4])
+    stats = runner(out).run(paths)
+    assert stats["skipped"] == 4 and stats["files"] == 3
+    assert [r["path"] for r in lines(out)] == paths
+
+
+def test_resume_drops_output_after_the_last_checkpoint(tmp_path, fake_engine):
+    out = tmp_path / "out.jsonl"
+    paths = [f"page{i}.png" for i in range(5)]
+    runner(out).run(paths[:3])
+    # A killed job leaves unchecked lines, possibly half written, past the checkpoint.
+    with open(out, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"path": paths[3], "text": "stale"}) + "\n" + '{"path": "pa')
+
+    stats = runner(out).run(paths)
+    assert stats["skipped"] == 3 and stats["files"] == 2
+    records = lines(out)
+    assert [r["path"] for r in records] == paths
+    assert records[3]["text"] == paths[3]
+
+
+def test_existing_output_without_checkpoint_is_left_alone(tmp_path, fake_engine):
+    out = tmp_path / "out.jsonl"
+    out.write_text('{"path": "earlier.png"}\n', encoding="utf-8")
+    with pytest.raises(FileExistsError):
+        runner(out).run(["page0.png"])
+    assert lines(out) == [{"path": "earlier.png"}]
+
+    stats = runner(out, resume=True).run(["earlier.png", "page0.png"])
+    assert stats["skipped"] == 1
+    assert [r["path"] for r in lines(out)] == ["earlier.png", "page0.png"]
+
+    runner(out, overwrite=True).run(["page1.png"])
+    assert [r["path"] for r in lines(out)] == ["page1.png"]
+
+
+def test_retry_errors_reruns_failed_files(tmp_path, fake_engine, monkeypatch):
+    out = tmp_path / "out.jsonl"
+    paths = ["page0.png", "broken.png", "page1.png"]
+    runner(out).run(paths)
+    assert runner(out).run(paths)["skipped"] == 3
+
+    monkeypatch.setattr(FakeEngine, "fail", False)
+    stats = runner(out, retry_errors=True).run(paths)
+    assert stats["skipped"] == 2 and stats["files"] == 1 and stats["errors"] == 0
+    records = lines(out)
+    assert sorted(r["path"] for r in records) == sorted(paths)
+    assert not any("error" in r for r in records)
+    assert runner(out).run(paths)["skipped"] == 3
@@ -0,0 +1,145 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from brahmilens.batching import InferenceExecutor, MicroBatcher, QueueFull
+
+
+def crops(n, value=0.5, size=4):
+    return np.full((n, size, size, 1), value, dtype=np.float32)
+
+
+def mean_predict(batch):
+    if np.isnan(batch).any():
+        raise ValueError("poisoned batch")
+    return batch.reshape(len(batch), -1).mean(axis=1, keepdims=True)
+
+
+class MeanModel:
+    def predict(self, batch):
+        return mean_predict(batch)
+
+    def predict_embeddings(self, batch):
+        return mean_predict(batch), batch.reshape(len(batch), -1)
+
+
+# ---------------- MicroBatcher ----------------
+def run(coro_fn, **kwargs):
+    async def main():
+        batcher = MicroBatcher(mean_predict, **kwargs)
+        batcher.start()
+        try:
+            return await coro_fn(batcher)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(main())
+
+
+def test_microbatcher_splits_and_reassembles():
+    async def go(batcher):
+        return await asyncio.gather(*(batcher.submit(crops(n, v)) for n, v in ((5, 0.1), (11, 0.2), (3, 0.3))))
+
+    results = run(go, max_batch_size=4, max_wait_ms=1.0)
+    for (probs, _, _), (n, v) in zip(results, ((5, 0.1), (11, 0.2), (3, 0.3))):
+        np.testing.assert_allclose(probs, np.full((n, 1), v), rtol=1e-6)
+
+
+def test_microbatcher_failed_batch_does_not_stop_the_loop():
+    async def go(batcher):
+        failed = await asyncio.gather(batcher.submit(crops(2, np.nan)), batcher.submit(crops(2)),
+                                      return_exceptions=True)
+        ok, _, _ = await batcher.submit(crops(3, 0.25))
+        return failed, ok
+
+    failed, ok = run(go, max_batch_size=8, max_wait_ms=5.0)
+    assert all(isinstance(r, ValueError) for r in failed)
+    np.testing.assert_allclose(ok, np.full((3, 1), 0.25))
+
+
+def test_microbatcher_mismatched_crops_fail_only_their_batch():
+    async def go(batcher):
+        failed = await asyncio.gather(batcher.submit(crops(1, size=4)), batcher.submit(crops(1, size=5)),
+                                      return_exceptions=True)
+        ok, _, _ = await batcher.submit(crops(2))
+        return failed, ok
+
+    failed, ok = run(go, max_batch_size=8, max_wait_ms=5.0)
+    assert all(isinstance(r, ValueError) for r in failed)
+    assert ok.shape == (2, 1)
+
+
+def test_microbatcher_queue_limit():
+    async def go(batcher):
+        # Idle: a request larger than max_queue is still served.
+        big, _, _ = await batcher.submit(crops(10))
+        first = asyncio.ensure_future(batcher.submit(crops(6)))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await batcher.submit(crops(6))
+        await first
+        return big
+
+    big = run(go, max_batch_size=16, max_wait_ms=50.0, max_queue=8)
+    assert big.shape == (10, 1)
+
+
+def test_microbatcher_empty_request():
+    async def go(batcher):
+        return await batcher.submit(crops(0))
+
+    probs, _, _ = run(go)
+    assert len(probs) == 0
+
+
+# ---------------- InferenceExecutor ----------------
+@pytest.fixture
+def executor():
+    executor = InferenceExecutor(max_batch_size=8, max_wait_ms=5.0, quantum=2)
+    yield executor
+    executor.stop()
+
+
+def test_executor_results_follow_their_request(executor):
+    model = MeanModel()
+    futures = [executor.submit(model, crops(n, v), client=i) for i, (n, v) in enumerate(((7, 0.1), (2, 0.7)))]
+    np.testing.assert_allclose(futures[0].result(5), np.full((7, 1), 0.1), rtol=1e-6)
+    np.testing.assert_allclose(futures[1].result(5), np.full((2, 1), 0.7), rtol=1e-6)
+
+    probs, embeddings = executor.submit(model, crops(3, 0.4), embeddings=True).result(5)
+    assert probs.shape == (3, 1) and embeddings.shape == (3, 16)
+
+
+def test_executor_failed_batch_does_not_stop_the_dispatcher(executor):
+    model = MeanModel()
+    bad = executor.submit(model, crops(2, np.nan), client="a")
+    mismatched = [executor.submit(model, crops(1, size=s), client=s) for s in (4, 5)]
+    with pytest.raises(ValueError):
+        bad.result(5)
+    for future in mismatched:
+        with pytest.raises(ValueError):
+            future.result(5)
+    np.testing.assert_allclose(executor.submit(model, crops(3, 0.3)).result(5), np.full((3, 1), 0.3), rtol=1e-6)
+
+
+def test_executor_batches_models_separately(executor):
+    class Offset(MeanModel):
+        def predict(self, batch):
+            return super().predict(batch) + 1
+
+    a, b = MeanModel(), Offset()
+    fa, fb = executor.submit(a, crops(2, 0.5), client=1), executor.submit(b, crops(2, 0.5), client=2)
+    np.testing.assert_allclose(fa.result(5), 0.5)
+    np.testing.assert_allclose(fb.result(5), 1.5)
+
+
+def test_executor_queue_limit():
+    executor = InferenceExecutor(max_queue=4, max_wait_ms=1000.0)
+    try:
+        executor.submit(MeanModel(), crops(3))
+        with pytest.raises(QueueFull):
+            executor.submit(MeanModel(), crops(2))
+        assert executor.stats["rejected"] == 1
+    finally:
+        executor.stop()
@@ -0,0 +1,64 @@
+import json
+
+import numpy as np
+
+from brahmilens import bench
+from brahmilens.synth import PageSpec
+
+
+class UniformModel:
+    classes = len(bench.load_labels())
+
+    def predict(self, batch):
+        return np.full((len(batch), self.classes), 1 / self.classes, dtype=np.float32)
+
+
+def test_run_page_times_every_stage():
+    result = bench.run_page(PageSpec(glyphs=20, seed=1), UniformModel(), bench.load_labels(), repeats=2)
+    assert set(result["stages"]) == set(bench.STAGES)
+    assert result["glyphs_truth"] == 20 and result["glyphs_found"] > 0
+    assert result["page"]["glyphs"] == 20 and result["pixels"] > 0
+    assert all(s["median_ms"] >= 0 and s["p95_ms"] >= s["median_ms"] for s in result["stages"].values())
+
+    without_model = bench.run_page(PageSpec(glyphs=20, seed=1), None, bench.load_labels(), repeats=1)
+    assert "inference" not in without_model["stages"]
+
+
+def test_run_suite_covers_the_grid():
+    report = bench.run_suite(None, scales=(1.0, 2.0), glyphs=(5, 10), repeats=1, base=PageSpec(glyph_height=32))
+    cases = [(r["page"]["scale"], r["page"]["glyphs"]) for r in report["results"]]
+    assert cases == [(1.0, 5), (1.0, 10), (2.0, 5), (2.0, 10)]
+    assert all(r["page"]["glyph_height"] == 32 for r in report["results"])
+    assert report["meta"]["inference"] is False
+    assert "scale=2.0 glyphs=10" in bench.format_results(report)
+
+
+def report(**medians):
+    return {"results": [{"page": {"scale": 1.0, "glyphs": 20},
+                         "stages": {s: {"median_ms": ms, "p95_ms": ms} for s, ms in medians.items()}}]}
+
+
+def test_compare_flags_only_real_regressions():
+    baseline = report(decode=10.0, threshold=1.0, contours=2.0)
+    current = report(decode=12.0, threshold=1.4, contours=2.1, inference=5.0)
+    regressions = bench.compare(current, baseline, threshold=0.10, min_ms=0.5)
+    # threshold: +40% but under min_ms; contours: +5%; inference: no baseline
+    assert [(r["stage"], r["case"]) for r in regressions] == [("decode", "scale=1.0 glyphs=20")]
+    assert abs(regressions[0]["change"] - 0.2) < 1e-9
+    assert bench.compare(current, baseline, threshold=0.25) == []
+
+
+def test_cli_run_and_compare(tmp_path, capsys):
+    out = tmp_path / "bench.json"
+    argv = ["run", "--out", str(out), "--scales", "1", "--glyphs", "5", "--repeats", "1", "--no-inference"]
+    assert bench.main(argv) == 0
+    saved = json.loads(out.read_text(encoding="utf-8"))
+    assert len(saved["results"]) == 1 and "decode" in saved["results"][0]["stages"]
+
+    slow = tmp_path / "slow.json"
+    slow.write_text(json.dumps(report(decode=100.0)), encoding="utf-8")
+    fast = tmp_path / "fast.json"
+    fast.write_text(json.dumps(report(decode=10.0)), encoding="utf-8")
+    assert bench.main(["compare", str(fast), str(slow)]) == 0
+    assert bench.main(["compare", str(slow), str(fast)]) == 1
+    assert "REGRESSION scale=1.0 glyphs=20 decode" in capsys.readouterr().out
@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+from brahmilens.cache import CropCache, ResultCache, result_key
+from brahmilens.segmentation import SegmentationParams
+
+
+# ---------------- result_key ----------------
+def test_result_key_covers_pixels_model_params_and_extras():
+    image = np.arange(64, dtype=np.uint8).reshape(8, 8)
+    params = SegmentationParams()
+    key = result_key(image, "model-a", params)
+    assert key == result_key(image.copy(), "model-a", params)
+
+    changed = image.copy()
+    changed[0, 0] += 1
+    assert len({
+        key,
+        result_key(changed, "model-a", params),
+        result_key(image.astype(np.uint16), "model-a", params),
+        result_key(image.reshape(4, 16), "model-a", params),
+        result_key(image, "model-b", params),
+        result_key(image, "model-a", SegmentationParams(block_size=17)),
+        result_key(image, "model-a", params, "noise-filter"),
+    }) == 7
+    assert result_key(image, "model-a", params, None) == key
+
+
+# ---------------- ResultCache ----------------
+def entry(n=3):
+    return (
+        [(i, i, 10, 12) for i in range(n)],
+        [f"l{i}" for i in range(n)],
+        [0.5] * n,
+        np.arange(n * 2, dtype=np.int16).reshape(n, 2),
+        np.full((n, 2), 0.25, dtype=np.float32),
+        np.ones((n, 4), dtype=np.float32),
+    )
+
+
+def test_result_cache_round_trip_through_disk(tmp_path):
+    path = str(tmp_path / "results.db")
+    cache = ResultCache(path)
+    cache.put("k", *entry())
+    cache.close()
+
+    cache = ResultCache(path)
+    boxes, labels, probs, (ids, topk_probs), embeddings = cache.get("k")
+    assert boxes == entry()[0] and labels == entry()[1] and probs == entry()[2]
+    np.testing.assert_array_equal(ids, entry()[3])
+    np.testing.assert_array_equal(embeddings, entry()[5])
+    assert cache.get("missing") is None
+    assert cache.stats["disk_hits"] == 1 and cache.stats["misses"] == 1
+
+    cache.get("k")
+    assert cache.stats["memory_hits"] == 1
+    cache.close()
+
+
+def test_result_cache_returns_copies():
+    cache = ResultCache()
+    cache.put("k", *entry())
+    boxes, labels, probs, (ids, _), embeddings = cache.get("k")
+    labels.append("extra")
+    probs[0] = 0.0
+    ids[:] = -1
+    embeddings[:] = 0.0
+
+    _, labels, probs, (ids, _), embeddings = cache.get("k")
+    assert labels == entry()[1] and probs == entry()[2]
+    np.testing.assert_array_equal(ids, entry()[3])
+    np.testing.assert_array_equal(embeddings, entry()[5])
+
+
+def test_result_cache_disk_eviction_tracks_size(tmp_path):
+    cache = ResultCache(str(tmp_path / "results.db"), memory_bytes=0, disk_bytes=6000)
+    for i in range(20):
+        cache.put(str(i), *entry())
+    assert cache._disk_size == cache._stored_size() <= cache.disk_bytes
+    assert cache.get("19") is not None and cache.get("0") is None
+
+    cache.put("19", *entry(1))          # replacing a key releases its old size
+    assert cache._disk_size == cache._stored_size()
+    cache.close()
+
+
+# ---------------- CropCache ----------------
+def glyphs(n, seed=0):
+    return np.random.default_rng(seed).random((n, 64, 64, 1), dtype=np.float32)
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, crops):
+        self.calls.append(len(crops))
+        return np.stack([c.mean(axis=(0, 1)).repeat(3) for c in crops]).astype(np.float32)
+
+
+def test_crop_cache_exact_keys_only_match_identical_crops():
+    cache = CropCache(threshold=0)
+    a = glyphs(1)
+    b = a.copy()
+    b[0, 0, 0, 0] += 1e-3
+    assert cache.keys(a) == cache.keys(a.copy())
+    assert cache.keys(a) != cache.keys(b)
+
+
+def test_crop_cache_reuses_repeats_within_and_across_batches():
+    cache, model = CropCache(threshold=0), CountingModel()
+    unique = glyphs(3)
+    batch = unique[[0, 1, 0, 2, 1, 0]]
+    probs, hits = cache.predict(batch, model)
+    assert model.calls == [3] and hits == 3 and len(cache) == 3
+    np.testing.assert_array_equal(probs, model(batch))
+
+    probs, hits = cache.predict(unique[[2, 0]], model)
+    assert hits == 2 and model.calls[1:] == [6]
+    np.testing.assert_array_equal(probs, model(unique[[2, 0]]))
+
+
+def test_crop_cache_approximate_matching_is_opt_in():
+    crop = glyphs(1)
+    near = np.clip(crop + 1e-4, 0, 1)
+
+    exact, model = CropCache(threshold=0), CountingModel()
+    exact.predict(crop, model)
+    assert exact.predict(near, model)[1] == 0
+
+    approx, model = CropCache(threshold=0.02), CountingModel()
+    approx.predict(crop, model)
+    probs, hits = approx.predict(near, model)
+    assert hits == 1 and model.calls == [1]
+    np.testing.assert_array_equal(probs, model(crop))
+
+
+def test_crop_cache_evicts_least_recently_used():
+    cache, model = CropCache(capacity=2, threshold=0), CountingModel()
+    a, b, c = glyphs(3)[:, None]
+    cache.predict(a, model)
+    cache.predict(b, model)
+    cache.predict(a, model)
+    cache.predict(c, model)
+    assert len(cache) == 2 and cache.stats["evictions"] == 1
+    assert cache.predict(a, model)[1] == 1
+    assert cache.predict(b, model)[1] == 0
+
+
+@pytest.mark.parametrize("threshold", [0, 0.02])
+def test_crop_cache_hit_rate_and_clear(threshold):
+    cache, model = CropCache(threshold=threshold), CountingModel()
+    batch = glyphs(2)[[0, 0, 1, 1]]
+    cache.predict(batch, model)
+    assert cache.hit_rate() == 0.5
+    cache.clear()
+    assert len(cache) == 0
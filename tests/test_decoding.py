@@ -0,0 +1,78 @@
+import numpy as np
+
+from brahmilens.decoding import BeamDecoder, CharNGram, Lexicon, load_decoder, tokenize, top_k
+
+LABELS = {0: "ka", 1: "kha", 2: "ga", 3: "a", 4: "i"}
+LABEL_TO_INDEX = {label: i for i, label in LABELS.items()}
+
+
+def test_top_k_is_sorted_best_first():
+    probs = np.array([[0.1, 0.5, 0.05, 0.3, 0.05], [0.6, 0.1, 0.1, 0.1, 0.1]], dtype=np.float32)
+    ids, p = top_k(probs, 3)
+    assert ids.dtype == np.int16
+    assert ids[0].tolist() == [1, 3, 0] and ids[1, 0] == 0
+    np.testing.assert_allclose(p[0], [0.5, 0.3, 0.1])
+    assert top_k(probs, 10)[0].shape == (2, 5)
+
+
+def test_tokenize_prefers_the_longest_label():
+    assert tokenize("khaa  ka?ga", LABEL_TO_INDEX) == [1, 3, None, 0, 2]
+
+
+def test_lexicon_step():
+    lexicon = Lexicon([[0, 3], [0, 4, 2]], len(LABELS))
+    assert len(lexicon) == 2
+    root = np.zeros(1, dtype=np.int64)
+    node = lexicon.step(root, np.array([0]))
+    assert node[0] > 0 and not lexicon.terminal[node[0]]
+    assert lexicon.terminal[lexicon.step(node, np.array([3]))[0]]
+    assert lexicon.step(node, np.array([1]))[0] == -1
+    assert lexicon.step(np.array([-1]), np.array([0]))[0] == -1
+
+
+def test_plain_beam_search_is_greedy():
+    rng = np.random.default_rng(0)
+    probs = rng.dirichlet(np.ones(len(LABELS)), size=12).astype(np.float32)
+    ids, p = top_k(probs, 3)
+    out = BeamDecoder(beam_width=4).decode(ids, p)
+    np.testing.assert_array_equal(out, probs.argmax(axis=1))
+    assert BeamDecoder().decode(ids[:0], p[:0]).shape == (0,)
+
+
+def test_lexicon_overrides_a_close_visual_call():
+    # Visually "ka i" narrowly beats "kha a", but only "kha a" is a word.
+    ids = np.array([[0, 1], [4, 3]], dtype=np.int16)
+    probs = np.array([[0.55, 0.45], [0.6, 0.4]], dtype=np.float32)
+    assert BeamDecoder().decode(ids, probs).tolist() == [0, 4]
+    decoder = BeamDecoder(lexicon=Lexicon([[1, 3]], len(LABELS)))
+    assert decoder.decode(ids, probs).tolist() == [1, 3]
+
+    # A confident reading is kept even when it is out of vocabulary.
+    sure = np.array([[0.99, 0.01], [0.99, 0.01]], dtype=np.float32)
+    assert decoder.decode(ids, sure).tolist() == [0, 4]
+
+
+def test_word_breaks_restart_the_lexicon():
+    lexicon = Lexicon([[1, 3]], len(LABELS))
+    ids = np.array([[0, 1], [4, 3], [0, 1], [4, 3]], dtype=np.int16)
+    probs = np.tile(np.array([[0.55, 0.45], [0.6, 0.4]], dtype=np.float32), (2, 1))
+    decoder = BeamDecoder(lexicon=lexicon)
+    assert decoder.decode(ids, probs, breaks=[False, True, False, False]).tolist() == [1, 3, 1, 3]
+
+
+def test_ngram_prefers_seen_sequences():
+    ngram = CharNGram([[2, 4]] * 20, len(LABELS), order=2)
+    ids = np.array([[2, 0], [3, 4]], dtype=np.int16)
+    probs = np.array([[0.9, 0.1], [0.55, 0.45]], dtype=np.float32)
+    assert BeamDecoder().decode(ids, probs).tolist() == [2, 3]
+    assert BeamDecoder(ngram=ngram, lm_weight=1.0).decode(ids, probs).tolist() == [2, 4]
+
+
+def test_load_decoder_reads_word_and_text_files(tmp_path):
+    words = tmp_path / "words.txt"
+    words.write_text("khaa\nkaga\n", encoding="utf-8")
+    corpus = tmp_path / "corpus.txt"
+    corpus.write_text("khaa kaga khaa\n", encoding="utf-8")
+    decoder = load_decoder(LABELS, lexicon_path=str(words), ngram_path=str(corpus))
+    assert len(decoder.lexicon) == 2
+    assert decoder.ngram.logp.shape == (len(LABELS) + 1, len(LABELS))
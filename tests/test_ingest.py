@@ -0,0 +1,63 @@
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+from brahmilens.config import IMG_SIZE, LABEL_PATH, REDUCED_DECODE_MIN_PIXELS
+from brahmilens.engine import OCREngine
+from brahmilens.ingest import choose_reduction, load_gray
+from brahmilens.synth import PageSpec, render_page
+
+# Reduced decodes must find the same glyphs as a full-size one: box counts may
+# differ by at most this fraction.
+BOX_COUNT_TOLERANCE = 0.03
+
+
+def test_choose_reduction_keeps_glyphs_above_the_target():
+    assert choose_reduction(None) == 1
+    assert choose_reduction(60, 40) == 1
+    assert choose_reduction(90, 40) == 2
+    assert choose_reduction(400, 40) == 8
+
+
+def test_small_pages_decode_at_full_size():
+    page, _ = render_page(PageSpec(glyphs=10, glyph_height=48, seed=0))
+    gray, scale = load_gray(cv2.imencode(".png", page)[1].tobytes())
+    assert scale == 1.0 and gray.shape == page.shape[:2]
+
+
+@pytest.fixture(scope="module")
+def engines(tmp_path_factory):
+    with open(LABEL_PATH, encoding="utf-8") as f:
+        classes = len(json.load(f))
+    spec = {"input": [IMG_SIZE, IMG_SIZE, 1], "embedding": False,
+            "ops": [{"op": "flatten"}, {"op": "dense", "w": 0, "b": 1, "act": "softmax"}]}
+    path = str(tmp_path_factory.mktemp("ingest") / "model.npz")
+    np.savez(path, spec=np.array(json.dumps(spec)), a0=np.zeros((IMG_SIZE * IMG_SIZE, classes), np.float32),
+             a1=np.zeros(classes, np.float32))
+    return (OCREngine(path, backend="numpy", glyph_height=None),
+            OCREngine(path, backend="numpy", glyph_height=40))
+
+
+@pytest.mark.parametrize("fmt", [".jpg", ".png"])
+@pytest.mark.parametrize("cell", [200, 320])
+def test_reduced_decode_finds_the_same_boxes(engines, fmt, cell):
+    full, reduced = engines
+    page, _ = render_page(PageSpec(glyphs=60, glyphs_per_line=12, glyph_height=cell, seed=3, noise=4, clutter=1))
+    assert page.shape[0] * page.shape[1] >= REDUCED_DECODE_MIN_PIXELS
+    data = cv2.imencode(fmt, page)[1].tobytes()
+
+    image, scale = full.load(data)
+    assert scale == 1.0
+    full_boxes, _ = full.prepare(image, scale)
+    image, scale = reduced.load(data)
+    assert scale > 1.0
+    reduced_boxes, _ = reduced.prepare(image, scale)
+
+    assert abs(len(reduced_boxes) - len(full_boxes)) <= BOX_COUNT_TOLERANCE * len(full_boxes)
+    # Boxes come back in original-image coordinates, within a couple of
+    # reduced pixels of the full-size box around the same ink.
+    reduced_boxes = np.array(reduced_boxes)
+    offsets = np.array([np.abs(reduced_boxes - box).sum(axis=1).min() for box in full_boxes])
+    assert np.mean(offsets <= 4 * scale) >= 1 - BOX_COUNT_TOLERANCE
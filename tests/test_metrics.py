@@ -0,0 +1,40 @@
+import numpy as np
+
+from brahmilens.metrics import Metrics
+
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics()
+    with metrics.request() as trace, metrics.stage("segment"):
+        metrics.observe("glyphs", 3)
+    assert trace.stages == {} and metrics.stage_seconds == {} and metrics.histograms == {}
+
+
+def test_trace_collects_stages_counts_and_rss_delta():
+    metrics = Metrics(enabled=True)
+    with metrics.request() as trace:
+        with metrics.stage("segment"):
+            pass
+        with metrics.stage("segment"):
+            pass
+        metrics.observe("glyphs", 5)
+        # 64 MiB is past glibc's largest mmap threshold, so the block is always
+        # fresh pages rather than heap left resident by earlier tests.
+        block = np.ones(64 * 2**20 // 8)
+    del block
+    assert set(trace.stages) == {"segment", "total"}
+    assert trace.counters["glyphs"] == 5
+    assert "peak_rss_bytes" not in trace.counters
+    assert trace.counters["rss_delta_bytes"] >= 32 * 2**20
+    assert metrics.stage_seconds["segment"].count == 2
+    assert metrics.counters["requests"] == 1 and metrics.peak_rss_bytes > 0
+
+
+def test_prometheus_exposition():
+    metrics = Metrics(enabled=True)
+    with metrics.request():
+        metrics.observe("batch_size", 16)
+    text = metrics.render_prometheus()
+    assert "brahmilens_requests_total 1" in text
+    assert 'brahmilens_stage_seconds_count{stage="total"} 1' in text
+    assert 'brahmilens_batch_size_bucket{le="16"} 1' in text
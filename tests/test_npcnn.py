@@ -0,0 +1,143 @@
+import json
+
+import numpy as np
+import pytest
+
+from brahmilens.npcnn import NumpyCNN, _map_npz, export_npz
+
+INPUT = (10, 10, 1)
+
+
+@pytest.fixture(scope="module")
+def fixture_model(tmp_path_factory):
+    """A small ``export_npz``-format model: conv, affine, pool, conv, flatten, dense, dense."""
+    rng = np.random.default_rng(0)
+    arrays = {
+        "a0": rng.normal(size=(3, 3, 1, 4)), "a1": rng.normal(size=4),
+        "a2": rng.uniform(0.5, 1.5, size=4), "a3": rng.normal(size=4),
+        "a4": rng.normal(size=(3, 3, 4, 6)), "a5": rng.normal(size=6),
+        "a6": rng.normal(size=(54, 8)) * 0.2, "a7": rng.normal(size=8),
+        "a8": rng.normal(size=(8, 5)), "a9": rng.normal(size=5),
+    }
+    ops = [
+        {"op": "conv", "w": 0, "b": 1, "act": "relu", "pad": "same"},
+        {"op": "affine", "scale": 2, "shift": 3},
+        {"op": "maxpool", "size": [2, 2]},
+        {"op": "conv", "w": 4, "b": 5, "act": "linear", "pad": "valid"},
+        {"op": "act", "act": "relu"},
+        {"op": "flatten"},
+        {"op": "dense", "w": 6, "b": 7, "act": "relu", "embedding": True},
+        {"op": "dense", "w": 8, "b": 9, "act": "softmax"},
+    ]
+    path = str(tmp_path_factory.mktemp("npcnn") / "model.npz")
+    spec = {"input": list(INPUT), "ops": ops, "embedding": True}
+    np.savez(path, spec=np.array(json.dumps(spec)), **{k: v.astype(np.float32) for k, v in arrays.items()})
+    return path, arrays
+
+
+def conv(x, w, b, same):
+    kh, kw = w.shape[:2]
+    if same:
+        x = np.pad(x, ((0, 0), ((kh - 1) // 2, kh // 2), ((kw - 1) // 2, kw // 2), (0, 0)))
+    windows = np.lib.stride_tricks.sliding_window_view(x, (kh, kw), axis=(1, 2))
+    return np.einsum("nhwcij,ijco->nhwo", windows, w) + b
+
+
+def reference(x, a):
+    """Straightforward float64 forward pass of ``fixture_model``."""
+    x = np.maximum(conv(x, a["a0"], a["a1"], same=True), 0)
+    x = x * a["a2"] + a["a3"]
+    n, h, w, c = x.shape
+    x = x.reshape(n, h // 2, 2, w // 2, 2, c).max(axis=(2, 4))
+    x = np.maximum(conv(x, a["a4"], a["a5"], same=False), 0).reshape(n, -1)
+    embedding = np.maximum(x @ a["a6"] + a["a7"], 0)
+    logits = embedding @ a["a8"] + a["a9"]
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return probs / probs.sum(axis=1, keepdims=True), embedding, logits
+
+
+def test_matches_reference(fixture_model):
+    path, arrays = fixture_model
+    net = NumpyCNN(path)
+    x = np.random.default_rng(1).random((7,) + INPUT)
+    probs, embedding, logits = reference(x, {k: v.astype(np.float32).astype(np.float64) for k, v in arrays.items()})
+
+    np.testing.assert_allclose(net.predict(x), probs, atol=1e-5)
+    got_probs, got_embedding = net.predict_embeddings(x)
+    np.testing.assert_allclose(got_probs, probs, atol=1e-5)
+    np.testing.assert_allclose(got_embedding, embedding, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(net.logits(x), logits, rtol=1e-4, atol=1e-4)
+
+
+def test_weights_are_memory_mapped(fixture_model, tmp_path):
+    path, arrays = fixture_model
+    mapped = _map_npz(path)
+    for name, array in arrays.items():
+        assert isinstance(mapped[name], np.memmap)
+        np.testing.assert_array_equal(mapped[name], array.astype(np.float32))
+    net = NumpyCNN(path)
+    assert all(not op["kernel"].flags.owndata and not op["kernel"].flags.writeable
+               for op in net.ops if "kernel" in op)
+
+    compressed = str(tmp_path / "compressed.npz")
+    np.savez_compressed(compressed, **{k: v.astype(np.float32) for k, v in arrays.items()})
+    np.testing.assert_array_equal(_map_npz(compressed)["a6"], arrays["a6"].astype(np.float32))
+
+
+def test_buffers_are_reused_across_batch_sizes(fixture_model):
+    path, _ = fixture_model
+    net = NumpyCNN(path)
+    x = np.random.default_rng(2).random((9,) + INPUT).astype(np.float32)
+    full = net.predict(x)
+    np.testing.assert_allclose(net.predict(x[:3]), full[:3], atol=1e-6)
+    np.testing.assert_allclose(net.predict(x[5:]), full[5:], atol=1e-6)
+    assert net._capacity == 9
+
+
+def test_empty_batch(fixture_model):
+    path, _ = fixture_model
+    net = NumpyCNN(path)
+    assert net.predict(np.zeros((0,) + INPUT)).shape == (0, 5)
+    probs, embedding = net.predict_embeddings(np.zeros((0,) + INPUT))
+    assert probs.shape == (0, 5) and embedding.shape == (0, 8)
+
+
+def test_float16_stays_close(fixture_model):
+    path, _ = fixture_model
+    x = np.random.default_rng(3).random((4,) + INPUT)
+    np.testing.assert_allclose(NumpyCNN(path, dtype="float16").predict(x), NumpyCNN(path).predict(x), atol=1e-2)
+
+
+@pytest.mark.parametrize("k", [2, 4])
+def test_even_same_kernel_pads_bottom_right(tmp_path, k):
+    rng = np.random.default_rng(5)
+    w, b = rng.normal(size=(k, k, 1, 3)), rng.normal(size=3)
+    spec = {"input": list(INPUT), "ops": [{"op": "conv", "w": 0, "b": 1, "act": "linear", "pad": "same"},
+                                          {"op": "flatten"}], "embedding": False}
+    path = str(tmp_path / "even.npz")
+    np.savez(path, spec=np.array(json.dumps(spec)), a0=w.astype(np.float32), a1=b.astype(np.float32))
+    x = rng.random((2,) + INPUT)
+    out = NumpyCNN(path).predict(x)
+    np.testing.assert_allclose(out, conv(x, w, b, same=True).reshape(2, -1), rtol=1e-4, atol=1e-5)
+    assert out.shape == (2, INPUT[0] * INPUT[1] * 3)
+
+
+def test_export_matches_keras(tmp_path):
+    tf = pytest.importorskip("tensorflow")
+    L = tf.keras.layers
+    model = tf.keras.Sequential([
+        L.Input(INPUT),
+        L.Conv2D(4, 3, padding="same"), L.BatchNormalization(), L.Activation("relu"),
+        L.MaxPooling2D(), L.BatchNormalization(),
+        L.Conv2D(6, 3, activation="relu"), L.Conv2D(3, 2, padding="same"), L.Flatten(),
+        L.Dense(8, activation="relu"), L.Dense(5, activation="softmax"),
+    ])
+    rng = np.random.default_rng(4)
+    for layer in model.layers:
+        if isinstance(layer, L.BatchNormalization):
+            gamma, beta, mean, var = layer.get_weights()
+            layer.set_weights([rng.uniform(0.5, 1.5, gamma.shape), rng.normal(size=beta.shape),
+                               rng.normal(size=mean.shape), rng.uniform(0.5, 2.0, var.shape)])
+    x = rng.random((6,) + INPUT).astype(np.float32)
+    path = export_npz(model, str(tmp_path / "model.npz"))
+    np.testing.assert_allclose(NumpyCNN(path).predict(x), model.predict(x, verbose=0), atol=1e-4)
@@ -0,0 +1,81 @@
+import asyncio
+import io
+import json
+
+import numpy as np
+import pytest
+
+from brahmilens.config import IMG_SIZE, LABEL_PATH
+from brahmilens.engine import OCREngine
+from brahmilens.server import OCRServer
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    with open(LABEL_PATH, encoding="utf-8") as f:
+        classes = len(json.load(f))
+    rng = np.random.default_rng(0)
+    spec = {"input": [IMG_SIZE, IMG_SIZE, 1], "embedding": False,
+            "ops": [{"op": "flatten"}, {"op": "dense", "w": 0, "b": 1, "act": "softmax"}]}
+    path = str(tmp_path_factory.mktemp("server") / "model.npz")
+    np.savez(path, spec=np.array(json.dumps(spec)),
+             a0=rng.normal(size=(IMG_SIZE * IMG_SIZE, classes)).astype(np.float32),
+             a1=np.zeros(classes, dtype=np.float32))
+    return OCREngine(model_path=path, backend="numpy")
+
+
+async def request(port, method, path, body=b""):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+                 + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    response = await reader.read()
+    writer.close()
+    return status, json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+
+def serve(engine, *calls):
+    async def main():
+        server = OCRServer(engine, port=0, max_wait_ms=1.0)
+        port = await server.start()
+        try:
+            return [await request(port, *call) for call in calls]
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def npy(array):
+    buf = io.BytesIO()
+    np.save(buf, array)
+    return buf.getvalue()
+
+
+def test_recognize_matches_the_engine_and_uses_its_crop_cache(engine):
+    crops = np.random.default_rng(1).random((6, IMG_SIZE, IMG_SIZE, 1), dtype=np.float32)[[0, 1, 2, 0, 1, 2]]
+    engine.crop_cache.clear()
+    hits = engine.crop_cache.stats["hits"]
+    (status, first), (_, second) = serve(engine, ("POST", "/recognize", npy(crops)),
+                                         ("POST", "/recognize", npy(crops[:3])))
+    assert status == 200
+    labels, top1 = engine.recognize(crops)
+    assert first["labels"] == labels
+    np.testing.assert_allclose(first["probabilities"], top1, rtol=1e-6)
+    assert second["labels"] == labels[:3]
+    # Three repeats within the first request, three crops seen again in the second,
+    # and six more for the direct engine.recognize call.
+    assert engine.crop_cache.stats["hits"] - hits == 12
+
+
+def test_bad_requests_get_client_errors(engine):
+    (bad_shape, _), (not_npy, _), (missing, _), (health, body) = serve(
+        engine,
+        ("POST", "/recognize", npy(np.zeros((2, 8, 8, 1), dtype=np.float32))),
+        ("POST", "/recognize", b"not an array"),
+        ("GET", "/nowhere"),
+        ("GET", "/health"),
+    )
+    assert (bad_shape, not_npy, missing, health) == (400, 400, 404, 200)
+    assert body["status"] == "ok"
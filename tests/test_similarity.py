@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from brahmilens.similarity import GlyphIndex
+
+
+def vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def index(path, **kwargs):
+    return GlyphIndex(str(path), dim=8, nlist=4, train_size=40, min_compact=20, **kwargs)
+
+
+def test_search_finds_added_vectors(tmp_path):
+    idx = index(tmp_path)
+    data = vectors(100)
+    ids = np.concatenate([idx.add(data[i:i + 10], [{"n": int(n)} for n in range(i, i + 10)])
+                          for i in range(0, 100, 10)])
+    assert ids.tolist() == list(range(100)) and len(idx) == 100
+    assert idx.centroids is not None
+
+    scores, found = index(tmp_path).search(data[[3, 77]], k=1, nprobe=4)
+    assert found[:, 0].tolist() == [3, 77]
+    np.testing.assert_allclose(scores[:, 0], 1.0, atol=1e-3)
+    assert idx.records([77, 500]) == [{"n": 77}, None]
+    assert idx.add(np.zeros((0, 8))).shape == (0,)
+
+
+def test_insert_that_crashed_before_meta_is_cut_off(tmp_path):
+    idx = index(tmp_path)
+    idx.add(vectors(5), [{"n": n} for n in range(5)])
+    # Simulate a crash after the tail and records were written but before meta.json.
+    meta = dict(idx.meta)
+    idx.add(vectors(3, seed=1), [{"n": "lost"}] * 3)
+    idx.meta = meta
+    with open(os.path.join(tmp_path, "tail.f16"), "ab") as f:
+        f.write(b"\0" * 5)                       # and a torn half row
+    assert len(idx._tail()[1]) == 5
+
+    ids = idx.add(vectors(2, seed=2), [{"n": "new"}] * 2)
+    assert ids.tolist() == [5, 6]
+    tail_vectors, tail_ids = idx._tail()
+    assert tail_ids.tolist() == list(range(7)) and len(tail_vectors) == 7
+    assert idx.records([4, 5, 6, 7]) == [{"n": 4}, {"n": "new"}, {"n": "new"}, None]
+
+
+def test_compaction_keeps_the_previous_generation(tmp_path):
+    idx = index(tmp_path)
+    for seed in range(4):
+        idx.add(vectors(50, seed=seed))
+        idx.compact()
+    generations = sorted(e for e in os.listdir(tmp_path) if e.startswith("gen-"))
+    current = idx.meta["generation"]
+    assert generations == [f"gen-{current - 1}", f"gen-{current}"]
+    assert len(idx.vectors) == 200 and len(idx._tail()[1]) == 0
@@ -0,0 +1,50 @@
+import numpy as np
+
+from brahmilens.resources import load_labels
+from brahmilens.synth import PageSpec, glyph_mask, render_page
+
+
+def test_glyph_masks_are_deterministic_per_label():
+    a, b = glyph_mask("क"), glyph_mask("क")
+    assert a.shape == (64, 64) and a.dtype == np.uint8
+    np.testing.assert_array_equal(a, b)
+    assert not np.array_equal(a, glyph_mask("के"))
+    assert a.any()
+
+
+def test_same_seed_renders_the_same_page():
+    spec = PageSpec(glyphs=25, seed=7, noise=4, clutter=2)
+    page, truth = render_page(spec)
+    again, truth_again = render_page(spec)
+    np.testing.assert_array_equal(page, again)
+    assert truth == truth_again
+    assert not np.array_equal(page, render_page(PageSpec(glyphs=25, seed=8, noise=4, clutter=2))[0])
+
+
+def test_truth_describes_every_glyph():
+    spec = PageSpec(glyphs=45, glyphs_per_line=20, noise=0)
+    page, truth = render_page(spec)
+    labels = set(load_labels().values())
+    assert page.ndim == 3 and page.shape[2] == 3 and page.dtype == np.uint8
+    assert len(truth) == 45 and [t["line"] for t in truth[::20]] == [0, 1, 2]
+    for t in truth:
+        x, y, w, h = t["box"]
+        assert t["label"] in labels and (w, h) == (spec.glyph_height, spec.glyph_height)
+        assert x >= 0 and y >= 0 and x + w <= page.shape[1] and y + h <= page.shape[0]
+        assert page[y:y + h, x:x + w].min() < 100       # ink inside the box
+
+
+def test_scale_resizes_page_and_truth():
+    spec = PageSpec(glyphs=10, noise=0)
+    page, truth = render_page(spec)
+    big, big_truth = render_page(PageSpec(glyphs=10, noise=0, scale=2.0))
+    assert big.shape[:2] == (page.shape[0] * 2, page.shape[1] * 2)
+    for t, b in zip(truth, big_truth):
+        assert b["label"] == t["label"] and b["box"] == [v * 2 for v in t["box"]]
+
+
+def test_clutter_adds_ink_outside_the_truth():
+    clean, truth = render_page(PageSpec(glyphs=40, noise=0, seed=1))
+    weathered, weathered_truth = render_page(PageSpec(glyphs=40, noise=0, seed=1, clutter=3))
+    assert weathered_truth == truth
+    assert (weathered < 200).sum() > (clean < 200).sum()